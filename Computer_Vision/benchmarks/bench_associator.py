@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import numpy as np
+
+# --- Setup paths ---
+# Make the pipeline packages in src/ importable when run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from association.ppe_associator import PPEAssociator
+
+PERSON_COUNTS = [5, 50, 200]
+PPE_PER_PERSON = 3
+NUM_FRAMES = 20
+FRAME_SIZE = (3840, 2160)
+PPE_CLASS_NAMES = ['helmet', 'no-helmet', 'vest', 'no-vest']
+
+
+def make_frame(num_persons, rng):
+    """Random persons, each with a few PPE boxes around the head and torso."""
+    w, h = FRAME_SIZE
+    persons, objects = [], []
+    for person_idx in range(num_persons):
+        pw, ph = rng.uniform(40, 120), rng.uniform(120, 300)
+        x, y = rng.uniform(0, w - pw), rng.uniform(0, h - ph)
+        person = [x, y, x + pw, y + ph, person_idx + 1, 0, 'person']
+        persons.append(person)
+        objects.append(person)
+        for _ in range(PPE_PER_PERSON):
+            name = PPE_CLASS_NAMES[rng.integers(0, len(PPE_CLASS_NAMES))]
+            cy = y + (rng.uniform(0, 0.2) if 'helmet' in name else rng.uniform(0.3, 0.7)) * ph
+            cx = x + rng.uniform(0.3, 0.7) * pw
+            bw, bh = pw * rng.uniform(0.4, 0.9), ph * rng.uniform(0.1, 0.4)
+            objects.append([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2, 1000 + len(objects), 1, name])
+    return persons, objects
+
+
+def bench(associator, frames):
+    timings = []
+    for persons, objects in frames:
+        start = time.perf_counter()
+        associator.associate_ppe_to_persons(persons, objects)
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000.0
+
+
+if __name__ == '__main__':
+    print(f"associate_ppe_to_persons, median over {NUM_FRAMES} frames, {PPE_PER_PERSON} PPE boxes per person")
+    print(f"{'persons':>8} {'loop ms':>10} {'dense ms':>10} {'indexed ms':>11} {'same output':>12}")
+    for num_persons in PERSON_COUNTS:
+        rng = np.random.default_rng(0)
+        frames = [make_frame(num_persons, rng) for _ in range(NUM_FRAMES)]
+        loop = PPEAssociator(vectorized=False)
+        dense = PPEAssociator(vectorized=True, spatial_index_min_pairs=float('inf'))
+        indexed = PPEAssociator(vectorized=True, spatial_index_min_pairs=0)
+        same = all(loop.associate_ppe_to_persons(p, o) == dense.associate_ppe_to_persons(p, o)
+                   == indexed.associate_ppe_to_persons(p, o) for p, o in frames)
+        print(f"{num_persons:>8} {bench(loop, frames):>10.3f} {bench(dense, frames):>10.3f} "
+              f"{bench(indexed, frames):>11.3f} {str(same):>12}")
@@ -0,0 +1,150 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+# --- Setup paths ---
+# Make the pipeline packages in src/ importable when run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from pipeline.frame_ring import SharedFrameRing
+
+# Frame transport between processes: multiprocessing.Queue (every frame is
+# pickled at each hop) versus SharedFrameRing (only slot indices travel).
+#
+# Both variants run the same three-process chain
+#     producer -> worker -> consumer
+# The producer stamps each frame with its index, the worker draws a box
+# on it in place (as the renderer would) and the consumer checks both marks.
+# Both producers copy each frame once (a new array per frame for the queue,
+# into its slot for the ring), where a real decode stage would decode into
+# a new array or straight into the slot (SharedFrameRing.read_frame).
+#
+#   python benchmarks/bench_frame_ring.py --frames 300 --width 1920 --height 1080
+
+_END = -1
+
+
+def _stamp(frame, frame_idx):
+    frame[0, 0, 0] = frame_idx % 256
+
+
+def _draw(frame):
+    cv2.rectangle(frame, (10, 10), (200, 200), (0, 0, 255), 2)
+
+
+def _check(frame, frame_idx):
+    return frame[0, 0, 0] == frame_idx % 256 and tuple(frame[10, 100]) == (0, 0, 255)
+
+
+def queue_worker(in_q, out_q):
+    while True:
+        item = in_q.get()
+        if item is None:
+            out_q.put(None)
+            return
+        frame_idx, frame = item
+        _draw(frame)
+        out_q.put((frame_idx, frame))
+
+
+def queue_consumer(in_q, result_q):
+    frames, ok = 0, True
+    while True:
+        item = in_q.get()
+        if item is None:
+            result_q.put((frames, ok, time.perf_counter()))
+            return
+        frame_idx, frame = item
+        ok = ok and _check(frame, frame_idx)
+        frames += 1
+
+
+def ring_worker(ring, in_q, out_q):
+    while True:
+        frame_idx, slot = in_q.get()
+        if frame_idx == _END:
+            out_q.put((_END, None))
+            return
+        _draw(ring.frame(slot))
+        out_q.put((frame_idx, slot))
+
+
+def ring_consumer(ring, in_q, result_q):
+    frames, ok = 0, True
+    while True:
+        frame_idx, slot = in_q.get()
+        if frame_idx == _END:
+            ring.close()
+            result_q.put((frames, ok, time.perf_counter()))
+            return
+        ok = ok and _check(ring.frame(slot), frame_idx)
+        ring.release(slot)
+        frames += 1
+
+
+def run_queue(source, num_frames, queue_size, ctx):
+    to_worker, to_consumer, results = ctx.Queue(queue_size), ctx.Queue(queue_size), ctx.Queue()
+    processes = [ctx.Process(target=queue_worker, args=(to_worker, to_consumer)),
+                 ctx.Process(target=queue_consumer, args=(to_consumer, results))]
+    for process in processes:
+        process.start()
+    start = time.perf_counter()
+    for frame_idx in range(num_frames):
+        # A new array per frame, like a decoder returns: put() pickles in a background thread
+        frame = source.copy()
+        _stamp(frame, frame_idx)
+        to_worker.put((frame_idx, frame))
+    to_worker.put(None)
+    frames, ok, end = results.get()
+    for process in processes:
+        process.join()
+    return frames, ok, end - start
+
+
+def run_ring(source, num_frames, queue_size, ctx):
+    ring = SharedFrameRing(queue_size, source.shape, mp_context=ctx)
+    to_worker, to_consumer, results = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    processes = [ctx.Process(target=ring_worker, args=(ring, to_worker, to_consumer)),
+                 ctx.Process(target=ring_consumer, args=(ring, to_consumer, results))]
+    for process in processes:
+        process.start()
+    try:
+        start = time.perf_counter()
+        for frame_idx in range(num_frames):
+            slot = ring.acquire() # Blocks while all slots are in flight
+            _stamp(source, frame_idx)
+            ring.write_frame(slot, source)
+            to_worker.put((frame_idx, slot))
+        to_worker.put((_END, None))
+        frames, ok, end = results.get()
+        for process in processes:
+            process.join()
+    finally:
+        ring.unlink()
+    return frames, ok, end - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Frame transport between processes: Queue vs shared-memory ring")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--slots', type=int, default=8, help="Ring slots, and the queue size of the Queue variant")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    rng = np.random.default_rng(0)
+    source = rng.integers(0, 255, size=(args.height, args.width, 3), dtype=np.uint8)
+    print(f"{args.frames} frames of {args.width}x{args.height} through producer -> worker -> consumer "
+          f"({os.cpu_count()} CPUs)")
+    print(f"{'transport':>10} {'frames':>7} {'ok':>4} {'seconds':>8} {'fps':>8} {'MB/s':>8}")
+    for name, run in (('queue', run_queue), ('ring', run_ring)):
+        frames, ok, seconds = run(source, args.frames, args.slots, ctx)
+        megabytes = frames * source.nbytes / 1e6
+        print(f"{name:>10} {frames:>7} {str(ok):>4} {seconds:>8.2f} {frames / seconds:>8.1f} "
+              f"{megabytes / seconds:>8.0f}")
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+# --- Setup paths ---
+# Make the pipeline packages in src/ importable when run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from association.ppe_associator import PPEAssociator
+from compliance_checker.safety_rules import SafetyComplianceChecker
+from detection.detections import Detections
+from project_utils.overlay_renderer import DEFAULT_RENDERER
+from tracking.object_tracker import ObjectTracker
+
+# End-to-end per-stage benchmark on synthetic video.
+#
+# A SyntheticScene moves persons (each wearing a helmet or not and a vest or
+# not) around a frame and renders the frames. StubDetector returns the scene's
+# ground-truth boxes with seeded jitter and misses, so the full pipeline runs
+# deterministically without model weights, torch or a GPU. Every stage is
+# timed per frame and the p50/p95/p99 latencies are written to a JSON file;
+# --compare prints the change against an earlier results file.
+#
+#   python benchmarks/bench_pipeline.py --output bench_results.json
+#   python benchmarks/bench_pipeline.py --output new.json --compare bench_results.json
+
+CLASS_NAMES = ('person', 'helmet', 'no-helmet', 'vest', 'no-vest')
+STAGES = ('detect', 'track', 'associate', 'check', 'draw', 'encode')
+PERCENTILES = (50, 95, 99)
+
+# name -> (persons, PPE boxes per person, speed in pixels per frame)
+SCENARIOS = {
+    'sparse': (5, 2, 2.0),
+    'busy': (30, 2, 4.0),
+    'crowded': (100, 2, 6.0),
+}
+
+
+class SyntheticScene:
+    """Persons moving at constant speed and bouncing off the frame borders."""
+    def __init__(self, num_persons, ppe_per_person=2, speed=3.0, frame_size=(1280, 720), seed=0):
+        self.frame_size = frame_size
+        self.ppe_per_person = ppe_per_person
+        rng = np.random.default_rng(seed)
+        w, h = frame_size
+        self.sizes = np.column_stack((rng.uniform(40, 90, num_persons), rng.uniform(120, 240, num_persons)))
+        self.positions = rng.uniform(0, 1, (num_persons, 2)) * (np.array([w, h]) - self.sizes)
+        angles = rng.uniform(0, 2 * np.pi, num_persons)
+        self.velocities = np.column_stack((np.cos(angles), np.sin(angles))) * speed
+        self.wears_helmet = rng.random(num_persons) < 0.7
+        self.wears_vest = rng.random(num_persons) < 0.7
+        self.background = rng.integers(60, 120, size=(h, w, 3), dtype=np.uint8)
+
+    def step(self):
+        self.positions += self.velocities
+        limit = np.array(self.frame_size) - self.sizes
+        bounced = (self.positions < 0) | (self.positions > limit)
+        self.velocities[bounced] *= -1
+        self.positions = np.clip(self.positions, 0, limit)
+
+    def ground_truth(self):
+        """:return: Array [N, 6] of x1, y1, x2, y2, conf, cls_id"""
+        rows = []
+        for (x, y), (pw, ph), helmet, vest in zip(self.positions, self.sizes, self.wears_helmet, self.wears_vest):
+            rows.append([x, y, x + pw, y + ph, 0.9, CLASS_NAMES.index('person')])
+            if self.ppe_per_person >= 1:
+                rows.append([x + 0.2 * pw, y - 0.05 * ph, x + 0.8 * pw, y + 0.15 * ph, 0.8,
+                             CLASS_NAMES.index('helmet' if helmet else 'no-helmet')])
+            if self.ppe_per_person >= 2:
+                rows.append([x + 0.1 * pw, y + 0.25 * ph, x + 0.9 * pw, y + 0.6 * ph, 0.8,
+                             CLASS_NAMES.index('vest' if vest else 'no-vest')])
+        boxes = np.array(rows, dtype=np.float32).reshape(-1, 6)
+        w, h = self.frame_size
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w - 1)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h - 1)
+        return boxes
+
+    def render(self):
+        frame = self.background.copy()
+        for x1, y1, x2, y2, _, cls_id in self.ground_truth().astype(int).tolist():
+            color = (200, 200, 200) if cls_id == 0 else (0, 200, 255)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1 if cls_id == 0 else 2)
+        return frame
+
+
+class StubDetector:
+    """
+    Deterministic stand-in for PPEDetector: returns the ground truth of the
+    scene's current frame with seeded box jitter and missed detections.
+    """
+    def __init__(self, scene, jitter=2.0, miss_rate=0.05, seed=0):
+        self.scene = scene
+        self.jitter = jitter
+        self.miss_rate = miss_rate
+        self.class_names = CLASS_NAMES
+        self.model = self
+        self._rng = np.random.default_rng(seed)
+
+    def detect_arrays(self, frame):
+        truth = self.scene.ground_truth()
+        truth[:, :4] += self._rng.normal(0, self.jitter, (len(truth), 4)).astype(np.float32)
+        w, h = self.scene.frame_size
+        truth[:, [0, 2]] = np.clip(truth[:, [0, 2]], 0, w - 1)
+        truth[:, [1, 3]] = np.clip(truth[:, [1, 3]], 0, h - 1)
+        return Detections.from_array(truth[self._rng.random(len(truth)) >= self.miss_rate], self.class_names)
+
+    def detect_batch_arrays(self, frames):
+        return [self.detect_arrays(frame) for frame in frames]
+
+
+def run_scenario(num_persons, ppe_per_person, speed, num_frames, frame_size, warmup_frames, seed):
+    """
+    Runs the pipeline stage by stage on a synthetic scene.
+    :return: Dict stage -> array of per-frame milliseconds (warm-up frames excluded)
+    """
+    scene = SyntheticScene(num_persons, ppe_per_person, speed, frame_size, seed)
+    detector = StubDetector(scene, seed=seed)
+    tracker = ObjectTracker(max_age=30, min_hits=3, iou_threshold=0.3)
+    associator = PPEAssociator(iou_threshold_person_ppe=0.05, helmet_y_offset_factor=0.15, vest_overlap_factor=0.3)
+    compliance_checker = SafetyComplianceChecker(require_helmet=True, require_vest=True)
+
+    timings = {stage: [] for stage in STAGES}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        writer = cv2.VideoWriter(os.path.join(tmp_dir, 'bench.avi'), cv2.VideoWriter_fourcc(*'MJPG'), 25, frame_size)
+        try:
+            for frame_idx in range(warmup_frames + num_frames):
+                scene.step()
+                frame = scene.render()
+
+                start = time.perf_counter()
+                detections = detector.detect_arrays(frame)
+                t_detect = time.perf_counter()
+                all_tracked_objects = tracker.update(detections)
+                associator.forget_tracks(tracker.expired_track_ids)
+                tracked_persons = [obj for obj in all_tracked_objects if obj[6] == 'person']
+                t_track = time.perf_counter()
+                associations = associator.associate_ppe_to_persons(tracked_persons, all_tracked_objects)
+                t_associate = time.perf_counter()
+                violations = compliance_checker.check_ppe_compliance(associations)
+                t_check = time.perf_counter()
+                output_frame = DEFAULT_RENDERER.draw(frame.copy(), tracked_persons, associations,
+                                                     violations, all_tracked_objects)
+                t_draw = time.perf_counter()
+                writer.write(output_frame)
+                t_encode = time.perf_counter()
+
+                if frame_idx >= warmup_frames:
+                    marks = (start, t_detect, t_track, t_associate, t_check, t_draw, t_encode)
+                    for stage, begin, end in zip(STAGES, marks[:-1], marks[1:]):
+                        timings[stage].append((end - begin) * 1000.0)
+        finally:
+            writer.release()
+    return {stage: np.array(values) for stage, values in timings.items()}
+
+
+def summarize(timings):
+    total = sum(timings.values())
+    summary = {}
+    for stage, values in list(timings.items()) + [('total', total)]:
+        summary[stage] = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+        summary[stage]['mean'] = float(values.mean())
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(name, summary, baseline=None):
+    print(f"\n{name}")
+    print(f"{'stage':>10} " + ' '.join(f"{'p%d ms' % p:>9}" for p in PERCENTILES) + (f" {'p50 change':>11}" if baseline else ''))
+    for stage, stats in summary.items():
+        line = f"{stage:>10} " + ' '.join(f"{stats['p%d' % p]:>9.3f}" for p in PERCENTILES)
+        if baseline and stage in baseline and baseline[stage]['p50'] > 0:
+            line += f" {100.0 * (stats['p50'] / baseline[stage]['p50'] - 1):>10.1f}%"
+        print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark on synthetic scenes.")
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--persons', type=int, help="Run a single custom scenario with this many persons.")
+    parser.add_argument('--ppe-per-person', type=int, default=2, choices=[0, 1, 2])
+    parser.add_argument('--speed', type=float, default=3.0, help="Person speed in pixels per frame (custom scenario).")
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_pipeline_results.json')
+    parser.add_argument('--compare', help="Earlier results file to compare p50 latencies against.")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.persons is not None:
+        scenarios = {'custom': (args.persons, args.ppe_per_person, args.speed)}
+    else:
+        scenarios = {name: SCENARIOS[name] for name in args.scenarios}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['scenarios']
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'frames': args.frames,
+        'frame_size': [args.width, args.height],
+        'seed': args.seed,
+        'scenarios': {},
+    }
+    for name, (num_persons, ppe_per_person, speed) in scenarios.items():
+        timings = run_scenario(num_persons, ppe_per_person, speed, args.frames,
+                               (args.width, args.height), args.warmup, args.seed)
+        summary = summarize(timings)
+        results['scenarios'][name] = dict(summary, config={'persons': num_persons, 'ppe_per_person': ppe_per_person,
+                                                           'speed': speed})
+        print_summary(f"{name}: {num_persons} persons, {ppe_per_person} PPE each, speed {speed}", summary,
+                      baseline.get(name) if baseline else None)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
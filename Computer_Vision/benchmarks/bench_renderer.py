@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import numpy as np
+
+# --- Setup paths ---
+# Make the pipeline packages in src/ importable when run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from project_utils.overlay_renderer import DEFAULT_RENDERER
+from project_utils.video_utils import draw_tracked_ppe_status
+
+# Drawing cost against the number of persons on screen: the per-label
+# draw_tracked_ppe_status versus the single-pass OverlayRenderer.
+# Every person has a helmet and a vest, every third one is non-compliant.
+# Pixel parity of the two is checked in tests/test_overlay_renderer.py.
+
+PERSON_COUNTS = [5, 20, 80, 200]
+NUM_FRAMES = 30
+FRAME_SIZE = (1920, 1080)
+
+
+def make_scene(num_persons, rng):
+    w, h = FRAME_SIZE
+    tracked_persons, all_tracked_objects, violations = [], [], {}
+    for person_id in range(1, num_persons + 1):
+        x, y = rng.uniform(0, w - 80), rng.uniform(80, h - 200)
+        person = [x, y, x + 80, y + 200, person_id, 0, 'person']
+        tracked_persons.append(person)
+        all_tracked_objects.append(person)
+        all_tracked_objects.append([x + 20, y - 20, x + 60, y + 10, 1000 + person_id, 1, 'helmet'])
+        all_tracked_objects.append([x + 10, y + 60, x + 70, y + 140, 2000 + person_id, 2, 'vest'])
+        if person_id % 3 == 0:
+            violations[person_id] = {'missing_helmet': True}
+    return tracked_persons, {}, violations, all_tracked_objects
+
+
+def bench(draw, scene, frame):
+    timings = []
+    for _ in range(NUM_FRAMES):
+        output_frame = frame.copy() # Both renderers draw in place on a copy, as render_frame does
+        start = time.perf_counter()
+        draw(output_frame, *scene)
+        timings.append(time.perf_counter() - start)
+    timings_ms = np.array(timings) * 1000.0
+    return np.median(timings_ms), np.percentile(timings_ms, 95)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=(FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+    print(f"Overlay drawing on {FRAME_SIZE[0]}x{FRAME_SIZE[1]} frames, {NUM_FRAMES} frames per scene")
+    print(f"{'renderer':>10} {'persons':>8} {'median ms':>10} {'p95 ms':>10}")
+    for num_persons in PERSON_COUNTS:
+        scene = make_scene(num_persons, rng)
+        for name, draw in (('per-label', draw_tracked_ppe_status), ('overlay', DEFAULT_RENDERER.draw)):
+            median_ms, p95_ms = bench(draw, scene, frame)
+            print(f"{name:>10} {num_persons:>8} {median_ms:>10.3f} {p95_ms:>10.3f}")
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import numpy as np
+
+# --- Setup paths ---
+# Make the pipeline packages in src/ importable when run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from tracking.object_tracker import MOTION_MODELS, ObjectTracker
+
+OBJECT_COUNTS = [10, 100, 500]
+NUM_FRAMES = 50
+FRAME_SIZE = (1920, 1080)
+CLASS_NAMES = ['helmet', 'no-helmet', 'no-vest', 'person', 'vest']
+
+
+def make_scene(num_objects, rng):
+    """Random boxes with a small constant velocity per object."""
+    w, h = FRAME_SIZE
+    sizes = rng.uniform(20, 120, size=(num_objects, 2))
+    origins = rng.uniform(0, 1, size=(num_objects, 2)) * (np.array([w, h]) - sizes)
+    velocities = rng.uniform(-3, 3, size=(num_objects, 2))
+    cls_ids = rng.integers(0, len(CLASS_NAMES), size=num_objects)
+    return origins, sizes, velocities, cls_ids
+
+
+def frame_detections(origins, sizes, velocities, cls_ids, frame_idx, rng):
+    top_left = origins + velocities * frame_idx + rng.normal(0, 1.0, size=origins.shape)
+    boxes = np.concatenate((top_left, top_left + sizes), axis=1)
+    return [[x1, y1, x2, y2, 0.9, int(c), CLASS_NAMES[int(c)]]
+            for (x1, y1, x2, y2), c in zip(boxes.tolist(), cls_ids.tolist())]
+
+
+def bench(num_objects, motion_model):
+    rng = np.random.default_rng(0)
+    scene = make_scene(num_objects, rng)
+    frames = [frame_detections(*scene, frame_idx, rng) for frame_idx in range(NUM_FRAMES)]
+
+    tracker = ObjectTracker(max_age=30, min_hits=3, iou_threshold=0.3, motion_model=motion_model)
+    tracker.update(frames[0]) # Warm-up frame creates the initial tracks
+    timings = []
+    for detections in frames[1:]:
+        start = time.perf_counter()
+        tracker.update(detections)
+        timings.append(time.perf_counter() - start)
+    timings_ms = np.array(timings) * 1000.0
+    return np.median(timings_ms), np.percentile(timings_ms, 95), tracker.track_id_count
+
+
+if __name__ == '__main__':
+    print(f"ObjectTracker.update over {NUM_FRAMES} frames per scene")
+    print(f"{'motion':>8} {'objects':>8} {'median ms':>10} {'p95 ms':>10} {'track ids':>10}")
+    for motion_model in MOTION_MODELS:
+        for num_objects in OBJECT_COUNTS:
+            median_ms, p95_ms, id_count = bench(num_objects, motion_model)
+            print(f"{motion_model:>8} {num_objects:>8} {median_ms:>10.3f} {p95_ms:>10.3f} {id_count:>10}")
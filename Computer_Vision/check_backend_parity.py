@@ -0,0 +1,126 @@
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+# Parity check between two PPEDetector backends on the frames of a video,
+# normally the torch model (best.pt or best.torchscript) against its ONNX
+# export run with ONNX Runtime:
+#
+#   python check_backend_parity.py --video sample_videos/video_test.mp4 \
+#       --reference models/best.pt --candidate models/best.onnx
+#
+# Parity is measured by IoU, not exact equality: detections are matched per
+# class by IoU, and the check fails if a frame has a different number of
+# detections per class, or if a matched pair differs by more than the box /
+# confidence tolerances. The backends cannot agree exactly, because the
+# torch.hub model letterboxes to a stride-rounded rectangle (640 x 384 for a
+# 16:9 frame) while the exports take their fixed input size (640 x 640).
+#
+# This script needs a video and both models. The pre- and post-processing the
+# exports share is pinned by the automated tests in tests/test_backend_parity.py
+# (python -m pytest tests), which skip the torch comparison without torch.
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from detection.ppe_detector import PPEDetector
+from tracking.object_tracker import iou_batch, linear_assignment
+
+
+def read_frames(video_path, max_frames, stride):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    frame_idx = 0
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_idx % stride == 0:
+            frames.append(frame)
+        frame_idx += 1
+    cap.release()
+    return frames
+
+
+def run_backend(detector, frames, batch_size):
+    """:return: (list of Detections per frame, seconds per frame)"""
+    detector.detect_batch_arrays(frames[:batch_size]) # Warm-up
+    start = time.perf_counter()
+    detections = []
+    for i in range(0, len(frames), batch_size):
+        detections.extend(detector.detect_batch_arrays(frames[i:i + batch_size]))
+    return detections, (time.perf_counter() - start) / max(len(frames), 1)
+
+
+def compare_frame(reference, candidate, min_iou):
+    """
+    Matches detections of the same class by IoU.
+    :return: (number of unmatched detections, max box coordinate diff, max confidence diff)
+    """
+    unmatched = 0
+    max_box_diff, max_conf_diff = 0.0, 0.0
+    for cls_id in np.union1d(reference.cls_id, candidate.cls_id):
+        ref_idx = np.flatnonzero(reference.cls_id == cls_id)
+        cand_idx = np.flatnonzero(candidate.cls_id == cls_id)
+        if len(ref_idx) == 0 or len(cand_idx) == 0:
+            unmatched += len(ref_idx) + len(cand_idx)
+            continue
+        iou = iou_batch(reference.xyxy[ref_idx], candidate.xyxy[cand_idx])
+        matches = [(r, c) for r, c in linear_assignment(iou) if iou[r, c] >= min_iou]
+        unmatched += len(ref_idx) + len(cand_idx) - 2 * len(matches)
+        for r, c in matches:
+            ref_row, cand_row = ref_idx[r], cand_idx[c]
+            max_box_diff = max(max_box_diff, float(np.abs(reference.xyxy[ref_row] - candidate.xyxy[cand_row]).max()))
+            max_conf_diff = max(max_conf_diff, abs(float(reference.conf[ref_row]) - float(candidate.conf[cand_row])))
+    return unmatched, max_box_diff, max_conf_diff
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the detections of two PPEDetector backends.")
+    parser.add_argument('--video', required=True)
+    parser.add_argument('--reference', default=os.path.join(PROJECT_ROOT, 'models', 'best.pt'))
+    parser.add_argument('--candidate', default=os.path.join(PROJECT_ROOT, 'models', 'best.onnx'))
+    parser.add_argument('--conf', type=float, default=0.4)
+    parser.add_argument('--frames', type=int, default=100, help="Number of frames to compare.")
+    parser.add_argument('--stride', type=int, default=5, help="Use every n-th frame of the video.")
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=None, help="Intra-op threads for both backends.")
+    parser.add_argument('--box-tol', type=float, default=2.0, help="Max box coordinate difference in pixels.")
+    parser.add_argument('--conf-tol', type=float, default=0.02)
+    parser.add_argument('--min-iou', type=float, default=0.5, help="IoU needed to pair two detections.")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames, args.stride)
+    if not frames:
+        print(f"ERROR: No frames read from {args.video}")
+        sys.exit(1)
+
+    results = {}
+    for role, model_path in (('reference', args.reference), ('candidate', args.candidate)):
+        detector = PPEDetector(model_path, confidence_threshold=args.conf, num_threads=args.threads)
+        if detector.model is None:
+            print(f"ERROR: Could not load the {role} model {model_path}")
+            sys.exit(1)
+        detections, seconds_per_frame = run_backend(detector, frames, args.batch_size)
+        results[role] = detections
+        print(f"{role:>9}: {detector.backend:<11} startup {detector.startup_seconds:.2f}s, "
+              f"{seconds_per_frame * 1000:.1f} ms/frame, {sum(len(d) for d in detections)} detections")
+
+    mismatched_frames = 0
+    worst_box, worst_conf = 0.0, 0.0
+    for frame_idx, (reference, candidate) in enumerate(zip(results['reference'], results['candidate'])):
+        unmatched, box_diff, conf_diff = compare_frame(reference, candidate, args.min_iou)
+        worst_box, worst_conf = max(worst_box, box_diff), max(worst_conf, conf_diff)
+        if unmatched:
+            mismatched_frames += 1
+            print(f"Frame {frame_idx * args.stride}: {len(reference)} vs {len(candidate)} detections, "
+                  f"{unmatched} unmatched")
+
+    print(f"Compared {len(frames)} frames: {mismatched_frames} with unmatched detections, "
+          f"max box diff {worst_box:.2f}px, max conf diff {worst_conf:.4f}")
+    passed = mismatched_frames == 0 and worst_box <= args.box_tol and worst_conf <= args.conf_tol
+    print("PASS" if passed else "FAIL")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import sys
+import time
+import torch
+
+# One-time export of the YOLOv5 checkpoint into a self-contained TorchScript
+# or ONNX artifact. The checkpoint is unpickled the same way inspect_checkpoint.py does
+# it (yolov5 repo on sys.path so 'models.yolo' resolves); the artifact written
+# here no longer needs the repo, torch.hub or any CWD change to load.
+#
+#   python export_detector.py                      # models/best.pt -> models/best.torchscript
+#   python export_detector.py --img-size 384 640   # rectangular input for 16:9 video
+#   python export_detector.py --format onnx        # models/best.onnx for the ONNX Runtime CPU backend
+#
+# Pass the .torchscript / .onnx path as the model path of PPEDetector / main_app.
+
+# --- Setup paths ---
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+MODEL_FILE_PATH = os.path.join(PROJECT_ROOT, 'models', 'best.pt')
+YOLOV5_REPO_PATH = os.path.join(PROJECT_ROOT, 'yolov5')
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from detection.exported_model import EXPORT_CONFIG_FILE, TorchScriptYoloModel
+from detection.onnx_model import ONNX_CONFIG_KEY
+
+EXPORT_FORMATS = {'torchscript': '.torchscript', 'onnx': '.onnx'}
+ONNX_OPSET = 12
+
+
+def load_checkpoint_model(weights_path):
+    """Unpickles the YOLOv5 model from a training checkpoint, fused and in float32 eval mode."""
+    if YOLOV5_REPO_PATH not in sys.path:
+        sys.path.insert(0, YOLOV5_REPO_PATH) # The pickled model refers to classes in yolov5's 'models' package
+    ckpt = torch.load(weights_path, map_location='cpu') # weights_only defaults to False
+    model = (ckpt.get('ema') or ckpt['model']) if isinstance(ckpt, dict) else ckpt
+    model = model.float()
+    if hasattr(model, 'fuse'):
+        model = model.fuse() # Folds BatchNorm into the convolutions
+    model.eval()
+    for module in model.modules():
+        if type(module).__name__ == 'Detect':
+            # Return the single concatenated [B, N, 5 + num_classes] tensor, as in yolov5's export.py
+            module.inplace = False
+            module.export = True
+    return model
+
+
+def export(weights_path, output_path, img_size, batch_size, export_format='torchscript'):
+    """
+    :param batch_size: Batch size the network is traced with. For ONNX, 0 exports a dynamic batch dimension.
+    :return: The config stored with the artifact
+    """
+    model = load_checkpoint_model(weights_path)
+    names = model.names if isinstance(model.names, list) else [model.names[i] for i in sorted(model.names)]
+    stride = int(max(model.stride))
+    if img_size[0] % stride or img_size[1] % stride:
+        raise ValueError(f"--img-size {img_size} must be a multiple of the model stride {stride}.")
+
+    dummy = torch.zeros(max(batch_size, 1), 3, *img_size)
+    config = {
+        'names': names,
+        'stride': stride,
+        'img_size': list(img_size),
+        'batch_size': batch_size or None,
+        'source_weights': os.path.basename(weights_path),
+        'torch_version': torch.__version__,
+    }
+    with torch.no_grad():
+        model(dummy) # Dry run builds the detection grids for this input size
+        if export_format == 'onnx':
+            _export_onnx(model, dummy, output_path, config)
+        else:
+            traced = torch.jit.trace(model, dummy, strict=False)
+            torch.jit.save(traced, output_path, _extra_files={EXPORT_CONFIG_FILE: json.dumps(config)})
+    return config
+
+
+def _export_onnx(model, dummy, output_path, config):
+    import onnx # Only needed to write the artifact, not to run it
+    dynamic_axes = None if config['batch_size'] else {'images': {0: 'batch'}, 'output0': {0: 'batch'}}
+    torch.onnx.export(model, dummy, output_path, opset_version=ONNX_OPSET, do_constant_folding=True,
+                      input_names=['images'], output_names=['output0'], dynamic_axes=dynamic_axes)
+    # The same config as the TorchScript extra file, as ONNX model metadata
+    onnx_model = onnx.load(output_path)
+    entry = onnx_model.metadata_props.add()
+    entry.key, entry.value = ONNX_CONFIG_KEY, json.dumps(config)
+    onnx.checker.check_model(onnx_model)
+    onnx.save(onnx_model, output_path)
+
+
+def load_artifact(path):
+    if path.endswith('.onnx'):
+        from detection.onnx_model import OnnxYoloModel
+        return OnnxYoloModel(path)
+    return TorchScriptYoloModel(path, torch.device('cpu'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export best.pt to a TorchScript or ONNX artifact for PPEDetector.")
+    parser.add_argument('--weights', default=MODEL_FILE_PATH)
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='torchscript')
+    parser.add_argument('--output', default=None,
+                        help="Defaults to the weights path with a .torchscript / .onnx suffix.")
+    parser.add_argument('--img-size', type=int, nargs=2, default=[640, 640], metavar=('HEIGHT', 'WIDTH'),
+                        help="Network input size; frames are letterboxed to it.")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Batch size the network is traced with (ONNX only: 0 = dynamic).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.weights):
+        print(f"ERROR: Model file not found: {args.weights}")
+        sys.exit(1)
+    if not os.path.isdir(YOLOV5_REPO_PATH):
+        print(f"ERROR: YOLOv5 repo not found: {YOLOV5_REPO_PATH}")
+        sys.exit(1)
+    if args.batch_size < 0 or (args.batch_size == 0 and args.format != 'onnx'):
+        print("ERROR: --batch-size must be positive (0, a dynamic batch, is only supported for ONNX).")
+        sys.exit(1)
+    output_path = args.output or os.path.splitext(args.weights)[0] + EXPORT_FORMATS[args.format]
+
+    start = time.perf_counter()
+    config = export(args.weights, output_path, tuple(args.img_size), args.batch_size, args.format)
+    print(f"Exported {args.weights} -> {output_path} in {time.perf_counter() - start:.1f}s")
+    print(f"Classes: {config['names']}, input {config['img_size']}, batch {config['batch_size'] or 'dynamic'}")
+
+    # Startup of the artifact, for comparison with the torch.hub load
+    start = time.perf_counter()
+    load_artifact(output_path)
+    print(f"Artifact loads in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,236 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+# INT8 quantization of the ONNX export (export_detector.py --format onnx) for
+# CPU edge boxes, with ONNX Runtime's quantization tools:
+#
+#   python quantize_detector.py --calib-dir calib_frames/            # static, models/best.onnx -> models/best.int8.onnx
+#   python quantize_detector.py --calib-dir calib_frames/ --mode dynamic
+#
+# Static mode calibrates activation ranges on a folder of sample frames (a few
+# hundred site frames covering lighting and distance are enough); dynamic mode
+# only quantizes weights and needs no calibration. Only convolutions are
+# quantized: the Detect head decoding (sigmoid, grid offsets, anchors) stays
+# FP32, since quantizing box coordinates costs far more accuracy than time.
+#
+# The script then runs both models on the evaluation frames (the calibration
+# frames unless --eval-dir is given) and reports, per class, how many FP32
+# detections the INT8 model reproduces, plus CPU throughput of both. The
+# INT8 model loads in PPEDetector like any other .onnx file.
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+FP32_MODEL_PATH = os.path.join(PROJECT_ROOT, 'models', 'best.onnx')
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from detection.onnx_model import ONNX_CONFIG_KEY, OnnxYoloModel
+from detection.postprocess import iter_fixed_batches, preprocess_batch
+from detection.ppe_detector import PPEDetector
+from tracking.object_tracker import iou_batch, linear_assignment
+
+
+def list_frames(frame_dir, max_frames=None):
+    paths = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(frame_dir, pattern)))
+    return paths[:max_frames] if max_frames else paths
+
+
+def load_frames(paths):
+    frames = [cv2.imread(path) for path in paths]
+    return [frame for frame in frames if frame is not None]
+
+
+class FrameCalibrationReader:
+    """Feeds letterboxed calibration frames to ONNX Runtime's calibrator, one network batch at a time."""
+    def __init__(self, frame_paths, model_path):
+        model = OnnxYoloModel(model_path)
+        self.input_name = model.input_name
+        self.input_shape = model.input_shape
+        self.batch_size = model.batch_size or 1
+        self.frame_paths = frame_paths
+        self._batches = None
+
+    def _iter_batches(self):
+        for start in range(0, len(self.frame_paths), self.batch_size):
+            # Frames are read lazily so a large calibration set does not sit in memory
+            frames = load_frames(self.frame_paths[start:start + self.batch_size])
+            if not frames:
+                continue
+            batch, _ = preprocess_batch(frames, self.input_shape)
+            for chunk, _ in iter_fixed_batches(batch, self.batch_size):
+                yield {self.input_name: chunk}
+
+    def get_next(self):
+        if self._batches is None:
+            self._batches = self._iter_batches()
+        return next(self._batches, None)
+
+    def rewind(self):
+        self._batches = None
+
+
+def quantize(fp32_path, int8_path, mode, calib_paths=None, calibrate_method='minmax', per_channel=True):
+    from onnxruntime import quantization # Optional dependency, only needed to quantize
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Shape inference and graph cleanup first, as recommended by ONNX Runtime
+        # (ONNX's own shape inference is enough for a CNN; the symbolic one needs sympy)
+        prepared_path = os.path.join(tmp_dir, 'prepared.onnx')
+        quantization.quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+        if mode == 'dynamic':
+            quantization.quantize_dynamic(prepared_path, int8_path, op_types_to_quantize=['Conv'],
+                                          per_channel=per_channel, weight_type=quantization.QuantType.QInt8)
+        else:
+            methods = {
+                'minmax': quantization.CalibrationMethod.MinMax,
+                'entropy': quantization.CalibrationMethod.Entropy,
+                'percentile': quantization.CalibrationMethod.Percentile,
+            }
+            quantization.quantize_static(prepared_path, int8_path, FrameCalibrationReader(calib_paths, fp32_path),
+                                         quant_format=quantization.QuantFormat.QDQ,
+                                         op_types_to_quantize=['Conv'], per_channel=per_channel,
+                                         activation_type=quantization.QuantType.QUInt8,
+                                         weight_type=quantization.QuantType.QInt8,
+                                         calibrate_method=methods[calibrate_method])
+    _copy_config(fp32_path, int8_path, {'quantization': f"int8-{mode}",
+                                        'calibration_frames': len(calib_paths) if calib_paths else 0})
+
+
+def _copy_config(fp32_path, int8_path, extra):
+    """Carries the detector config (class names, input size) over to the quantized model."""
+    import onnx
+    config = json.loads({prop.key: prop.value for prop in onnx.load(fp32_path).metadata_props}[ONNX_CONFIG_KEY])
+    config.update(extra)
+    int8_model = onnx.load(int8_path)
+    props = {prop.key: prop for prop in int8_model.metadata_props}
+    entry = props.get(ONNX_CONFIG_KEY) or int8_model.metadata_props.add()
+    entry.key, entry.value = ONNX_CONFIG_KEY, json.dumps(config)
+    onnx.save(int8_model, int8_path)
+
+
+def measure(detector, frames, repeats):
+    """:return: (list of Detections per frame, seconds per frame)"""
+    detections = [detector.detect_arrays(frame) for frame in frames]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            detector.detect_arrays(frame)
+    return detections, (time.perf_counter() - start) / max(len(frames) * repeats, 1)
+
+
+def compare_per_class(fp32_detections, int8_detections, class_names, min_iou):
+    """
+    Scores the INT8 detections against the FP32 ones as reference, per class:
+    a detection is reproduced if the other model has one of the same class with IoU >= min_iou.
+    :return: {class_name: {'fp32', 'int8', 'matched', 'recall', 'precision', 'mean_conf_diff'}}
+    """
+    stats = {name: {'fp32': 0, 'int8': 0, 'matched': 0, 'conf_diff_sum': 0.0} for name in class_names}
+    for reference, candidate in zip(fp32_detections, int8_detections):
+        for cls_id, name in enumerate(class_names):
+            ref_idx = np.flatnonzero(reference.cls_id == cls_id)
+            cand_idx = np.flatnonzero(candidate.cls_id == cls_id)
+            class_stats = stats[name]
+            class_stats['fp32'] += len(ref_idx)
+            class_stats['int8'] += len(cand_idx)
+            if len(ref_idx) == 0 or len(cand_idx) == 0:
+                continue
+            iou = iou_batch(reference.xyxy[ref_idx], candidate.xyxy[cand_idx])
+            for r, c in linear_assignment(iou):
+                if iou[r, c] >= min_iou:
+                    class_stats['matched'] += 1
+                    class_stats['conf_diff_sum'] += float(candidate.conf[cand_idx[c]] - reference.conf[ref_idx[r]])
+
+    for class_stats in stats.values():
+        matched = class_stats['matched']
+        class_stats['recall'] = matched / class_stats['fp32'] if class_stats['fp32'] else None
+        class_stats['precision'] = matched / class_stats['int8'] if class_stats['int8'] else None
+        class_stats['mean_conf_diff'] = class_stats.pop('conf_diff_sum') / matched if matched else None
+    return stats
+
+
+def format_quantization_report(report):
+    """Returns the comparison as a text table, one class per line."""
+    def fmt(value, width, spec):
+        return format(format(value, spec) if value is not None else '-', f'>{width}')
+
+    lines = [f"{'class':<12} {'fp32':>6} {'int8':>6} {'recall':>7} {'precision':>9} {'conf diff':>10}"]
+    for name, stats in report['classes'].items():
+        lines.append(f"{name:<12} {stats['fp32']:>6} {stats['int8']:>6} {fmt(stats['recall'], 7, '.3f')} "
+                     f"{fmt(stats['precision'], 9, '.3f')} {fmt(stats['mean_conf_diff'], 10, '+.4f')}")
+    fp32, int8 = report['throughput']['fp32'], report['throughput']['int8']
+    lines.append(f"CPU throughput ({report['threads'] or 'default'} threads): "
+                 f"FP32 {fp32['ms_per_frame']:.1f} ms/frame ({fp32['fps']:.1f} FPS), "
+                 f"INT8 {int8['ms_per_frame']:.1f} ms/frame ({int8['fps']:.1f} FPS), "
+                 f"speedup x{fp32['ms_per_frame'] / int8['ms_per_frame']:.2f}")
+    lines.append(f"Model size: FP32 {report['size_mb']['fp32']:.1f} MB, INT8 {report['size_mb']['int8']:.1f} MB")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Quantize the ONNX detector to INT8 and compare it with FP32 on CPU.")
+    parser.add_argument('--model', default=FP32_MODEL_PATH, help="FP32 ONNX model from export_detector.py.")
+    parser.add_argument('--output', default=None, help="Defaults to the model path with an .int8.onnx suffix.")
+    parser.add_argument('--mode', choices=['static', 'dynamic'], default='static')
+    parser.add_argument('--calib-dir', default=None, help="Folder of sample frames (required for static mode).")
+    parser.add_argument('--calib-frames', type=int, default=300, help="Max calibration frames used.")
+    parser.add_argument('--calibrate-method', choices=['minmax', 'entropy', 'percentile'], default='minmax')
+    parser.add_argument('--no-per-channel', action='store_true', help="Per-tensor instead of per-channel weights.")
+    parser.add_argument('--eval-dir', default=None, help="Frames for the comparison (default: the calibration frames).")
+    parser.add_argument('--eval-frames', type=int, default=100)
+    parser.add_argument('--conf', type=float, default=0.4)
+    parser.add_argument('--min-iou', type=float, default=0.5, help="IoU needed to pair an INT8 and an FP32 detection.")
+    parser.add_argument('--threads', type=int, default=None, help="Intra-op threads for the throughput comparison.")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed passes over the evaluation frames.")
+    parser.add_argument('--report', default=None, help="Optional path for the report as JSON.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"ERROR: Model file not found: {args.model} (run export_detector.py --format onnx first)")
+        sys.exit(1)
+    calib_paths = list_frames(args.calib_dir, args.calib_frames) if args.calib_dir else []
+    if args.mode == 'static' and not calib_paths:
+        print("ERROR: Static quantization needs --calib-dir with sample frames.")
+        sys.exit(1)
+    output_path = args.output or os.path.splitext(args.model)[0] + '.int8.onnx'
+
+    start = time.perf_counter()
+    quantize(args.model, output_path, args.mode, calib_paths, args.calibrate_method, not args.no_per_channel)
+    print(f"Quantized {args.model} -> {output_path} ({args.mode}, {len(calib_paths)} calibration frames) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    eval_paths = list_frames(args.eval_dir, args.eval_frames) if args.eval_dir else calib_paths[:args.eval_frames]
+    eval_frames = load_frames(eval_paths)
+    if not eval_frames:
+        print("No evaluation frames (pass --eval-dir); skipping the comparison.")
+        sys.exit(0)
+
+    detections, throughput = {}, {}
+    class_names = ()
+    for precision, model_path in (('fp32', args.model), ('int8', output_path)):
+        detector = PPEDetector(model_path, confidence_threshold=args.conf, num_threads=args.threads)
+        if detector.model is None:
+            print(f"ERROR: Could not load the {precision} model {model_path}")
+            sys.exit(1)
+        class_names = detector.class_names
+        detections[precision], seconds_per_frame = measure(detector, eval_frames, args.repeats)
+        throughput[precision] = {'ms_per_frame': seconds_per_frame * 1000, 'fps': 1.0 / seconds_per_frame}
+
+    report = {
+        'mode': args.mode,
+        'eval_frames': len(eval_frames),
+        'threads': args.threads,
+        'classes': compare_per_class(detections['fp32'], detections['int8'], class_names, args.min_iou),
+        'throughput': throughput,
+        'size_mb': {'fp32': os.path.getsize(args.model) / 1e6, 'int8': os.path.getsize(output_path) / 1e6},
+    }
+    print(format_quantization_report(report))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
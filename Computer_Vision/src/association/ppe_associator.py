@@ -1,10 +1,30 @@
 import numpy as np
+from association.ppe_status_smoother import PPEStatusSmoother
+
+PPE_CLASS_NAMES = ('helmet', 'no-helmet', 'vest', 'no-vest')
 
 class PPEAssociator:
-    def __init__(self, iou_threshold_person_ppe=0.1, helmet_y_offset_factor=0.1, vest_overlap_factor=0.4):
+    def __init__(self, iou_threshold_person_ppe=0.1, helmet_y_offset_factor=0.1, vest_overlap_factor=0.4,
+                 vectorized=True, spatial_index_min_pairs=4096, smoothing_window=0):
+        """
+        :param vectorized: Use the array implementation (same results as the per-person loop).
+        :param spatial_index_min_pairs: With at least this many person x PPE pairs, only
+                                        pairs whose boxes overlap (found via a sorted-interval
+                                        index on x) are evaluated instead of all pairs.
+        :param smoothing_window: If > 0, statuses are voted per person track over this many
+                                frames (see PPEStatusSmoother); 0 uses the current frame only.
+        """
         self.iou_threshold_person_ppe = iou_threshold_person_ppe
         self.helmet_y_offset_factor = helmet_y_offset_factor # For helmet relative position to person's head
         self.vest_overlap_factor = vest_overlap_factor # For vest relative position to person's torso
+        self.vectorized = vectorized
+        self.spatial_index_min_pairs = spatial_index_min_pairs
+        self.smoother = PPEStatusSmoother(window=smoothing_window) if smoothing_window > 0 else None
+
+    def forget_tracks(self, track_ids):
+        """Drops any per-track state kept for tracks that ObjectTracker expired."""
+        if self.smoother is not None and len(track_ids) > 0:
+            self.smoother.forget(track_ids)
 
     def _calculate_iou(self, boxA, boxB):
         # Determine the (x, y)-coordinates of the intersection rectangle
@@ -30,6 +50,175 @@ class PPEAssociator:
         iou = interArea / (denominator + 1e-6) # Add epsilon to avoid division by zero
         return iou
 
+    def _pair_iou(self, boxes_a, boxes_b):
+        """
+        IoU of row-aligned box arrays [N, 4] with the same arithmetic as _calculate_iou.
+        """
+        xA = np.maximum(boxes_a[:, 0], boxes_b[:, 0])
+        yA = np.maximum(boxes_a[:, 1], boxes_b[:, 1])
+        xB = np.minimum(boxes_a[:, 2], boxes_b[:, 2])
+        yB = np.minimum(boxes_a[:, 3], boxes_b[:, 3])
+        interArea = np.maximum(0, xB - xA) * np.maximum(0, yB - yA)
+        boxAArea = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+        boxBArea = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+        denominator = boxAArea + boxBArea - interArea
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iou = interArea / (denominator + 1e-6)
+        return np.where(denominator == 0, 0., iou)
+
+    def _candidate_pairs(self, person_boxes, ppe_boxes):
+        """
+        Returns (person_idx, ppe_idx) arrays of the pairs to evaluate.
+        Small problems use every pair. Larger ones use a sorted-interval index:
+        PPE boxes sorted by x1, so for each person only the PPE boxes with
+        x1 in [px1 - max_ppe_width, px2) can overlap it; those ranges come from
+        one searchsorted call, and pairs that do not overlap on y are dropped.
+        Pairs with no overlap have IoU 0 and can never be associated.
+        """
+        num_persons, num_ppe = len(person_boxes), len(ppe_boxes)
+        if num_persons * num_ppe < self.spatial_index_min_pairs:
+            person_idx, ppe_idx = np.meshgrid(np.arange(num_persons), np.arange(num_ppe), indexing='ij')
+            return person_idx.ravel(), ppe_idx.ravel()
+
+        order = np.argsort(ppe_boxes[:, 0], kind='stable')
+        x1_sorted = ppe_boxes[order, 0]
+        max_width = np.max(ppe_boxes[:, 2] - ppe_boxes[:, 0])
+        lo = np.searchsorted(x1_sorted, person_boxes[:, 0] - max_width, side='left')
+        hi = np.searchsorted(x1_sorted, person_boxes[:, 2], side='left')
+        counts = np.maximum(hi - lo, 0)
+
+        # Expand the [lo, hi) range of every person into flat pair arrays
+        person_idx = np.repeat(np.arange(num_persons), counts)
+        starts = np.repeat(lo - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        ppe_idx = order[starts + np.arange(counts.sum())]
+
+        overlap = (ppe_boxes[ppe_idx, 2] > person_boxes[person_idx, 0]) & \
+                  (ppe_boxes[ppe_idx, 1] < person_boxes[person_idx, 3]) & \
+                  (ppe_boxes[ppe_idx, 3] > person_boxes[person_idx, 1])
+        return person_idx[overlap], ppe_idx[overlap]
+
+    def _any_match(self, person_boxes, ppe_boxes, rule):
+        """
+        Returns a bool per person telling whether any PPE box satisfies rule.
+        :param rule: Function (person_boxes, ppe_boxes, iou) -> bool mask, on row-aligned pairs.
+        """
+        matched = np.zeros(len(person_boxes), dtype=bool)
+        if len(person_boxes) == 0 or len(ppe_boxes) == 0:
+            return matched
+        person_idx, ppe_idx = self._candidate_pairs(person_boxes, ppe_boxes)
+        p = person_boxes[person_idx]
+        q = ppe_boxes[ppe_idx]
+        mask = rule(p, q, self._pair_iou(p, q))
+        matched[person_idx[mask]] = True
+        return matched
+
+    def _no_helmet_rule(self, p, q, iou):
+        # 'no-helmet' box with decent IoU whose centre is in the top 35% of the person
+        height = p[:, 3] - p[:, 1]
+        center_y = (q[:, 1] + q[:, 3]) / 2
+        return (iou > 0.3) & (p[:, 1] < center_y) & (center_y < p[:, 1] + height * 0.35)
+
+    def _helmet_rule(self, p, q, iou):
+        # Helmet centre slightly above / at the top of the person and within its width
+        height = p[:, 3] - p[:, 1]
+        center_x = (q[:, 0] + q[:, 2]) / 2
+        center_y = (q[:, 1] + q[:, 3]) / 2
+        expected_helmet_y_top = p[:, 1] - height * self.helmet_y_offset_factor
+        expected_helmet_y_bottom = p[:, 1] + height * self.helmet_y_offset_factor * 2
+        return (iou > self.iou_threshold_person_ppe) & (iou > 0) & \
+               (expected_helmet_y_top < center_y) & (center_y < expected_helmet_y_bottom) & \
+               (p[:, 0] < center_x) & (center_x < p[:, 2])
+
+    def _no_vest_rule(self, p, q, iou):
+        # 'no-vest' box with high IoU whose centre is in the middle of the torso
+        height = p[:, 3] - p[:, 1]
+        center_y = (q[:, 1] + q[:, 3]) / 2
+        return (iou > 0.4) & (p[:, 1] + height * 0.2 < center_y) & (center_y < p[:, 3] - height * 0.2)
+
+    def _vest_rule(self, p, q, iou):
+        # Vest centre inside the person box, away from its top and bottom edges
+        height = p[:, 3] - p[:, 1]
+        center_x = (q[:, 0] + q[:, 2]) / 2
+        center_y = (q[:, 1] + q[:, 3]) / 2
+        return (iou > self.vest_overlap_factor) & (iou > 0) & \
+               (p[:, 0] < center_x) & (center_x < p[:, 2]) & \
+               (p[:, 1] + height * 0.1 < center_y) & (center_y < p[:, 3] - height * 0.1)
+
+    def _associate_vectorized(self, tracked_persons, all_tracked_objects):
+        person_ppe_status = {}
+        if len(tracked_persons) == 0:
+            return person_ppe_status
+
+        person_boxes = np.array([person[:4] for person in tracked_persons], dtype=np.float64)
+        class_names = np.array([obj[6] for obj in all_tracked_objects], dtype=object)
+        object_boxes = np.array([obj[:4] for obj in all_tracked_objects], dtype=np.float64).reshape(-1, 4)
+        ppe_boxes = {name: object_boxes[class_names == name] for name in PPE_CLASS_NAMES}
+
+        has_no_helmet = self._any_match(person_boxes, ppe_boxes['no-helmet'], self._no_helmet_rule)
+        has_helmet = self._any_match(person_boxes, ppe_boxes['helmet'], self._helmet_rule)
+        has_no_vest = self._any_match(person_boxes, ppe_boxes['no-vest'], self._no_vest_rule)
+        has_vest = self._any_match(person_boxes, ppe_boxes['vest'], self._vest_rule)
+        return self._build_statuses(tracked_persons, has_no_helmet, has_helmet, has_no_vest, has_vest)
+
+    def _build_statuses(self, tracked_persons, has_no_helmet, has_helmet, has_no_vest, has_vest):
+        person_ppe_status = {}
+        # 'no-helmet' / 'no-vest' take precedence over a matching helmet / vest
+        helmet_status = np.where(has_no_helmet, 'no-helmet', np.where(has_helmet, 'helmet', 'unknown'))
+        vest_status = np.where(has_no_vest, 'no-vest', np.where(has_vest, 'vest', 'unknown'))
+        for person_track, helmet, vest in zip(tracked_persons, helmet_status.tolist(), vest_status.tolist()):
+            px1, py1, px2, py2, person_id = person_track[:5]
+            person_ppe_status[person_id] = {
+                'helmet_status': helmet,
+                'vest_status': vest,
+                'bbox': (px1, py1, px2, py2)
+            }
+        return person_ppe_status
+
+    def _own_match(self, person_boxes, owner_idx, ppe_boxes, rule):
+        """
+        Like _any_match(), but each PPE box is only checked against the one person that owns it.
+        :param owner_idx: Index into person_boxes per PPE box.
+        """
+        matched = np.zeros(len(person_boxes), dtype=bool)
+        if len(ppe_boxes) == 0:
+            return matched
+        p = person_boxes[owner_idx]
+        mask = rule(p, ppe_boxes, self._pair_iou(p, ppe_boxes))
+        matched[owner_idx[mask]] = True
+        return matched
+
+    def associate_ppe_by_person(self, tracked_persons, ppe_by_person):
+        """
+        Two-stage variant of associate_ppe_to_persons(): the PPE detections of each person
+        come from that person's own crop (see PersonCropDetector), so ownership is known and
+        each person is checked against its own detections only, with the same rules,
+        instead of matching every person against every PPE box in the frame.
+        :param ppe_by_person: {person_track_id: Detections in frame coordinates}.
+                              Persons without an entry get 'unknown' statuses.
+        :return: Same as associate_ppe_to_persons()
+        """
+        person_ppe_status = {}
+        if len(tracked_persons) > 0:
+            person_boxes = np.array([person[:4] for person in tracked_persons], dtype=np.float64)
+            owned = [(idx, ppe_by_person.get(person[4])) for idx, person in enumerate(tracked_persons)]
+            owned = [(idx, detections) for idx, detections in owned if detections is not None and len(detections) > 0]
+            matches = {}
+            for class_name, rule in (('no-helmet', self._no_helmet_rule), ('helmet', self._helmet_rule),
+                                     ('no-vest', self._no_vest_rule), ('vest', self._vest_rule)):
+                owner_idx, ppe_boxes = [], []
+                for idx, detections in owned:
+                    boxes = detections.xyxy[detections.cls_id == detections.class_id_of(class_name)]
+                    owner_idx.append(np.full(len(boxes), idx, dtype=np.int64))
+                    ppe_boxes.append(boxes)
+                owner_idx = np.concatenate(owner_idx) if owner_idx else np.zeros(0, dtype=np.int64)
+                ppe_boxes = np.concatenate(ppe_boxes).astype(np.float64) if ppe_boxes else np.zeros((0, 4))
+                matches[class_name] = self._own_match(person_boxes, owner_idx, ppe_boxes, rule)
+            person_ppe_status = self._build_statuses(tracked_persons, matches['no-helmet'], matches['helmet'],
+                                                     matches['no-vest'], matches['vest'])
+        if self.smoother is not None:
+            person_ppe_status = self.smoother.smooth(person_ppe_status)
+        return person_ppe_status
+
     def associate_ppe_to_persons(self, tracked_persons, all_tracked_objects):
         """
         Associate PPE (helmet, vest, no-helmet, no-vest) with each tracked person.
@@ -41,6 +230,18 @@ class PPEAssociator:
                            'vest_status': 'vest'/'no-vest'/'unknown',
                            'bbox': person_box}
         """
+        if self.vectorized:
+            person_ppe_status = self._associate_vectorized(tracked_persons, all_tracked_objects)
+        else:
+            person_ppe_status = self._associate_loop(tracked_persons, all_tracked_objects)
+        if self.smoother is not None:
+            person_ppe_status = self.smoother.smooth(person_ppe_status)
+        return person_ppe_status
+
+    def _associate_loop(self, tracked_persons, all_tracked_objects):
+        """
+        Reference implementation: one pass over every PPE list per person.
+        """
         person_ppe_status = {}
 
         # Separate PPE objects based on class_name (index 6)
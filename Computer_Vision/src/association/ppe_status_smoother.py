@@ -0,0 +1,80 @@
+import numpy as np
+
+HELMET_STATUSES = ('unknown', 'helmet', 'no-helmet')
+VEST_STATUSES = ('unknown', 'vest', 'no-vest')
+_HELMET_CODES = {status: code for code, status in enumerate(HELMET_STATUSES)}
+_VEST_CODES = {status: code for code, status in enumerate(VEST_STATUSES)}
+_EMPTY = -1
+
+
+class PPEStatusSmoother:
+    """
+    Votes each person's helmet/vest status over their last `window` frames, so
+    a single missed detection does not flip a worker to 'unknown' (or to a
+    violation) for one frame.
+
+    Every person track has a fixed-size int8 ring buffer of status codes. The
+    vote is a plurality over the filled slots, with 'unknown' votes weighted by
+    unknown_weight so that real observations win over missed detections. On a
+    tie the current frame's status is kept.
+
+    Memory is bounded: buffers are dropped through forget() when ObjectTracker
+    expires a track, and buffers of persons not seen for max_idle_frames
+    frames are dropped as a fallback.
+    """
+    def __init__(self, window=15, unknown_weight=0.5, max_idle_frames=300):
+        self.window = window
+        self.unknown_weight = unknown_weight
+        self.max_idle_frames = max_idle_frames
+        self._history = {} # person_id -> int8 array [2, window] (helmet row, vest row)
+        self._observations = {} # person_id -> number of frames written to the ring buffer
+        self._last_seen = {} # person_id -> frame counter when last seen
+        self._frame_counter = 0
+
+    def __len__(self):
+        return len(self._history)
+
+    def _vote(self, row, statuses, current_status):
+        counts = np.bincount(row[row != _EMPTY], minlength=len(statuses)).astype(np.float64)
+        counts[0] *= self.unknown_weight # Index 0 is 'unknown'
+        current_code = statuses.index(current_status)
+        if counts[current_code] == counts.max():
+            return current_status
+        return statuses[int(np.argmax(counts))]
+
+    def smooth(self, person_ppe_status):
+        """
+        Records this frame's statuses and returns the voted statuses.
+        :param person_ppe_status: Output of PPEAssociator.associate_ppe_to_persons
+        :return: Dict in the same format with smoothed 'helmet_status' / 'vest_status'
+        """
+        self._frame_counter += 1
+        smoothed = {}
+        for person_id, status in person_ppe_status.items():
+            history = self._history.get(person_id)
+            if history is None:
+                history = np.full((2, self.window), _EMPTY, dtype=np.int8)
+                self._history[person_id] = history
+                self._observations[person_id] = 0
+            slot = self._observations[person_id] % self.window
+            history[0, slot] = _HELMET_CODES[status['helmet_status']]
+            history[1, slot] = _VEST_CODES[status['vest_status']]
+            self._observations[person_id] += 1
+            self._last_seen[person_id] = self._frame_counter
+
+            smoothed[person_id] = dict(status,
+                                       helmet_status=self._vote(history[0], HELMET_STATUSES, status['helmet_status']),
+                                       vest_status=self._vote(history[1], VEST_STATUSES, status['vest_status']))
+
+        if self._frame_counter % self.window == 0:
+            idle = [person_id for person_id, last_seen in self._last_seen.items()
+                    if self._frame_counter - last_seen > self.max_idle_frames]
+            self.forget(idle)
+        return smoothed
+
+    def forget(self, person_ids):
+        """Drops the state of expired tracks."""
+        for person_id in person_ids:
+            self._history.pop(person_id, None)
+            self._observations.pop(person_id, None)
+            self._last_seen.pop(person_id, None)
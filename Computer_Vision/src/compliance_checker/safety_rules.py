@@ -1,3 +1,7 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
 class SafetyComplianceChecker:
     def __init__(self, require_helmet=True, require_vest=True):
         self.require_helmet = require_helmet
@@ -5,7 +9,7 @@ class SafetyComplianceChecker:
 
     def check_ppe_compliance(self, person_ppe_status):
         """
-        Checks PPE compliance for each person and logs violations.
+        Checks PPE compliance for each person. Violations are logged at DEBUG level only.
         :param person_ppe_status: Dictionary from PPEAssociator.
             Example: {person_id: {'helmet_status': 'helmet'/'no-helmet'/'unknown',
                                      'vest_status': 'vest'/'no-vest'/'unknown',
@@ -15,6 +19,7 @@ class SafetyComplianceChecker:
         """
         violations = {}
         violations_found_in_frame = False
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         for person_id, status in person_ppe_status.items():
             person_violations = []
             
@@ -39,13 +44,12 @@ class SafetyComplianceChecker:
                     'violations': person_violations,
                     'bbox': status['bbox']  # Include bbox for drawing or logging
                 }
-                # Log the violation for this person
-                print(f"[VIOLATION LOG] Person ID: {person_id}")
-                for pv in person_violations:
-                    print(f"  - {pv}")
+                # Per-frame logging is debug only; violation events are the real log (see violation_events)
+                if debug_enabled:
+                    logger.debug("[VIOLATION LOG] Person ID: %s - %s", person_id, ", ".join(person_violations))
                 violations_found_in_frame = True
         
-        if not violations_found_in_frame:
-            print("[COMPLIANCE LOG] No PPE violations detected in this frame.")
+        if debug_enabled and not violations_found_in_frame:
+            logger.debug("[COMPLIANCE LOG] No PPE violations detected in this frame.")
             
         return violations
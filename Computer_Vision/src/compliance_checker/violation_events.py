@@ -0,0 +1,241 @@
+import abc
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Violation events instead of per-frame log lines.
+#
+# ViolationEventTracker turns the per-frame output of SafetyComplianceChecker
+# into transitions per (person_id, violation) key:
+#   'start'   the violation appears for a person
+#   'ongoing' reminder every ongoing_interval frames while it lasts (0 turns it off)
+#   'end'     the violation has been absent for more than end_grace_frames frames
+# Events go to a sink (JSONL or SQLite file) that is written by a background
+# thread in batches, so the frame loop never waits on disk I/O. A sink replaces
+# what an earlier run left in its file unless it is opened with append=True.
+# If the writer thread fails, the error is re-raised by the next write() and by close().
+
+_CLOSE = object() # Sentinel telling the writer thread to flush and stop
+
+
+class ViolationEventTracker:
+    def __init__(self, stream=None, end_grace_frames=5, ongoing_interval=300):
+        """
+        :param stream: Optional stream/camera name added to every event.
+        :param end_grace_frames: A violation missing for up to this many frames is not ended,
+                                 so a flickering detection does not produce end/start pairs.
+        :param ongoing_interval: Emit an 'ongoing' event every this many frames (300 = every
+                                 10 s at 30 fps; 0 = never).
+        """
+        self.stream = stream
+        self.end_grace_frames = end_grace_frames
+        self.ongoing_interval = ongoing_interval
+        self._active = {} # (person_id, violation) -> state dict
+
+    def _event(self, event_type, key, state, frame_idx):
+        person_id, violation = key
+        return {
+            'event': event_type,
+            'stream': self.stream,
+            'person_id': int(person_id),
+            'violation': violation,
+            'frame': frame_idx,
+            'start_frame': state['start_frame'],
+            'bbox': [float(v) for v in state['bbox']],
+            'wall_time': time.time(),
+        }
+
+    def update(self, frame_idx, violations):
+        """
+        :param violations: Output of SafetyComplianceChecker.check_ppe_compliance for this frame
+                           ({} if nothing was analysed).
+        :return: List of events caused by this frame
+        """
+        events = []
+        seen = set()
+        for person_id, details in violations.items():
+            for violation in details['violations']:
+                key = (person_id, violation)
+                seen.add(key)
+                state = self._active.get(key)
+                if state is None:
+                    state = {'start_frame': frame_idx, 'last_frame': frame_idx,
+                             'last_emitted': frame_idx, 'bbox': details['bbox']}
+                    self._active[key] = state
+                    events.append(self._event('start', key, state, frame_idx))
+                    continue
+                state['last_frame'] = frame_idx
+                state['bbox'] = details['bbox']
+                if self.ongoing_interval and frame_idx - state['last_emitted'] >= self.ongoing_interval:
+                    state['last_emitted'] = frame_idx
+                    events.append(self._event('ongoing', key, state, frame_idx))
+
+        for key in [key for key in self._active if key not in seen]:
+            state = self._active[key]
+            if frame_idx - state['last_frame'] > self.end_grace_frames:
+                events.append(self._event('end', key, state, state['last_frame']))
+                del self._active[key]
+        return events
+
+    def finish(self):
+        """Ends every active violation (end-of-stream)."""
+        events = [self._event('end', key, state, state['last_frame']) for key, state in self._active.items()]
+        self._active = {}
+        return events
+
+
+class _BackgroundEventSink(abc.ABC):
+    """
+    Base class for event sinks: write() only enqueues, a writer thread collects
+    events into batches of up to batch_size (or whatever arrived within
+    flush_interval seconds) and hands each batch to _write_batch().
+    """
+    def __init__(self, batch_size=256, flush_interval=1.0, append=False):
+        """:param append: Keep the events already in the file instead of replacing them."""
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.append = append
+        self.events_written = 0
+        self._error = None # Exception that stopped the writer thread
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, events):
+        self._raise_error() # Nobody would ever write these events
+        for event in events:
+            self._queue.put(event)
+
+    def close(self):
+        """Flushes pending events and stops the writer thread; re-raises an error of the writer thread."""
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._raise_error()
+
+    def _run(self):
+        try:
+            self._open()
+            try:
+                self._write_batches()
+            finally:
+                self._close()
+        except Exception as e:
+            print(f"Error in event writer thread '{self._thread.name}': {e}")
+            self._error = e
+
+    def _write_batches(self):
+        batch = []
+        closing = False
+        while not closing:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is _CLOSE:
+                closing = True
+            elif item is not None:
+                batch.append(item)
+            if batch and (closing or item is None or len(batch) >= self.batch_size):
+                self._write_batch(batch)
+                self.events_written += len(batch)
+                batch = []
+
+    @abc.abstractmethod
+    def _open(self):
+        """Opens the file; runs on the writer thread."""
+
+    @abc.abstractmethod
+    def _write_batch(self, batch):
+        """Writes a list of events."""
+
+    @abc.abstractmethod
+    def _close(self):
+        """Closes the file."""
+
+
+class JsonlEventSink(_BackgroundEventSink):
+    """Appends one JSON object per event to a .jsonl file."""
+    def __init__(self, path, batch_size=256, flush_interval=1.0, append=False):
+        self.path = path
+        self._file = None
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval, append=append)
+
+    def _open(self):
+        self._file = open(self.path, 'a' if self.append else 'w')
+
+    def _write_batch(self, batch):
+        self._file.write(''.join(json.dumps(event) + '\n' for event in batch))
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class SqliteEventSink(_BackgroundEventSink):
+    """Inserts events into the violation_events table of an SQLite file, one transaction per batch."""
+    def __init__(self, path, batch_size=256, flush_interval=1.0, append=False):
+        self.path = path
+        self._connection = None
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval, append=append)
+
+    def _open(self):
+        # The connection is created here because SQLite connections belong to the thread that opened them
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS violation_events ("
+            "event TEXT, stream TEXT, person_id INTEGER, violation TEXT, frame INTEGER, "
+            "start_frame INTEGER, bbox TEXT, wall_time REAL)")
+        if not self.append:
+            self._connection.execute("DELETE FROM violation_events")
+        self._connection.commit()
+
+    def _write_batch(self, batch):
+        self._connection.executemany(
+            "INSERT INTO violation_events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(e['event'], e['stream'], e['person_id'], e['violation'], e['frame'],
+              e['start_frame'], json.dumps(e['bbox']), e['wall_time']) for e in batch])
+        self._connection.commit()
+
+    def _close(self):
+        self._connection.close()
+
+
+def open_event_sink(path, jsonl=False, **kwargs):
+    """
+    Opens an SQLite sink for .db/.sqlite paths and a JSONL sink otherwise.
+    :param jsonl: Always open a JSONL sink (for records that do not fit the SQLite table).
+    """
+    output_dir = os.path.dirname(path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    if not jsonl and os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteEventSink(path, **kwargs)
+    return JsonlEventSink(path, **kwargs)
+
+
+class ViolationEventLog:
+    """
+    Connects a ViolationEventTracker to a sink. Several logs (e.g. one per
+    stream) can share one sink; the sink is closed by whoever opened it.
+    """
+    def __init__(self, sink, stream=None, end_grace_frames=5, ongoing_interval=300):
+        self.sink = sink
+        self.tracker = ViolationEventTracker(stream=stream, end_grace_frames=end_grace_frames,
+                                             ongoing_interval=ongoing_interval)
+
+    def record(self, frame_idx, violations):
+        events = self.tracker.update(frame_idx, violations)
+        if events:
+            self.sink.write(events)
+
+    def finish(self):
+        events = self.tracker.finish()
+        if events:
+            self.sink.write(events)
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from detection.detections import Detections
+
+# Persistent per-frame detection cache.
+#
+# Detections depend only on the video content, the model weights and the
+# confidence threshold, so they are cached under a key built from those three.
+# Re-running tracking/association/compliance on the same video then replays the
+# cache instead of running (or even importing) the model.
+#
+# A cache entry is a directory of columnar .npy files, opened memory-mapped:
+#   xyxy.npy     float32 [total_detections, 4]
+#   conf.npy     float32 [total_detections]
+#   cls_id.npy   int32   [total_detections]
+#   offsets.npy  int64   [num_frames + 1]; frame i owns rows offsets[i]:offsets[i + 1]
+#   meta.json    hashes, confidence threshold, class names, frame count
+# meta.json is written last and the directory is renamed into place, so a
+# half-written entry is never picked up.
+
+_HASH_CHUNK_SIZE = 1 << 20
+_HASH_INDEX_FILE = 'file_hashes.json' # Remembers file hashes by (size, mtime) so large videos are hashed once
+_META_FILE = 'meta.json'
+
+
+def file_sha256(path, cache_dir=None):
+    """
+    :param cache_dir: If given, the hash is looked up in / stored to the hash index of this
+                      cache directory, keyed by absolute path, size and modification time.
+    :return: Hex SHA-256 of the file content.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    index_path = os.path.join(cache_dir, _HASH_INDEX_FILE) if cache_dir else None
+    index = {}
+    if index_path and os.path.exists(index_path):
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        entry = index.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+
+    if index_path:
+        index[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+        # Processes sharing the cache directory each write their own temp file, so the
+        # last replace wins. A failed update only means the file is hashed again next time.
+        tmp_path = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            print(f"Warning: could not update the file hash index {index_path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return sha256
+
+
+def detection_cache_key(video_sha256, weights_sha256, confidence_threshold, variant=None):
+    key = f"{video_sha256}:{weights_sha256}:{float(confidence_threshold):.6f}"
+    if variant:
+        key += f":{variant}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+class DetectionCache:
+    """
+    Read side of a cache entry. Columns are memory-mapped, so opening an entry
+    is cheap and frames are only paged in when they are replayed.
+    """
+    def __init__(self, entry_dir):
+        self.entry_dir = entry_dir
+        with open(os.path.join(entry_dir, _META_FILE)) as f:
+            self.meta = json.load(f)
+        self.class_names = tuple(self.meta['class_names'])
+        self.xyxy = np.load(os.path.join(entry_dir, 'xyxy.npy'), mmap_mode='r')
+        self.conf = np.load(os.path.join(entry_dir, 'conf.npy'), mmap_mode='r')
+        self.cls_id = np.load(os.path.join(entry_dir, 'cls_id.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(entry_dir, 'offsets.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, frame_idx):
+        """:return: Detections of frame frame_idx"""
+        start, end = int(self.offsets[frame_idx]), int(self.offsets[frame_idx + 1])
+        return Detections(self.xyxy[start:end], self.conf[start:end], self.cls_id[start:end], self.class_names)
+
+    def __iter__(self):
+        for frame_idx in range(len(self)):
+            yield self[frame_idx]
+
+
+class DetectionCacheWriter:
+    """
+    Collects the detections of every frame, in frame order, and writes them
+    as a cache entry on commit(). Nothing is visible in the cache before that.
+    """
+    def __init__(self, entry_dir, meta):
+        self.entry_dir = entry_dir
+        self.meta = dict(meta)
+        self._xyxy, self._conf, self._cls_id = [], [], []
+        self._counts = []
+        self.class_names = tuple(meta.get('class_names', ()))
+
+    def __len__(self):
+        return len(self._counts)
+
+    def append(self, detections):
+        """:param detections: Detections of the next frame"""
+        self._xyxy.append(detections.xyxy)
+        self._conf.append(detections.conf)
+        self._cls_id.append(detections.cls_id)
+        self._counts.append(len(detections))
+        if detections.names:
+            self.class_names = tuple(detections.names)
+
+    def commit(self):
+        """Writes the entry; returns it opened as a DetectionCache."""
+        tmp_dir = self.entry_dir + '.tmp'
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+        np.save(os.path.join(tmp_dir, 'xyxy.npy'),
+                np.concatenate(self._xyxy) if self._xyxy else np.zeros((0, 4), dtype=np.float32))
+        np.save(os.path.join(tmp_dir, 'conf.npy'),
+                np.concatenate(self._conf) if self._conf else np.zeros(0, dtype=np.float32))
+        np.save(os.path.join(tmp_dir, 'cls_id.npy'),
+                np.concatenate(self._cls_id) if self._cls_id else np.zeros(0, dtype=np.int32))
+        np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+        meta = dict(self.meta, class_names=list(self.class_names), num_frames=len(self._counts),
+                    num_detections=int(offsets[-1]))
+        with open(os.path.join(tmp_dir, _META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+        if os.path.exists(self.entry_dir):
+            shutil.rmtree(self.entry_dir)
+        os.replace(tmp_dir, self.entry_dir)
+        return DetectionCache(self.entry_dir)
+
+
+class CachingDetector:
+    """
+    Wraps a PPEDetector and appends every result to a DetectionCacheWriter.
+    The wrapped detector must be called on every frame, in frame order.
+    """
+    def __init__(self, detector, cache_writer):
+        self.detector = detector
+        self.cache_writer = cache_writer
+
+    @property
+    def model(self):
+        return self.detector.model
+
+    @property
+    def class_names(self):
+        return self.detector.class_names
+
+    @property
+    def tile_stats(self):
+        return getattr(self.detector, 'tile_stats', [])
+
+    def detect_arrays(self, frame):
+        detections = self.detector.detect_arrays(frame)
+        self.cache_writer.append(detections)
+        return detections
+
+    def detect_batch_arrays(self, frames):
+        batch_detections = self.detector.detect_batch_arrays(frames)
+        for detections in batch_detections:
+            self.cache_writer.append(detections)
+        return batch_detections
+
+    def detect(self, frame):
+        return self.detect_arrays(frame).to_list()
+
+    def detect_batch(self, frames):
+        return [detections.to_list() for detections in self.detect_batch_arrays(frames)]
+
+
+def lookup_detection_cache(cache_dir, video_path, model_path, confidence_threshold, variant=None):
+    """
+    Hashes the video and weights (no model is loaded) and looks up their cache entry.
+    :param variant: Optional description of other detector settings that change the detections
+                    (e.g. FrameTiler.signature()); each variant gets its own entry.
+    :return: (DetectionCache or None if there is no entry yet, DetectionCacheWriter for a new entry)
+    """
+    video_sha256 = file_sha256(video_path, cache_dir)
+    weights_sha256 = file_sha256(model_path, cache_dir)
+    entry_dir = os.path.join(cache_dir, detection_cache_key(video_sha256, weights_sha256, confidence_threshold,
+                                                            variant))
+    meta = {
+        'video_path': os.path.abspath(video_path),
+        'video_sha256': video_sha256,
+        'weights_path': os.path.abspath(model_path),
+        'weights_sha256': weights_sha256,
+        'confidence_threshold': float(confidence_threshold),
+        'variant': variant,
+    }
+    cache = DetectionCache(entry_dir) if os.path.exists(os.path.join(entry_dir, _META_FILE)) else None
+    return cache, DetectionCacheWriter(entry_dir, meta)
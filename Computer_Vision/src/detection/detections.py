@@ -0,0 +1,93 @@
+import numpy as np
+
+
+def build_class_name_table(model_names):
+    """
+    Turns a YOLOv5 `names` attribute (list or {id: name} dict) into a tuple
+    indexed by class id, so every frame shares one interned name table.
+    """
+    if isinstance(model_names, dict):
+        table = [''] * (max(model_names.keys()) + 1 if model_names else 0)
+        for cls_id, name in model_names.items():
+            table[int(cls_id)] = name
+        return tuple(table)
+    return tuple(model_names)
+
+
+class Detections:
+    """
+    Columnar detections for one frame.
+    xyxy:   float32 array [N, 4]
+    conf:   float32 array [N]
+    cls_id: int32 array [N]
+    names:  class-name table shared between frames (names[cls_id] is the class name)
+    """
+    __slots__ = ('xyxy', 'conf', 'cls_id', 'names')
+
+    def __init__(self, xyxy, conf, cls_id, names):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls_id = np.asarray(cls_id, dtype=np.int32).reshape(-1)
+        self.names = names
+
+    @classmethod
+    def empty(cls, names=()):
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+                   np.zeros(0, dtype=np.int32), names)
+
+    @classmethod
+    def from_array(cls, predictions, names):
+        """
+        :param predictions: Array [N, 6] of x1, y1, x2, y2, conf, cls_id (YOLOv5 xyxy layout).
+        """
+        predictions = np.asarray(predictions, dtype=np.float32).reshape(-1, 6)
+        return cls(predictions[:, :4], predictions[:, 4], predictions[:, 5].astype(np.int32), names)
+
+    @classmethod
+    def from_list(cls, detections, names=None):
+        """
+        Builds a container from the list format [[x1, y1, x2, y2, conf, cls_id, cls_name], ...].
+        If no name table is given, one is built from the class ids and names in the list.
+        """
+        if isinstance(detections, Detections):
+            return detections
+        if names is None:
+            table = {}
+            for det in detections:
+                table[int(det[5])] = det[6]
+            names = build_class_name_table(table)
+        if len(detections) == 0:
+            return cls.empty(names)
+        rows = np.array([det[:6] for det in detections], dtype=np.float32)
+        return cls.from_array(rows, names)
+
+    def __len__(self):
+        return self.xyxy.shape[0]
+
+    def class_names(self):
+        """Returns an object array with the class name of every row."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=object)
+        return np.asarray(self.names, dtype=object)[self.cls_id]
+
+    def class_id_of(self, class_name):
+        """Returns the class id for class_name, or -1 if the model has no such class."""
+        try:
+            return self.names.index(class_name)
+        except ValueError:
+            return -1
+
+    def select(self, mask):
+        """Returns the rows selected by a boolean mask or index array."""
+        return Detections(self.xyxy[mask], self.conf[mask], self.cls_id[mask], self.names)
+
+    def to_list(self):
+        """
+        Converts to the list format used across the pipeline:
+        [[x1, y1, x2, y2, conf, cls_id, cls_name], ...]
+        """
+        if len(self) == 0:
+            return []
+        coords = np.column_stack((self.xyxy, self.conf)).tolist()
+        names = self.names
+        return [row + [cls_id, names[cls_id]] for row, cls_id in zip(coords, self.cls_id.tolist())]
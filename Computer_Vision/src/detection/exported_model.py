@@ -0,0 +1,59 @@
+import json
+import numpy as np
+import torch
+from detection.postprocess import Results, iter_fixed_batches, non_max_suppression, preprocess_batch, scale_boxes
+
+# Runtime for the TorchScript artifact written by export_detector.py.
+#
+# The artifact holds the traced YOLOv5 network plus a JSON config stored as an
+# extra file in the same archive (class names, stride, input size, batch size),
+# so loading it needs neither the yolov5 checkout nor torch.hub. Letterboxing
+# and NMS, which AutoShape did around the network, are the numpy versions from
+# detection.postprocess, shared with the ONNX backend.
+
+EXPORT_CONFIG_FILE = 'config.txt' # Extra file inside the TorchScript archive (same name as YOLOv5's export.py)
+
+
+class TorchScriptYoloModel:
+    """
+    Drop-in for the torch.hub AutoShape model inside PPEDetector: it has
+    .names, .conf, .iou and .to(device), and calling it with a frame or a list
+    of frames returns an object whose .xyxy holds one [N, 6] array per frame,
+    in frame coordinates.
+    """
+    def __init__(self, path, device):
+        extra_files = {EXPORT_CONFIG_FILE: ''}
+        self.network = torch.jit.load(path, map_location=device, _extra_files=extra_files)
+        self.network.eval()
+        config = json.loads(extra_files[EXPORT_CONFIG_FILE])
+        self.config = config
+        self.names = config['names']
+        self.input_shape = tuple(config['img_size'])
+        self.batch_size = config.get('batch_size', 1)
+        self.device = device
+        self.conf = 0.25
+        self.iou = 0.45
+        self.max_det = 1000
+
+    def to(self, device):
+        self.network.to(device)
+        self.device = device
+        return self
+
+    def __call__(self, frames):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        batch, transforms = preprocess_batch(frames, self.input_shape)
+        predictions = []
+        with torch.inference_mode():
+            # The network was traced with a fixed batch size; a short last chunk is padded
+            for chunk, num_frames in iter_fixed_batches(batch, self.batch_size):
+                output = self.network(torch.from_numpy(chunk).to(self.device))
+                if isinstance(output, (list, tuple)):
+                    output = output[0]
+                output = output[:num_frames].float().cpu().numpy()
+                predictions.extend(non_max_suppression(output, self.conf, self.iou, self.max_det))
+
+        for prediction, (gain, pad), frame in zip(predictions, transforms, frames):
+            scale_boxes(prediction[:, :4], gain, pad, frame.shape)
+        return Results(predictions)
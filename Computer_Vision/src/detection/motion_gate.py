@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap scene-change check in front of PPEDetector. Each frame is downscaled,
+    converted to gray and blurred, then compared with the frame the detector
+    last ran on. If fewer than change_threshold percent of the pixels changed
+    by more than pixel_threshold, the frame is gated and the caller reuses the
+    previous detections instead of running the model.
+
+    Comparing against the last detected frame (not the previous frame) means
+    slow changes still add up and eventually trigger a detection pass.
+    max_gated_frames forces a pass after that many gated frames in a row.
+
+    Only use it for a fixed camera: the reused boxes are right only while
+    nothing moves in the image, and a panning or shaking camera would either
+    keep stale boxes or never gate at all.
+    """
+    def __init__(self, change_threshold=0.5, pixel_threshold=20, downscale_width=160, max_gated_frames=75):
+        self.change_threshold = change_threshold # Percent of pixels
+        self.pixel_threshold = pixel_threshold # Gray-level difference that counts as a change
+        self.downscale_width = downscale_width
+        self.max_gated_frames = max_gated_frames
+
+        self.reference = None
+        self.gated_in_a_row = 0
+        self.last_score = None
+
+        # Stats
+        self.frames_checked = 0
+        self.frames_gated = 0
+
+    def _preprocess(self, frame):
+        h, w = frame.shape[:2]
+        small_h = max(1, int(round(h * self.downscale_width / float(w))))
+        small = cv2.resize(frame, (self.downscale_width, small_h), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def change_score(self, small):
+        """Percentage of downscaled pixels that differ from the reference frame."""
+        diff = cv2.absdiff(small, self.reference)
+        return 100.0 * np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def should_run(self, frame):
+        """
+        Returns True if the scene changed enough for the detector to run on this
+        frame (the frame then becomes the new reference), False if the previous
+        detections can be reused.
+        """
+        self.frames_checked += 1
+        small = self._preprocess(frame)
+
+        if self.reference is not None and small.shape == self.reference.shape \
+                and self.gated_in_a_row < self.max_gated_frames:
+            self.last_score = self.change_score(small)
+            if self.last_score < self.change_threshold:
+                self.frames_gated += 1
+                self.gated_in_a_row += 1
+                return False
+
+        self.reference = small
+        self.gated_in_a_row = 0
+        return True
+
+    def summary(self):
+        gated_pct = 100.0 * self.frames_gated / self.frames_checked if self.frames_checked else 0.0
+        return (f"Motion gate skipped the detector on {self.frames_gated} of "
+                f"{self.frames_checked} frames ({gated_pct:.1f}%)")
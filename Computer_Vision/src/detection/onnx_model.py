@@ -0,0 +1,57 @@
+import json
+import numpy as np
+from detection.postprocess import Results, iter_fixed_batches, non_max_suppression, preprocess_batch, scale_boxes
+
+# CPU inference of the ONNX export of best.pt (export_detector.py --format onnx)
+# with ONNX Runtime. Neither torch nor the yolov5 checkout is needed at runtime:
+# letterboxing and NMS are the numpy versions from detection.postprocess.
+
+ONNX_CONFIG_KEY = 'ppe_detector_config' # Metadata entry holding the same JSON config as the TorchScript export
+
+
+class OnnxYoloModel:
+    """
+    Same interface as TorchScriptYoloModel (.names, .conf, .iou, .to(), and
+    calling it returns an object whose .xyxy holds one [N, 6] array per frame),
+    backed by an ONNX Runtime session.
+    """
+    def __init__(self, path, num_threads=None):
+        """
+        :param num_threads: ONNX Runtime intra-op threads (None = one per physical core).
+        """
+        import onnxruntime # Optional dependency, only needed for the ONNX backend
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1 # YOLOv5 is a single chain of ops; parallelism is within each op
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+        config = json.loads(self.session.get_modelmeta().custom_metadata_map[ONNX_CONFIG_KEY])
+        self.config = config
+        self.names = config['names']
+        self.input_shape = tuple(config['img_size'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # A symbolic (string) batch dimension means the export accepts any batch size
+        self.batch_size = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+        self.conf = 0.25
+        self.iou = 0.45
+        self.max_det = 1000
+
+    def to(self, device):
+        return self # CPU only
+
+    def __call__(self, frames):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        batch, transforms = preprocess_batch(frames, self.input_shape)
+        predictions = []
+        for chunk, num_frames in iter_fixed_batches(batch, self.batch_size):
+            output = self.session.run(None, {self.input_name: chunk})[0]
+            predictions.extend(non_max_suppression(output[:num_frames], self.conf, self.iou, self.max_det))
+
+        for prediction, (gain, pad), frame in zip(predictions, transforms, frames):
+            scale_boxes(prediction[:, :4], gain, pad, frame.shape)
+        return Results(predictions)
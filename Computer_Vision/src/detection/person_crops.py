@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+from detection.detections import Detections
+from detection.postprocess import LETTERBOX_COLOR, batched_nms
+
+# Second stage of the two-stage PPE mode: instead of searching the whole frame
+# for helmets and vests, the region around each known person is cropped,
+# scaled to a common height and packed next to the others on network-sized
+# canvases. All canvases go through the detector in one batch, and every
+# detection is mapped back to the frame and to the person whose crop it came
+# from, so PPE ownership is known by construction.
+#
+# In a sparse scene a handful of persons fit on one canvas, which is a single
+# network input at (or above) native resolution no matter how large the frame is.
+
+
+def pack_shelves(sizes, canvas_shape, gap):
+    """
+    Shelf packing of (width, height) rectangles onto canvases: left to right,
+    a new shelf when the row is full, a new canvas when the shelves are.
+    :param sizes: List of (width, height), each at most the canvas size.
+    :return: List of (canvas_idx, x, y) per rectangle, in input order
+    """
+    canvas_h, canvas_w = canvas_shape
+    placements = [None] * len(sizes)
+    canvas_idx, x, y, shelf_h = 0, 0, 0, 0
+    # Tallest first keeps shelves tight; crops have about the same height anyway
+    for idx in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        width, height = sizes[idx]
+        if x + width > canvas_w: # Next shelf
+            x, y, shelf_h = 0, y + shelf_h + gap, 0
+        if y + height > canvas_h: # Next canvas
+            canvas_idx, x, y, shelf_h = canvas_idx + 1, 0, 0, 0
+        placements[idx] = (canvas_idx, x, y)
+        x += width + gap
+        shelf_h = max(shelf_h, height)
+    return placements
+
+
+def merge_detections(detections_list, class_names, iou_threshold=0.45):
+    """Concatenates Detections in frame coordinates and removes duplicates with class-aware NMS."""
+    detections_list = [detections for detections in detections_list if len(detections) > 0]
+    if not detections_list:
+        return Detections.empty(class_names)
+    xyxy = np.concatenate([detections.xyxy for detections in detections_list])
+    conf = np.concatenate([detections.conf for detections in detections_list])
+    cls_id = np.concatenate([detections.cls_id for detections in detections_list])
+    keep = batched_nms(xyxy, conf, cls_id, iou_threshold)
+    return Detections(xyxy[keep], conf[keep], cls_id[keep], class_names)
+
+
+class PersonCropDetector:
+    """
+    Runs a detector on packed person crops.
+    The wrapped detector only needs detect_batch_arrays() (e.g. PPEDetector).
+    """
+    def __init__(self, detector, canvas_size=None, crop_height=256, max_upscale=3.0, context=0.1, gap=8):
+        """
+        :param canvas_size: (height, width) of a canvas; defaults to the model input size
+                            (or 640 x 640 for the torch.hub model, which has none).
+        :param crop_height: Crops are scaled to this height (at most max_upscale times up),
+                            which fixes how many persons share a canvas.
+        :param context: Margin added around each person box, as a fraction of its size,
+                        so a helmet above the head and the person's motion stay inside.
+        :param gap: Pixels of padding color between crops, so no box spans two persons.
+        """
+        self.detector = detector
+        if canvas_size is None:
+            canvas_size = getattr(getattr(detector, 'model', None), 'input_shape', None) or (640, 640)
+        self.canvas_size = tuple(canvas_size)
+        self.crop_height = crop_height
+        self.max_upscale = max_upscale
+        self.context = context
+        self.gap = gap
+        self.last_stats = {'crops': 0, 'canvases': 0, 'crop_pixels': 0}
+
+    @property
+    def class_names(self):
+        return self.detector.class_names
+
+    def crop_regions(self, frame_shape, person_boxes):
+        """:return: Int array [P, 4] of the person boxes grown by the context margin, clipped to the frame."""
+        boxes = np.asarray(person_boxes, dtype=np.float32).reshape(-1, 4)
+        margin_x = (boxes[:, 2] - boxes[:, 0]) * self.context
+        margin_y = (boxes[:, 3] - boxes[:, 1]) * self.context
+        regions = np.stack((boxes[:, 0] - margin_x, boxes[:, 1] - margin_y,
+                            boxes[:, 2] + margin_x, boxes[:, 3] + margin_y), axis=1)
+        regions[:, [0, 2]] = regions[:, [0, 2]].clip(0, frame_shape[1])
+        regions[:, [1, 3]] = regions[:, [1, 3]].clip(0, frame_shape[0])
+        regions = np.round(regions).astype(np.int64)
+        regions[:, 2] = np.maximum(regions[:, 2], regions[:, 0] + 1)
+        regions[:, 3] = np.maximum(regions[:, 3], regions[:, 1] + 1)
+        return regions
+
+    def detect(self, frame, person_boxes):
+        """
+        :param person_boxes: Array [P, 4] of person boxes (x1, y1, x2, y2) in frame coordinates.
+        :return: List with one Detections per person, in frame coordinates, holding what was
+                 detected inside that person's crop.
+        """
+        if len(person_boxes) == 0:
+            self.last_stats = {'crops': 0, 'canvases': 0, 'crop_pixels': 0}
+            return []
+        regions = self.crop_regions(frame.shape, person_boxes)
+        canvas_h, canvas_w = self.canvas_size
+        scales, sizes = [], []
+        for x1, y1, x2, y2 in regions:
+            width, height = x2 - x1, y2 - y1
+            scale = min(self.crop_height / height, self.max_upscale, canvas_w / width, canvas_h / height)
+            scales.append(scale)
+            sizes.append((max(1, int(width * scale)), max(1, int(height * scale))))
+        placements = pack_shelves(sizes, self.canvas_size, self.gap)
+
+        num_canvases = max(canvas_idx for canvas_idx, _, _ in placements) + 1
+        canvases = [np.full((canvas_h, canvas_w, 3), LETTERBOX_COLOR, dtype=np.uint8) for _ in range(num_canvases)]
+        for (x1, y1, x2, y2), (width, height), (canvas_idx, x, y) in zip(regions, sizes, placements):
+            canvases[canvas_idx][y:y + height, x:x + width] = cv2.resize(
+                frame[y1:y2, x1:x2], (width, height), interpolation=cv2.INTER_LINEAR)
+        canvas_detections = self.detector.detect_batch_arrays(canvases)
+
+        per_person = []
+        for region, scale, (width, height), (canvas_idx, x, y) in zip(regions, scales, sizes, placements):
+            detections = canvas_detections[canvas_idx]
+            center_x = (detections.xyxy[:, 0] + detections.xyxy[:, 2]) / 2
+            center_y = (detections.xyxy[:, 1] + detections.xyxy[:, 3]) / 2
+            inside = (center_x >= x) & (center_x < x + width) & (center_y >= y) & (center_y < y + height)
+            xyxy = detections.xyxy[inside].copy()
+            xyxy[:, [0, 2]] = (xyxy[:, [0, 2]].clip(x, x + width) - x) / scale + region[0]
+            xyxy[:, [1, 3]] = (xyxy[:, [1, 3]].clip(y, y + height) - y) / scale + region[1]
+            per_person.append(Detections(xyxy, detections.conf[inside], detections.cls_id[inside], detections.names))
+
+        self.last_stats = {
+            'crops': len(regions),
+            'canvases': num_canvases,
+            'crop_pixels': int(((regions[:, 2] - regions[:, 0]) * (regions[:, 3] - regions[:, 1])).sum()),
+        }
+        return per_person
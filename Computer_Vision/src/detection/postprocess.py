@@ -0,0 +1,168 @@
+import cv2
+import numpy as np
+
+# Pre- and post-processing for exported YOLOv5 models, reproducing what the
+# torch.hub AutoShape wrapper does around the network:
+#   letterbox -> [B, 3, H, W] float 0..1 -> network -> NMS -> boxes in frame coordinates
+# Everything here is numpy/OpenCV only, so every exported backend (TorchScript
+# and ONNX Runtime) shares the same code, and non_max_suppression() is the one
+# NMS entry point of the package.
+# One difference remains: AutoShape letterboxes to a stride-rounded rectangle
+# (640 x 384 for a 16:9 frame), while exported networks have a fixed input
+# shape, so letterbox() always pads to it. Outputs of the backends therefore
+# match by IoU, not exactly (see check_backend_parity.py).
+
+LETTERBOX_COLOR = (114, 114, 114) # YOLOv5 padding color
+MAX_NMS_CANDIDATES = 30000 # Highest-scoring boxes kept per image before NMS (YOLOv5 default)
+_NMS_BLOCK_ELEMENTS = 1 << 22 # IoU matrix entries computed at once (about 16 MB per float32 temporary)
+
+
+class Results:
+    """The part of YOLOv5's results object the pipeline uses: one [N, 6] array per image in .xyxy."""
+    def __init__(self, xyxy):
+        self.xyxy = xyxy
+
+
+def letterbox(frame, new_shape):
+    """
+    Resizes frame to fit new_shape (h, w) keeping the aspect ratio and pads the
+    rest, centered, like YOLOv5's letterbox(auto=False).
+    :return: (padded frame, gain, (pad_x, pad_y))
+    """
+    h, w = frame.shape[:2]
+    new_h, new_w = new_shape
+    gain = min(new_h / h, new_w / w)
+    unpad_w, unpad_h = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (new_w - unpad_w) / 2, (new_h - unpad_h) / 2
+    if (w, h) != (unpad_w, unpad_h):
+        frame = cv2.resize(frame, (unpad_w, unpad_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return frame, gain, (pad_x, pad_y)
+
+
+def preprocess_batch(frames, input_shape):
+    """
+    Letterboxes frames into one contiguous float32 NCHW batch scaled to 0..1.
+    The channel order is left as decoded, which is what AutoShape does with numpy input.
+    :return: (batch array [B, 3, H, W], list of (gain, pad) per frame)
+    """
+    batch = np.empty((len(frames), 3, input_shape[0], input_shape[1]), dtype=np.float32)
+    transforms = []
+    for idx, frame in enumerate(frames):
+        padded, gain, pad = letterbox(frame, input_shape)
+        batch[idx] = padded.transpose(2, 0, 1)
+        transforms.append((gain, pad))
+    batch *= 1.0 / 255.0
+    return batch, transforms
+
+
+def scale_boxes(xyxy, gain, pad, frame_shape):
+    """Maps [N, 4] boxes from letterboxed input coordinates back to the frame, in place, clipped to it."""
+    xyxy[:, [0, 2]] -= pad[0]
+    xyxy[:, [1, 3]] -= pad[1]
+    xyxy /= gain
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, frame_shape[1])
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, frame_shape[0])
+    return xyxy
+
+
+def xywh_to_xyxy(xywh):
+    xyxy = np.empty_like(xywh)
+    half_w, half_h = xywh[:, 2] / 2, xywh[:, 3] / 2
+    xyxy[:, 0] = xywh[:, 0] - half_w
+    xyxy[:, 1] = xywh[:, 1] - half_h
+    xyxy[:, 2] = xywh[:, 0] + half_w
+    xyxy[:, 3] = xywh[:, 1] + half_h
+    return xyxy
+
+
+def iter_fixed_batches(batch, batch_size):
+    """
+    Splits a preprocessed batch into chunks for a network with a fixed batch size,
+    padding the last chunk by repeating its last image.
+    :param batch_size: Fixed batch size, or None if the network accepts any batch size.
+    :return: Iterator of (chunk, number of real images in it)
+    """
+    if not batch_size:
+        yield batch, len(batch)
+        return
+    for start in range(0, len(batch), batch_size):
+        chunk = batch[start:start + batch_size]
+        num_images = len(chunk)
+        if num_images < batch_size:
+            chunk = np.concatenate([chunk, np.repeat(chunk[-1:], batch_size - num_images, axis=0)])
+        yield chunk, num_images
+
+
+def nms(boxes, scores, iou_threshold):
+    """
+    Greedy NMS over [N, 4] xyxy boxes. The pairwise IoU matrix is computed in
+    vectorized blocks of rows, sized so a block stays within _NMS_BLOCK_ELEMENTS
+    entries; the greedy sweep then only ORs precomputed rows.
+    :return: Indices of the kept boxes, by descending score
+    """
+    order = np.argsort(-scores, kind='stable')
+    boxes = boxes[order]
+    num_boxes = len(boxes)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = np.zeros(num_boxes, dtype=bool)
+    keep = []
+    block_size = max(1, min(1024, _NMS_BLOCK_ELEMENTS // max(num_boxes, 1)))
+    for block_start in range(0, num_boxes, block_size):
+        block = slice(block_start, min(block_start + block_size, num_boxes))
+        x1 = np.maximum(boxes[block, None, 0], boxes[None, :, 0])
+        y1 = np.maximum(boxes[block, None, 1], boxes[None, :, 1])
+        x2 = np.minimum(boxes[block, None, 2], boxes[None, :, 2])
+        y2 = np.minimum(boxes[block, None, 3], boxes[None, :, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        overlaps = inter / (areas[block, None] + areas[None, :] - inter + 1e-9) > iou_threshold
+        for row, idx in enumerate(range(block.start, block.stop)):
+            if suppressed[idx]:
+                continue
+            keep.append(idx)
+            suppressed |= overlaps[row]
+    return order[np.array(keep, dtype=np.int64)]
+
+
+def batched_nms(boxes, scores, cls_ids, iou_threshold):
+    """
+    Class-aware NMS: nms() runs once per class, so boxes of different classes
+    never suppress each other and each IoU matrix only covers one class.
+    :return: Indices of the kept boxes, by descending score
+    """
+    keep = [idx[nms(boxes[idx], scores[idx], iou_threshold)]
+            for idx in (np.flatnonzero(cls_ids == cls) for cls in np.unique(cls_ids))]
+    if not keep:
+        return np.zeros(0, dtype=np.int64)
+    keep = np.concatenate(keep)
+    return keep[np.lexsort((keep, -scores[keep]))] # Ties in input order, as with a single nms() pass
+
+
+def non_max_suppression(prediction, conf_threshold=0.25, iou_threshold=0.45, max_det=1000, agnostic=False):
+    """
+    Class-aware NMS over raw YOLOv5 output, as in yolov5's non_max_suppression
+    with multi_label=False. Used by every exported backend.
+    :param prediction: Array [B, N, 5 + num_classes] of xywh, objectness, class probabilities.
+    :return: List with one float32 array [M, 6] (x1, y1, x2, y2, conf, cls_id) per image
+    """
+    output = []
+    for x in prediction:
+        x = x[x[:, 4] > conf_threshold]
+        if x.shape[0] == 0:
+            output.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+        scores = x[:, 5:] * x[:, 4:5] # Class confidence = objectness * class probability
+        cls_id = scores.argmax(1)
+        conf = scores[np.arange(len(x)), cls_id]
+        candidates = conf > conf_threshold
+        detections = np.column_stack((xywh_to_xyxy(x[candidates, :4]), conf[candidates],
+                                      cls_id[candidates])).astype(np.float32)
+        detections = detections[np.argsort(-detections[:, 4], kind='stable')[:MAX_NMS_CANDIDATES]]
+        if agnostic:
+            keep = nms(detections[:, :4], detections[:, 4], iou_threshold)[:max_det]
+        else:
+            keep = batched_nms(detections[:, :4], detections[:, 4], detections[:, 5], iou_threshold)[:max_det]
+        output.append(detections[keep])
+    return output
@@ -1,15 +1,94 @@
-import torch
 import os
-import sys
+import time
+from detection.detections import Detections, build_class_name_table
+
+DETECTOR_BACKENDS = ('torch-hub', 'torchscript', 'onnxruntime')
+TORCHSCRIPT_SUFFIXES = ('.torchscript', '.torchscript.pt')
+
+
+def resolve_backend(model_path, backend='auto'):
+    """
+    Picks the inference backend for a model file.
+    :param backend: One of DETECTOR_BACKENDS, or 'auto' to choose from the file name:
+                    .onnx -> onnxruntime, .torchscript -> torchscript, anything else (.pt) -> torch-hub.
+    """
+    if backend != 'auto':
+        if backend not in DETECTOR_BACKENDS:
+            raise ValueError(f"Unknown detector backend '{backend}', expected one of {DETECTOR_BACKENDS}.")
+        return backend
+    lowered = model_path.lower()
+    if lowered.endswith('.onnx'):
+        return 'onnxruntime'
+    if lowered.endswith(TORCHSCRIPT_SUFFIXES):
+        return 'torchscript'
+    return 'torch-hub'
+
 
 class PPEDetector:
-    def __init__(self, model_path, confidence_threshold=0.25):
+    def __init__(self, model_path, confidence_threshold=0.25, backend='auto', num_threads=None, tiler=None):
+        """
+        :param model_path: YOLOv5 weights (.pt), loaded through torch.hub from the local yolov5
+                           checkout, or an artifact from export_detector.py: .torchscript (loaded
+                           directly, which starts much faster) or .onnx (run with ONNX Runtime on
+                           the CPU, without torch).
+        :param backend: 'auto' (chosen from model_path) or one of DETECTOR_BACKENDS.
+        :param num_threads: Intra-op CPU threads for inference (None = library default).
+        :param tiler: Optional FrameTiler. Frames are then split into overlapping tiles (limited to
+                      its ROI polygons), all tiles of a call run in one forward pass and are merged
+                      back per frame. tile_stats holds the tiles/pixels of each frame of the last call.
+        """
         self.model_path = os.path.abspath(model_path) 
         self.confidence_threshold = confidence_threshold
+        self.backend = resolve_backend(self.model_path, backend)
+        self.num_threads = num_threads
+        self.tiler = tiler
+        self.tile_stats = []
         self.model = None
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Using device: {self.device}")
+        self.class_names = ()
+        self.startup_seconds = None
+
+        start = time.perf_counter()
+        if self.backend == 'onnxruntime':
+            self.device = 'cpu'
+            print(f"Using device: {self.device} (ONNX Runtime)")
+            self._load_onnx_model()
+        else:
+            import torch # Not needed at all by the ONNX Runtime backend
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            print(f"Using device: {self.device}")
+            if num_threads:
+                torch.set_num_threads(num_threads)
+            if self.backend == 'torchscript':
+                self._load_exported_model()
+            else:
+                self._load_hub_model()
+        if self.model is not None:
+            self.model.to(self.device)
+            self.model.conf = self.confidence_threshold 
+            self.class_names = build_class_name_table(self.model.names)
+            self.startup_seconds = time.perf_counter() - start
+            print(f"Detector ready in {self.startup_seconds:.2f}s ({self.backend})")
+
+    def _load_onnx_model(self):
+        try:
+            from detection.onnx_model import OnnxYoloModel
+            print(f"Loading ONNX model: {self.model_path}")
+            self.model = OnnxYoloModel(self.model_path, num_threads=self.num_threads)
+        except Exception as e:
+            print(f"Error loading ONNX model in PPEDetector: {e}")
+            self.model = None
+
+    def _load_exported_model(self):
+        try:
+            from detection.exported_model import TorchScriptYoloModel
+            print(f"Loading exported model: {self.model_path}")
+            self.model = TorchScriptYoloModel(self.model_path, self.device)
+        except Exception as e:
+            print(f"Error loading exported model in PPEDetector: {e}")
+            self.model = None
 
+    def _load_hub_model(self):
+        import torch
         yolov5_repo_path = None
         original_cwd = os.getcwd()
 
@@ -39,10 +118,8 @@ class PPEDetector:
                 force_reload=True, # Good to keep for avoiding hub cache issues
                 trust_repo=True    
             )
-            
-            self.model.to(self.device)
-            self.model.conf = self.confidence_threshold 
             print(f"YOLOv5 custom model loaded successfully using CWD '{yolov5_repo_path}'.")
+            print("Tip: run export_detector.py once and load the .torchscript (or .onnx) artifact for a faster startup.")
 
         except Exception as e:
             print(f"Error loading model in PPEDetector: {e}")
@@ -55,18 +132,82 @@ class PPEDetector:
             os.chdir(original_cwd) # Restore original CWD
             print(f"DEBUG: Restored CWD to: {os.getcwd()}")
 
-    def detect(self, frame):
+    def _to_detections(self, predictions):
+        """
+        Converts one image's predictions ([N, 6] xyxy, conf, cls; a tensor or an array)
+        into a Detections container with a single device-to-host copy and no per-row loop.
+        """
+        if predictions.shape[0] == 0:
+            return Detections.empty(self.class_names)
+        if hasattr(predictions, 'cpu'):
+            predictions = predictions.cpu().numpy()
+        return Detections.from_array(predictions, self.class_names)
+
+    def detect_arrays(self, frame):
+        """
+        Same as detect(), but returns a columnar Detections container.
+        """
         if self.model is None:
             print("Model not loaded, detection skipped.")
-            return []
+            return Detections.empty(self.class_names)
+        if self.tiler is not None:
+            return self._detect_tiled([frame])[0]
         results = self.model(frame) 
-        detections = []
-        if hasattr(results, 'xyxy') and results.xyxy[0].shape[0] > 0:
-            for det in results.xyxy[0].cpu().numpy(): 
-                x1, y1, x2, y2, conf, cls_id = det
-                class_name = self.model.names[int(cls_id)] 
-                detections.append([x1, y1, x2, y2, conf, int(cls_id), class_name])
-        return detections
+        if not hasattr(results, 'xyxy'):
+            return Detections.empty(self.class_names)
+        return self._to_detections(results.xyxy[0])
+
+    def detect_batch_arrays(self, frames):
+        """
+        Same as detect_batch(), but returns one Detections container per frame.
+        """
+        if len(frames) == 0:
+            return []
+        if self.model is None:
+            print("Model not loaded, detection skipped.")
+            return [Detections.empty(self.class_names) for _ in frames]
+        if self.tiler is not None:
+            return self._detect_tiled(frames)
+        # YOLOv5's AutoShape wrapper accepts a list of images and letterboxes
+        # them into one batch tensor, so the whole list costs one forward pass.
+        results = self.model(list(frames))
+        if not hasattr(results, 'xyxy'):
+            return [Detections.empty(self.class_names) for _ in frames]
+        return [self._to_detections(predictions) for predictions in results.xyxy]
+
+    def _detect_tiled(self, frames):
+        """Runs the tiles of all frames as one batch and merges them back per frame."""
+        layouts, crops = [], []
+        for frame in frames:
+            layout = self.tiler.layout(frame.shape)
+            layouts.append(layout)
+            crops.extend(layout.crops(frame))
+        results = self.model(crops)
+        predictions = [p.cpu().numpy() if hasattr(p, 'cpu') else p for p in results.xyxy]
+
+        batch_detections = []
+        start = 0
+        for layout in layouts:
+            num_crops = layout.stats['tiles']
+            batch_detections.append(self.tiler.merge(predictions[start:start + num_crops], layout, self.class_names))
+            start += num_crops
+        self.tile_stats = [layout.stats for layout in layouts]
+        return batch_detections
+
+    def detect(self, frame):
+        """
+        Returns list of [x1, y1, x2, y2, conf, cls_id, class_name].
+        """
+        return self.detect_arrays(frame).to_list()
+
+    def detect_batch(self, frames):
+        """
+        Runs a single forward pass over several frames.
+        :param frames: List of frames (numpy arrays). May be empty.
+        :return: List with one detection list per frame, in the same order as frames.
+                 Each detection list has the same format as detect().
+        """
+        return [detections.to_list() for detections in self.detect_batch_arrays(frames)]
 
 if __name__ == '__main__':
     example_project_root_from_detector = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
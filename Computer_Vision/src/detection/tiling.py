@@ -0,0 +1,192 @@
+import cv2
+import numpy as np
+from detection.detections import Detections
+from detection.postprocess import batched_nms
+
+# Tiled inference for high-resolution cameras. YOLOv5 letterboxes a 4K frame
+# down to its 640 px input, which leaves a distant helmet a few pixels wide.
+# FrameTiler cuts the frame into overlapping tiles of about the network input
+# size instead; PPEDetector runs all tiles of all frames in one forward pass
+# and merges the tile detections back into frame coordinates with
+# class-aware NMS.
+#
+# Optional ROI polygons restrict inference to the working area: tiles that do
+# not overlap any polygon (sky, parking) are never cropped or run, and
+# detections centered outside the polygons are dropped.
+#
+# The tile layout only depends on the frame size, so it is computed once per
+# resolution and reused.
+
+
+class TileLayout:
+    """Tiles of one frame size, with the ROI mask and what they cost."""
+    def __init__(self, tiles, full_region, roi_mask, frame_shape):
+        """
+        :param tiles: Int array [T, 4] of x1, y1, x2, y2 crops in frame pixels.
+        :param full_region: (x1, y1, x2, y2) crop for the downscaled full-frame pass, or None.
+        :param roi_mask: uint8 mask of the ROI polygons, or None without ROI.
+        """
+        self.tiles = tiles
+        self.full_region = full_region
+        self.roi_mask = roi_mask
+        self.frame_shape = tuple(frame_shape[:2])
+        covered = np.zeros(frame_shape[:2], dtype=bool)
+        for x1, y1, x2, y2 in tiles:
+            covered[y1:y2, x1:x2] = True
+        frame_pixels = frame_shape[0] * frame_shape[1]
+        self.stats = {
+            'tiles': len(tiles) + (full_region is not None),
+            'tile_pixels': int(((tiles[:, 2] - tiles[:, 0]) * (tiles[:, 3] - tiles[:, 1])).sum()),
+            'frame_pixels': frame_pixels,
+            'coverage': float(covered.sum()) / frame_pixels, # Fraction of the frame inside some tile
+            'full_frame': full_region is not None,
+        }
+
+    def crops(self, frame):
+        """:return: List of frame crops (views, no copy): the tiles, then the full-frame region."""
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.tiles]
+        if self.full_region is not None:
+            x1, y1, x2, y2 = self.full_region
+            crops.append(frame[y1:y2, x1:x2])
+        return crops
+
+
+def _axis_starts(start, end, tile_length, overlap):
+    """Tile start positions covering [start, end), spread evenly with at least the given overlap."""
+    length = end - start
+    if length <= tile_length:
+        return [start]
+    stride = tile_length * (1.0 - overlap)
+    num_tiles = int(np.ceil((length - tile_length) / stride)) + 1
+    return [int(round(pos)) for pos in np.linspace(start, end - tile_length, num_tiles)]
+
+
+class FrameTiler:
+    """
+    Plans the tiles of a frame and merges per-tile detections back into one
+    Detections container in frame coordinates.
+    """
+    def __init__(self, tile_size=(640, 640), overlap=0.2, roi_polygons=None, full_frame=True,
+                 iou_threshold=0.45, edge_margin=2):
+        """
+        :param tile_size: (height, width) of a tile in frame pixels; the network input size
+                          makes tiles run at native resolution. None = one crop of the ROI
+                          bounding box (ROI-only mode).
+        :param overlap: Fraction of the tile size shared by neighbouring tiles, so an object
+                        cut by one tile border is whole in the next one.
+        :param roi_polygons: Optional list of polygons, each a list of (x, y) frame pixels.
+        :param full_frame: Also run the whole frame (or the ROI bounding box) downscaled in the
+                           same batch, so objects larger than a tile, like persons close to the
+                           camera, are found whole.
+        :param iou_threshold: IoU of the class-aware NMS that merges the tiles.
+        :param edge_margin: With the full-frame pass on, tile boxes within this many pixels of
+                            a tile border inside the frame are dropped: they are cut objects that
+                            a neighbouring tile or the full-frame pass sees whole.
+        """
+        if not 0 <= overlap < 1:
+            raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+        self.tile_size = tuple(tile_size) if tile_size else None
+        self.overlap = overlap
+        self.roi_polygons = [np.asarray(polygon, dtype=np.int32).reshape(-1, 2) for polygon in roi_polygons or []]
+        self.full_frame = full_frame
+        self.iou_threshold = iou_threshold
+        self.edge_margin = edge_margin
+        self._layouts = {} # (height, width) -> TileLayout
+
+    def signature(self):
+        """Short description of the settings, for cache keys: tiling changes the detections."""
+        polygons = ';'.join(','.join(map(str, polygon.ravel())) for polygon in self.roi_polygons)
+        tiles = f"{self.tile_size[0]}x{self.tile_size[1]}" if self.tile_size else 'roi'
+        return (f"tiles={tiles},overlap={self.overlap},"
+                f"full={int(self.full_frame)},iou={self.iou_threshold},roi={polygons}")
+
+    def layout(self, frame_shape):
+        key = frame_shape[:2]
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = self._plan(frame_shape)
+            stats = layout.stats
+            print(f"Tiling {key[1]}x{key[0]} frames: {stats['tiles']} tiles per frame"
+                  f"{' (incl. full-frame pass)' if stats['full_frame'] else ''}, "
+                  f"{stats['tile_pixels'] / stats['frame_pixels']:.0%} of the frame pixels, "
+                  f"{stats['coverage']:.0%} of the frame covered")
+        return layout
+
+    def _plan(self, frame_shape):
+        height, width = frame_shape[:2]
+        roi_mask = None
+        x_min, y_min, x_max, y_max = 0, 0, width, height
+        if self.roi_polygons:
+            roi_mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(roi_mask, self.roi_polygons, 1)
+            ys, xs = np.nonzero(roi_mask)
+            if len(xs) == 0:
+                raise ValueError("The ROI polygons do not overlap the frame.")
+            x_min, y_min, x_max, y_max = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+
+        tile_h, tile_w = self.tile_size or (y_max - y_min, x_max - x_min)
+        tiles = []
+        for y1 in _axis_starts(y_min, y_max, tile_h, self.overlap):
+            for x1 in _axis_starts(x_min, x_max, tile_w, self.overlap):
+                x2, y2 = min(x1 + tile_w, x_max), min(y1 + tile_h, y_max)
+                if roi_mask is None or roi_mask[y1:y2, x1:x2].any():
+                    tiles.append((x1, y1, x2, y2))
+        tiles = np.array(tiles, dtype=np.int64).reshape(-1, 4)
+
+        full_region = (int(x_min), int(y_min), int(x_max), int(y_max))
+        if not self.full_frame or (len(tiles) == 1 and tuple(tiles[0]) == full_region):
+            full_region = None # A single tile already is the whole region
+        return TileLayout(tiles, full_region, roi_mask, frame_shape)
+
+    def merge(self, crop_predictions, layout, class_names):
+        """
+        :param crop_predictions: One [N, 6] array (x1, y1, x2, y2, conf, cls_id) per crop of
+                                 layout.crops(), in crop coordinates.
+        :return: Detections of the frame
+        """
+        merged = []
+        has_full_pass = layout.full_region is not None
+        for crop_idx, predictions in enumerate(crop_predictions):
+            if len(predictions) == 0:
+                continue
+            predictions = np.array(predictions, dtype=np.float32) # Own copy, shifted in place below
+            if crop_idx < len(layout.tiles):
+                x1, y1, x2, y2 = layout.tiles[crop_idx]
+                if has_full_pass and self.edge_margin is not None:
+                    predictions = predictions[~self._touches_inner_edge(predictions, layout, crop_idx)]
+            else:
+                x1, y1 = layout.full_region[:2]
+            predictions[:, [0, 2]] += x1
+            predictions[:, [1, 3]] += y1
+            merged.append(predictions)
+        if not merged:
+            return Detections.empty(class_names)
+        predictions = np.concatenate(merged)
+
+        if layout.roi_mask is not None:
+            height, width = layout.roi_mask.shape
+            center_x = ((predictions[:, 0] + predictions[:, 2]) / 2).astype(np.int64).clip(0, width - 1)
+            center_y = ((predictions[:, 1] + predictions[:, 3]) / 2).astype(np.int64).clip(0, height - 1)
+            predictions = predictions[layout.roi_mask[center_y, center_x] > 0]
+
+        # Class-aware NMS across tiles
+        keep = batched_nms(predictions[:, :4], predictions[:, 4], predictions[:, 5], self.iou_threshold)
+        return Detections.from_array(predictions[keep], class_names)
+
+    def _touches_inner_edge(self, predictions, layout, tile_idx):
+        """Boxes within edge_margin of a border of the tile that is not a border of the tiled region."""
+        x1, y1, x2, y2 = layout.tiles[tile_idx]
+        region_x1, region_y1 = layout.tiles[:, 0].min(), layout.tiles[:, 1].min()
+        region_x2, region_y2 = layout.tiles[:, 2].max(), layout.tiles[:, 3].max()
+        width, height = x2 - x1, y2 - y1
+        margin = self.edge_margin
+        touches = np.zeros(len(predictions), dtype=bool)
+        if x1 > region_x1:
+            touches |= predictions[:, 0] <= margin
+        if y1 > region_y1:
+            touches |= predictions[:, 1] <= margin
+        if x2 < region_x2:
+            touches |= predictions[:, 2] >= width - margin
+        if y2 < region_y2:
+            touches |= predictions[:, 3] >= height - margin
+        return touches
@@ -1,12 +1,102 @@
 import cv2
+import logging
 import os
-from detection.ppe_detector import PPEDetector
+from detection.detection_cache import CachingDetector, lookup_detection_cache
+from detection.motion_gate import MotionGate
+from detection.tiling import FrameTiler
 from tracking.object_tracker import ObjectTracker 
+from tracking.detection_scheduler import DetectionScheduler
 from association.ppe_associator import PPEAssociator
 from compliance_checker.safety_rules import SafetyComplianceChecker
-from project_utils.video_utils import draw_tracked_ppe_status
+from compliance_checker.violation_events import ViolationEventLog, open_event_sink
+from pipeline.analytics import FrameRecordLog, ReducedCapture, RescalingDetector
+from pipeline.frame_stages import process_frame, replay_detection_cache, run_detection_stage, schedule_detection
+from pipeline.multi_stream import MultiStreamRunner, StreamState
+from pipeline.parameter_sweep import format_sweep_report, run_parameter_sweep, write_sweep_report
+from pipeline.process_pipeline import ProcessPipeline
+from pipeline.sharded_offline import run_sharded
+from pipeline.threaded_pipeline import ThreadedPipeline
+from pipeline.two_stage import TwoStageAnalyzer
+from project_utils.metrics import NULL_METRICS, MetricsServer, PipelineMetrics
+from project_utils.video_utils import open_video_writer
+
+logger = logging.getLogger(__name__)
+
+# Hand-tuned parameters shared by every entry point (and the base of parameter sweeps)
+TRACKER_PARAMS = dict(max_age=30, min_hits=3, iou_threshold=0.3)
+# Parameters for PPEAssociator might need tuning
+ASSOCIATOR_PARAMS = dict(iou_threshold_person_ppe=0.05, helmet_y_offset_factor=0.15, vest_overlap_factor=0.3)
+CHECKER_PARAMS = dict(require_helmet=True, require_vest=True)
+
+def start_metrics(metrics_summary_interval=None, metrics_port=None):
+    """
+    :return: (metrics, server): NULL_METRICS and None unless instrumentation was asked for
+    """
+    if metrics_summary_interval is None and metrics_port is None:
+        return NULL_METRICS, None
+    metrics = PipelineMetrics(summary_interval=metrics_summary_interval)
+    server = MetricsServer(metrics, port=metrics_port).start() if metrics_port is not None else None
+    return metrics, server
+
+def stop_metrics(metrics, server):
+    if metrics.enabled:
+        print(metrics.format_summary())
+    if server is not None:
+        server.stop()
+
+def main(video_path, model_path, output_video_path=None, batch_size=1, tracker_motion_model='none',
+         detect_interval=1, adaptive_detect_interval=False, motion_gating=False, threaded=False,
+         ppe_smoothing_window=0, violation_log_path=None, detection_cache_dir=None, confidence_threshold=0.4,
+         metrics_summary_interval=None, metrics_port=None, tile_size=None, tile_overlap=0.2, roi_polygons=None,
+         two_stage_refresh_interval=None, analytics_only=False, decode_scale=None, frame_log_path=None):
+    """
+    :param batch_size: Frames per detector forward pass.
+    :param tracker_motion_model: 'none' or 'kalman', see ObjectTracker.
+    :param detect_interval: Run the detector every detect_interval frames (1 = every frame);
+                            the tracker extrapolates the boxes in between.
+    :param adaptive_detect_interval: If True, detect_interval is the upper bound and the
+                                     interval shrinks when tracks are unstable or new
+                                     persons appear (see DetectionScheduler).
+    :param motion_gating: If True, frames where the scene has not changed reuse the
+                          previous detections instead of running the model (see MotionGate).
+                          Only for fixed (mounted, non-PTZ) cameras.
+    :param threaded: If True, decode, inference, analysis and encoding run as separate
+                     threads connected by bounded queues (see ThreadedPipeline).
+    :param ppe_smoothing_window: If > 0, each person's PPE status is voted over this many
+                                 frames instead of taken from the current frame alone.
+    :param violation_log_path: If given, violation start/end events are written to this
+                               .jsonl file (or SQLite for .db/.sqlite) instead of logged per frame.
+    :param detection_cache_dir: If given, detections are cached here per (video, weights,
+                                confidence threshold). When the entry exists the analysis is
+                                replayed from it without loading the model (or torch); without
+                                an output video not even the frames are decoded.
+    :param metrics_summary_interval: If given, per-stage timings, counters and gauges are collected
+                                     and a summary is logged every this many seconds.
+    :param metrics_port: If given, the metrics are also served on this local port
+                         (/metrics in Prometheus text format, /metrics.json).
+    :param tile_size: If given as (height, width), frames are split into overlapping tiles of this
+                      size for detection (see FrameTiler), for small objects in high-resolution video.
+    :param tile_overlap: Fraction of the tile size shared by neighbouring tiles.
+    :param roi_polygons: Optional list of polygons ([(x, y), ...] in frame pixels); only the parts
+                         of the frame they cover are run through the detector.
+    :param two_stage_refresh_interval: If given, the two-stage mode is used (see TwoStageAnalyzer):
+                                       a full-frame pass every this many frames finds the persons,
+                                       other frames only run the detector on crops around them.
+    :param analytics_only: Headless mode (see pipeline.analytics): no output video is written and
+                           frames are never copied or drawn on; the results are the violation
+                           events and the frame records.
+    :param decode_scale: Analytics-only: frames are shrunk by this factor (e.g. 0.5) right after
+                         decoding; detections are mapped back to source-video pixels.
+    :param frame_log_path: If given, a .jsonl record of every frame's tracks and per-person
+                           PPE status is written there.
+    """
+    if batch_size < 1:
+        print(f"Error: batch_size must be at least 1, got {batch_size}")
+        return
+    if detect_interval < 1:
+        print(f"Error: detect_interval must be at least 1, got {detect_interval}")
+        return
 
-def main(video_path, model_path, output_video_path=None):
     # Check if model file exists
     if not os.path.exists(model_path):
         print(f"Error: Model file not found at {model_path}")
@@ -19,108 +109,382 @@ def main(video_path, model_path, output_video_path=None):
         print("Please ensure the video path is correct and the video file exists.")
         return
 
-    detector = PPEDetector(model_path=model_path, confidence_threshold=0.4) 
-    if not detector.model: 
-        print("Failed to load the model. Exiting.")
-        return
+    if two_stage_refresh_interval:
+        if detection_cache_dir or threaded or motion_gating or detect_interval > 1 or adaptive_detect_interval \
+                or tile_size or roi_polygons:
+            print("Warning: the two-stage mode runs frame by frame without the detection cache, threading, "
+                  "motion gating, frame skipping or tiling; those options are ignored.")
+        detection_cache_dir, threaded, motion_gating = None, False, False
+        detect_interval, adaptive_detect_interval = 1, False
+        tile_size, roi_polygons = None, None
 
-    tracker = ObjectTracker(max_age=30, min_hits=3, iou_threshold=0.3)
-    # Parameters for PPEAssociator might need tuning
-    associator = PPEAssociator(iou_threshold_person_ppe=0.05, helmet_y_offset_factor=0.15, vest_overlap_factor=0.3)
-    compliance_checker = SafetyComplianceChecker(require_helmet=True, require_vest=True)
+    if analytics_only:
+        if output_video_path:
+            print("Warning: the analytics-only mode writes no output video; output_video_path is ignored.")
+            output_video_path = None
+        if not violation_log_path and not frame_log_path:
+            print("Warning: analytics-only mode without violation_log_path or frame_log_path only reports metrics.")
+    if decode_scale and decode_scale != 1:
+        if not analytics_only:
+            print("Warning: decode_scale is only used in the analytics-only mode; decoding at full resolution.")
+            decode_scale = None
+        elif tile_size or roi_polygons or two_stage_refresh_interval:
+            # Tiles, ROI polygons and person crops are in source-video pixels
+            print("Warning: decode_scale does not work with tiling, ROI polygons or the two-stage mode; "
+                  "decoding at full resolution.")
+            decode_scale = None
+    else:
+        decode_scale = None
 
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"Error: Could not open video {video_path}")
-        return
+    tiler = None
+    if tile_size or roi_polygons:
+        tiler = FrameTiler(tile_size=tile_size, overlap=tile_overlap, roi_polygons=roi_polygons)
+
+    cache, cache_writer = None, None
+    if detection_cache_dir:
+        variant = tiler.signature() if tiler else None
+        if decode_scale:
+            variant = f"decode_scale={decode_scale}" # Detections from downscaled frames differ
+        cache, cache_writer = lookup_detection_cache(detection_cache_dir, video_path, model_path, confidence_threshold,
+                                                     variant)
+        if cache is not None:
+            cache_writer = None
+        elif motion_gating or detect_interval > 1 or adaptive_detect_interval:
+            # The cache must hold the detections of every frame
+            print("Warning: motion gating and frame skipping are disabled while the detection cache is filled.")
+            motion_gating, detect_interval, adaptive_detect_interval = False, 1, False
+
+    detector = None
+    if cache is None:
+        # Imported here so that replaying the detection cache never imports torch
+        from detection.ppe_detector import PPEDetector
+        detector = PPEDetector(model_path=model_path, confidence_threshold=confidence_threshold, tiler=tiler)
+        if not detector.model: 
+            print("Failed to load the model. Exiting.")
+            return
+        if decode_scale:
+            detector = RescalingDetector(detector, decode_scale)
+        if cache_writer is not None:
+            detector = CachingDetector(detector, cache_writer)
+
+    tracker = ObjectTracker(motion_model=tracker_motion_model, **TRACKER_PARAMS)
+    associator = PPEAssociator(smoothing_window=ppe_smoothing_window, **ASSOCIATOR_PARAMS)
+    compliance_checker = SafetyComplianceChecker(**CHECKER_PARAMS)
 
+    motion_gate = MotionGate() if motion_gating and cache is None else None
+    two_stage = None
+    if two_stage_refresh_interval:
+        two_stage = TwoStageAnalyzer(detector, tracker, associator, compliance_checker,
+                                     refresh_interval=two_stage_refresh_interval)
+
+    scheduler = None
+    if cache is None and (detect_interval > 1 or adaptive_detect_interval):
+        if adaptive_detect_interval and threaded:
+            print("Warning: the threaded pipeline does not support an adaptive detection interval; using a fixed one.")
+            adaptive_detect_interval = False
+        scheduler = DetectionScheduler(max_interval=detect_interval, adaptive=adaptive_detect_interval)
+        if tracker_motion_model != 'kalman':
+            print("Warning: frame skipping without the 'kalman' motion model keeps boxes static between detections.")
+        if adaptive_detect_interval and batch_size > 1:
+            # Whether the next frame is detected depends on the tracker state after the current one
+            print("Warning: batch_size is ignored with an adaptive detection interval.")
+            batch_size = 1
+
+    cap = None
     writer = None
-    if output_video_path:
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        if fps == 0 or fps is None: 
-            print("Warning: Video FPS is 0 or None. Defaulting to 25 FPS for writer.")
-            fps = 25 
-        
-        output_dir = os.path.dirname(output_video_path)
-        if output_dir and not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir)
-                print(f"Created output directory: {output_dir}")
-            except OSError as e:
-                print(f"Error creating output directory {output_dir}: {e}")
-                # Decide if to return or continue without writing
-                output_video_path = None 
-
-        if output_video_path: # Re-check in case it was disabled
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v') 
-            writer = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
-            if not writer.isOpened():
-                print(f"Error: Could not open video writer for path {output_video_path}")
-                writer = None # Ensure writer is none if opening failed
+    if cache is None or output_video_path:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Error: Could not open video {video_path}")
+            return
+        writer = open_video_writer(cap, output_video_path)
+        if decode_scale:
+            cap = ReducedCapture(cap, decode_scale)
 
+    event_sink = open_event_sink(violation_log_path) if violation_log_path else None
+    event_log = ViolationEventLog(event_sink) if event_sink is not None else None
+    frame_sink = open_event_sink(frame_log_path, jsonl=True) if frame_log_path else None
+    frame_log = FrameRecordLog(frame_sink) if frame_sink is not None else None
+    metrics, metrics_server = start_metrics(metrics_summary_interval, metrics_port)
 
     frame_idx = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret: 
-            print("End of video or cannot read frame.")
+    last_detections = None # Reused on frames gated by the motion gate
+    end_of_stream = False
+    if cache is not None:
+        print(f"Replaying {len(cache)} frames of cached detections from {cache.entry_dir}")
+        frame_idx = replay_detection_cache(cache, tracker, associator, compliance_checker, cap, writer, event_log,
+                                           metrics, frame_log)
+        end_of_stream = True
+    elif threaded:
+        pipeline = ThreadedPipeline(detector, tracker, associator, compliance_checker,
+                                    batch_size=batch_size, motion_gate=motion_gate, scheduler=scheduler,
+                                    event_log=event_log, metrics=metrics, frame_log=frame_log)
+        frame_idx = pipeline.run(cap, writer)
+        end_of_stream = True
+    elif two_stage is not None:
+        while cap.isOpened():
+            with metrics.time('decode'):
+                ret, frame = cap.read()
+            if not ret:
+                print("End of video or cannot read frame.")
+                break
+            output_frame = two_stage.process_frame(frame, frame_idx, event_log, metrics, render=writer is not None,
+                                                   frame_log=frame_log)
+            frame_idx += 1
+            if writer:
+                with metrics.time('encode'):
+                    writer.write(output_frame)
+            metrics.maybe_log_summary()
+        end_of_stream = True
+    while cap is not None and cap.isOpened() and not end_of_stream:
+        # Collect up to batch_size frames so the detector runs one forward pass per batch
+        frames = []
+        while len(frames) < batch_size:
+            with metrics.time('decode'):
+                ret, frame = cap.read()
+            if not ret: 
+                print("End of video or cannot read frame.")
+                end_of_stream = True
+                break
+            frames.append(frame)
+
+        if not frames:
             break
-        
-        frame_idx += 1
-        print(f"Processing frame {frame_idx}...")
-
-        # Detection: returns list of [x1, y1, x2, y2, confidence, class_id, class_name]
-        all_detections = detector.detect(frame.copy()) 
-        
-        if not all_detections:
-            # If no detections, still write the original frame to the output video
-            if writer: 
-                writer.write(frame)
-            # cv2.imshow('PPE Compliance Monitoring', frame)
-            # if cv2.waitKey(1) & 0xFF == ord('q'): break 
-            continue
-
-        # Tracking: update expects detections in a specific format.
-        # ObjectTracker's update should return: [[x1,y1,x2,y2,track_id,cls_id,name], ...]
-        all_tracked_objects = tracker.update(all_detections)
-
-        # Filter for tracked persons
-        # Ensure obj[6] (class_name) exists and is correct
-        tracked_persons = [obj for obj in all_tracked_objects if len(obj) > 6 and obj[6] == 'person']
-        
-        # Association
-        # associate_ppe_to_persons expects tracked_persons and all_tracked_objects
-        person_ppe_associations = associator.associate_ppe_to_persons(tracked_persons, all_tracked_objects)
-        
-        # Compliance Checking
-        ppe_violations = compliance_checker.check_ppe_compliance(person_ppe_associations)
-
-        # Visualization
-        # draw_tracked_ppe_status needs tracked_persons, associations, violations, AND all_tracked_objects
-        output_frame = draw_tracked_ppe_status(frame.copy(), tracked_persons, person_ppe_associations, ppe_violations, all_tracked_objects)
-        
-        if writer:
-            writer.write(output_frame)
-        # cv2.imshow('PPE Compliance Monitoring', output_frame)
-        
-        # key = cv2.waitKey(1) & 0xFF # Commented for Colab
-        # if key == ord('q'):
-        #     print("Quitting...")
-        #     break
-        # elif key == ord('p'): 
-        #     print("Paused. Press any key to continue...")
-        #     cv2.waitKey(-1) # cv2.waitKey(0) also works for indefinite pause
 
+        # Detection: one columnar Detections container (xyxy, conf, cls_id) per frame.
+        # Frames the scheduler skips get None, which makes process_frame extrapolate tracks
+        run_detector = [True] * len(frames)
+        if scheduler is not None:
+            if scheduler.adaptive:
+                run_detector[0] = scheduler.should_detect() # batch_size is 1
+            else:
+                run_detector = schedule_detection(scheduler, len(frames))
+        batch_detections, last_detections = run_detection_stage(frames, run_detector, detector, motion_gate,
+                                                                last_detections, metrics)
 
-    cap.release()
+        # Tracking must see the frames strictly in sequence, so the rest of the
+        # pipeline runs frame by frame in decode order.
+        for frame, all_detections in zip(frames, batch_detections):
+            logger.debug("Processing frame %d...", frame_idx + 1)
+            output_frame = process_frame(frame, all_detections, tracker, associator, compliance_checker,
+                                         frame_idx, event_log, metrics, render=writer is not None,
+                                         frame_log=frame_log)
+            frame_idx += 1
+            if scheduler is not None and scheduler.adaptive:
+                scheduler.record_frame(tracker, detected=all_detections is not None)
+            if writer:
+                with metrics.time('encode'):
+                    writer.write(output_frame)
+            # cv2.imshow('PPE Compliance Monitoring', output_frame)
+            
+            # key = cv2.waitKey(1) & 0xFF # Commented for Colab
+            # if key == ord('q'):
+            #     print("Quitting...")
+            #     break
+            # elif key == ord('p'): 
+            #     print("Paused. Press any key to continue...")
+            #     cv2.waitKey(-1) # cv2.waitKey(0) also works for indefinite pause
+        metrics.maybe_log_summary()
+
+    if cap is not None:
+        cap.release()
+    if cache_writer is not None:
+        if len(cache_writer) == frame_idx:
+            cache = cache_writer.commit()
+            print(f"Cached detections of {len(cache)} frames in {cache.entry_dir}")
+        else:
+            print("Warning: not every frame was detected; the detection cache was not written.")
+    if event_log is not None:
+        event_log.finish()
+        event_sink.close()
+        print(f"Violation events saved to {violation_log_path}")
+    if frame_sink is not None:
+        frame_sink.close()
+        print(f"{frame_log.records_written} frame records saved to {frame_log_path}")
+    if scheduler is not None:
+        print(scheduler.summary())
+    if motion_gate is not None:
+        print(motion_gate.summary())
+    if two_stage is not None:
+        print(two_stage.summary())
+    stop_metrics(metrics, metrics_server)
     if writer: 
         writer.release()
         print(f"Output video saved to {output_video_path}")
     # cv2.destroyAllWindows() # Commented for Colab
     print("Processing finished.")
 
+def main_multi_stream(video_paths, model_path, output_dir=None, max_batch_size=8, frames_per_turn=1,
+                      tracker_motion_model='none', motion_gating=False, ppe_smoothing_window=0,
+                      violation_log_path=None, confidence_threshold=0.4, metrics_summary_interval=None,
+                      metrics_port=None):
+    """
+    Processes several videos/cameras with one shared model instance.
+    Each stream keeps its own tracker, associator and compliance checker; frames
+    from all streams are batched into shared detector calls (see MultiStreamRunner).
+    :param video_paths: List of video files or camera URLs.
+    :param output_dir: If given, each stream is written to <output_dir>/<name>_ppe.mp4
+    :param max_batch_size: Upper bound on the frames per shared detector call.
+    :param frames_per_turn: Frames each stream contributes per scheduling round (see MultiStreamRunner).
+    :param violation_log_path: If given, the violation events of all streams go to this one
+                               file, tagged with the stream name.
+    :param confidence_threshold: Detections below this confidence are dropped.
+    :param metrics_summary_interval: See main(); metrics carry a stream label.
+    :param metrics_port: See main().
+    """
+    if not os.path.exists(model_path):
+        print(f"Error: Model file not found at {model_path}")
+        return
+
+    from detection.ppe_detector import PPEDetector
+    detector = PPEDetector(model_path=model_path, confidence_threshold=confidence_threshold) 
+    if not detector.model: 
+        print("Failed to load the model. Exiting.")
+        return
+
+    event_sink = open_event_sink(violation_log_path) if violation_log_path else None
+    metrics, metrics_server = start_metrics(metrics_summary_interval, metrics_port)
+    streams = []
+    for idx, video_path in enumerate(video_paths):
+        name = f"{idx}_{os.path.splitext(os.path.basename(video_path))[0]}"
+        output_video_path = os.path.join(output_dir, f"{name}_ppe.mp4") if output_dir else None
+        streams.append(StreamState(
+            name, video_path, output_video_path,
+            tracker_kwargs=dict(TRACKER_PARAMS, motion_model=tracker_motion_model),
+            associator_kwargs=dict(ASSOCIATOR_PARAMS, smoothing_window=ppe_smoothing_window),
+            checker_kwargs=dict(CHECKER_PARAMS),
+            motion_gating=motion_gating, event_sink=event_sink, metrics=metrics))
+
+    runner = MultiStreamRunner(detector, streams, max_batch_size=max_batch_size, frames_per_turn=frames_per_turn,
+                               metrics=metrics)
+    try:
+        frames_per_stream = runner.run()
+    finally:
+        if event_sink is not None:
+            event_sink.close()
+        stop_metrics(metrics, metrics_server)
+    for name, frame_count in frames_per_stream.items():
+        print(f"[{name}] Processed {frame_count} frames.")
+    print("Processing finished.")
+
+def main_offline_sharded(video_path, model_path, output_video_path=None, violation_log_path=None,
+                         num_workers=None, overlap=30, batch_size=4, tracker_motion_model='none',
+                         ppe_smoothing_window=0, confidence_threshold=0.4):
+    """
+    Reprocesses a recorded video on all cores: the video is split into overlapping
+    frame-range shards processed by a process pool (one detector per worker), and
+    the shards are stitched back together with consistent track IDs (see pipeline.sharded_offline).
+    :param overlap: Frames each shard reads before its range; must exceed the tracker's min_hits.
+    :param confidence_threshold: Detections below this confidence are dropped.
+    """
+    if not os.path.exists(model_path):
+        print(f"Error: Model file not found at {model_path}")
+        return
+    if not os.path.exists(video_path):
+        print(f"Error: Video file not found at {video_path}")
+        return
+
+    run_sharded(video_path, model_path, output_video_path=output_video_path,
+                violation_log_path=violation_log_path, num_workers=num_workers, overlap=overlap,
+                batch_size=batch_size, confidence_threshold=confidence_threshold,
+                tracker_kwargs=dict(TRACKER_PARAMS, motion_model=tracker_motion_model),
+                associator_kwargs=dict(ASSOCIATOR_PARAMS, smoothing_window=ppe_smoothing_window),
+                checker_kwargs=dict(CHECKER_PARAMS))
+    print("Processing finished.")
+
+def main_process_pipeline(video_path, model_path, output_video_path=None, batch_size=4, num_slots=16,
+                          num_threads=None, tracker_motion_model='none', ppe_smoothing_window=0,
+                          violation_log_path=None, confidence_threshold=0.4,
+                          metrics_summary_interval=None, metrics_port=None):
+    """
+    Processes one video with decoding and detection in separate processes that
+    hand frames over through shared memory (see pipeline.process_pipeline), for
+    when the detector competes with tracking and drawing for the GIL.
+    :param num_slots: Frames in flight between the processes (shared memory used: num_slots frames).
+    :param num_threads: Intra-op threads of the detector process (None = the backend's default).
+    :param metrics_summary_interval: See main().
+    :param metrics_port: See main().
+    """
+    if not os.path.exists(model_path):
+        print(f"Error: Model file not found at {model_path}")
+        return
+    if not os.path.exists(video_path):
+        print(f"Error: Video file not found at {video_path}")
+        return
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video {video_path}")
+        return
+    writer = open_video_writer(cap, output_video_path)
+    cap.release()
+    event_sink = open_event_sink(violation_log_path) if violation_log_path else None
+    event_log = ViolationEventLog(event_sink) if event_sink is not None else None
+    metrics, metrics_server = start_metrics(metrics_summary_interval, metrics_port)
+
+    pipeline = ProcessPipeline(model_path,
+                               ObjectTracker(motion_model=tracker_motion_model, **TRACKER_PARAMS),
+                               PPEAssociator(smoothing_window=ppe_smoothing_window, **ASSOCIATOR_PARAMS),
+                               SafetyComplianceChecker(**CHECKER_PARAMS),
+                               confidence_threshold=confidence_threshold, batch_size=batch_size,
+                               num_slots=num_slots, num_threads=num_threads, event_log=event_log, metrics=metrics)
+    try:
+        frame_count = pipeline.run(video_path, writer)
+    finally:
+        if writer is not None:
+            writer.release()
+        if event_log is not None:
+            event_log.finish()
+            event_sink.close()
+        stop_metrics(metrics, metrics_server)
+    if writer is not None:
+        print(f"Output video saved to {output_video_path}")
+    if event_log is not None:
+        print(f"Violation events saved to {violation_log_path}")
+    print(f"Processed {frame_count} frames.")
+    print("Processing finished.")
+
+def main_parameter_sweep(video_path, model_path, detection_cache_dir, grid, report_path=None,
+                         num_workers=None, tracker_motion_model='none', ppe_smoothing_window=0,
+                         confidence_threshold=0.4):
+    """
+    Evaluates every combination of a tracker/associator/checker parameter grid on
+    the cached detections of one video, in parallel (see pipeline.parameter_sweep).
+    The detector only runs if the video is not in the detection cache yet.
+    :param grid: e.g. {'tracker': {'min_hits': [1, 3]}, 'associator': {'vest_overlap_factor': [0.2, 0.3, 0.4]}};
+                 parameters not in the grid keep the values main() uses.
+    :param report_path: If given, the results are also written there as JSON.
+    :param confidence_threshold: Detections below this confidence are dropped; part of the
+                                 detection cache key, so it selects the cached detections.
+    """
+    if not os.path.exists(model_path):
+        print(f"Error: Model file not found at {model_path}")
+        return
+    if not os.path.exists(video_path):
+        print(f"Error: Video file not found at {video_path}")
+        return
+
+    cache, _ = lookup_detection_cache(detection_cache_dir, video_path, model_path, confidence_threshold)
+    if cache is None:
+        print("Video not in the detection cache yet; running the detector once.")
+        main(video_path, model_path, detection_cache_dir=detection_cache_dir,
+             confidence_threshold=confidence_threshold)
+        cache, _ = lookup_detection_cache(detection_cache_dir, video_path, model_path, confidence_threshold)
+        if cache is None:
+            return
+
+    base_config = {
+        'tracker': dict(TRACKER_PARAMS, motion_model=tracker_motion_model),
+        'associator': dict(ASSOCIATOR_PARAMS, smoothing_window=ppe_smoothing_window),
+        'checker': dict(CHECKER_PARAMS),
+    }
+    results = run_parameter_sweep(cache.entry_dir, grid, base_config=base_config, num_workers=num_workers)
+    print(format_sweep_report(results))
+    if report_path:
+        write_sweep_report(results, report_path)
+        print(f"Sweep report saved to {report_path}")
+    return results
+
 if __name__ == '__main__':
     # --- Define paths for Colab ---
     # Assuming your project 'Computer_Vision' is cloned into /content/
@@ -133,7 +497,28 @@ if __name__ == '__main__':
 
     VIDEO_PATH = os.path.join(project_base_dir, 'sample_videos', 'video_test.mp4')
     MODEL_WEIGHTS_PATH = os.path.join(project_base_dir, 'models', 'best.pt')
+    EXPORTED_MODEL_PATH = os.path.join(project_base_dir, 'models', 'best.torchscript')
+    if os.path.exists(EXPORTED_MODEL_PATH):
+        MODEL_WEIGHTS_PATH = EXPORTED_MODEL_PATH # Written by export_detector.py; skips torch.hub at startup
+    # A best.onnx from 'export_detector.py --format onnx' (or best.int8.onnx from quantize_detector.py)
+    # runs on the CPU with ONNX Runtime instead of torch
     OUTPUT_VIDEO = os.path.join(project_base_dir, 'output_videos', 'output_ppe_compliance_colab.mp4')
+    VIOLATION_LOG = None # e.g. os.path.join(project_base_dir, 'output_videos', 'violation_events.jsonl'); replaced on every run
+    DETECTION_CACHE_DIR = None # e.g. os.path.join(project_base_dir, 'detection_cache'): re-runs on the same video, weights and threshold skip the model
+    BATCH_SIZE = 1 # Frames per detector forward pass; only raise it with the .pt weights or an export made with --batch-size N
+    TRACKER_MOTION_MODEL = 'none' # 'none' (IoU matching on the last box) or 'kalman' (SORT, needed for DETECT_INTERVAL > 1)
+    THREADED = False # True overlaps decode, inference, analysis and encoding on separate threads
+    MOTION_GATING = False # True reuses detections on unchanged frames; only for a fixed, non-moving camera
+    PPE_SMOOTHING_WINDOW = 0 # e.g. 15: frames over which each person's PPE status is voted (0 = off)
+    DETECT_INTERVAL = 1 # Run the detector at most every N frames; >1 needs 'kalman' to move boxes in between
+    METRICS_SUMMARY_INTERVAL = None # e.g. 30: seconds between per-stage metrics summaries (None = metrics off)
+    METRICS_PORT = None # e.g. 9108 to serve /metrics (Prometheus) and /metrics.json while running
+    TILE_SIZE = None # e.g. (640, 640) to detect on overlapping tiles of 4K frames (small, distant helmets)
+    ROI_POLYGONS = None # e.g. [[(0, 400), (1920, 400), (1920, 1080), (0, 1080)]] to skip the sky
+    TWO_STAGE_REFRESH_INTERVAL = None # e.g. 15: full-frame pass every 15 frames, person crops in between
+    ANALYTICS_ONLY = False # Headless: no output video, only violation events and frame records
+    DECODE_SCALE = None # e.g. 0.5 to shrink frames right after decoding (analytics-only)
+    FRAME_LOG = os.path.join(project_base_dir, 'output_videos', 'frame_records.jsonl') if ANALYTICS_ONLY else None
 
     # Ensure output directory for video exists
     output_video_dir = os.path.dirname(OUTPUT_VIDEO)
@@ -151,5 +536,14 @@ if __name__ == '__main__':
     print(f"Attempting to process video: {VIDEO_PATH}")
     print(f"Using model: {MODEL_WEIGHTS_PATH}")
     print(f"Output will be saved to: {OUTPUT_VIDEO}")
+
+    # Per-frame details (e.g. "Processing frame N...") are logged at DEBUG level
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(name)s: %(message)s')
     
-    main(VIDEO_PATH, MODEL_WEIGHTS_PATH, OUTPUT_VIDEO)
\ No newline at end of file
+    main(VIDEO_PATH, MODEL_WEIGHTS_PATH, OUTPUT_VIDEO, batch_size=BATCH_SIZE,
+         tracker_motion_model=TRACKER_MOTION_MODEL, detect_interval=DETECT_INTERVAL, adaptive_detect_interval=DETECT_INTERVAL > 1,
+         motion_gating=MOTION_GATING, threaded=THREADED, ppe_smoothing_window=PPE_SMOOTHING_WINDOW,
+         violation_log_path=VIOLATION_LOG, detection_cache_dir=DETECTION_CACHE_DIR,
+         metrics_summary_interval=METRICS_SUMMARY_INTERVAL, metrics_port=METRICS_PORT,
+         tile_size=TILE_SIZE, roi_polygons=ROI_POLYGONS, two_stage_refresh_interval=TWO_STAGE_REFRESH_INTERVAL,
+         analytics_only=ANALYTICS_ONLY, decode_scale=DECODE_SCALE, frame_log_path=FRAME_LOG)
\ No newline at end of file
@@ -0,0 +1,119 @@
+import time
+import cv2
+from detection.detections import Detections
+
+# Analytics-only (headless) mode, for server-side monitoring where nobody
+# watches the video. Without an output video process_frame() neither copies
+# nor draws frames, so after decoding a frame is only read by the motion gate
+# and the detector's letterboxing. On top of that:
+#   - ReducedCapture shrinks each frame right after decoding (OpenCV cannot
+#     decode a file at a lower resolution), so every later read of the frame
+#     touches a fraction of the pixels. The model letterboxes to its input
+#     size anyway, so a 1080p frame at scale 0.5 loses little.
+#   - RescalingDetector maps the detections back to source-video pixels, so
+#     tracks, violation events and records keep the coordinates of the video.
+#   - FrameRecordLog writes one structured record per analysed frame (tracks
+#     and per-person PPE status) through a JSONL event sink; violation
+#     start/end events still go through ViolationEventLog.
+
+
+class ReducedCapture:
+    """Wraps a cv2.VideoCapture and downscales every frame it reads by scale."""
+    def __init__(self, cap, scale):
+        if not 0 < scale <= 1:
+            raise ValueError(f"scale must be in (0, 1], got {scale}")
+        self.cap = cap
+        self.scale = scale
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop_id):
+        return self.cap.get(prop_id)
+
+    def release(self):
+        self.cap.release()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret or self.scale == 1:
+            return ret, frame
+        h, w = frame.shape[:2]
+        size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+        return ret, cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+class RescalingDetector:
+    """
+    Wraps a PPEDetector that runs on frames from a ReducedCapture and returns
+    its detections in source-video pixels.
+    """
+    def __init__(self, detector, scale):
+        self.detector = detector
+        self.scale = scale
+
+    @property
+    def model(self):
+        return self.detector.model
+
+    @property
+    def class_names(self):
+        return self.detector.class_names
+
+    def _rescale(self, detections):
+        return Detections(detections.xyxy / self.scale, detections.conf, detections.cls_id, detections.names)
+
+    def detect_arrays(self, frame):
+        return self._rescale(self.detector.detect_arrays(frame))
+
+    def detect_batch_arrays(self, frames):
+        return [self._rescale(detections) for detections in self.detector.detect_batch_arrays(frames)]
+
+    def detect(self, frame):
+        return self.detect_arrays(frame).to_list()
+
+    def detect_batch(self, frames):
+        return [detections.to_list() for detections in self.detect_batch_arrays(frames)]
+
+
+def frame_record(frame_idx, result, stream=None):
+    """
+    :param result: analyze_frame() result, or None for a frame without detections.
+    :return: JSON-serializable dict with the frame's tracks and per-person PPE status
+    """
+    record = {'record': 'frame', 'stream': stream, 'frame': frame_idx, 'tracks': [], 'persons': [],
+              'wall_time': time.time()}
+    if result is None:
+        return record
+    for obj in result['tracks']:
+        record['tracks'].append({'track_id': int(obj[4]), 'class': obj[6], 'bbox': [float(v) for v in obj[:4]]})
+    violations = result['violations']
+    for person_id, status in result['associations'].items():
+        record['persons'].append({
+            'person_id': int(person_id),
+            'helmet': status['helmet_status'],
+            'vest': status['vest_status'],
+            'violations': violations[person_id]['violations'] if person_id in violations else [],
+            'bbox': [float(v) for v in status['bbox']],
+        })
+    return record
+
+
+class FrameRecordLog:
+    """
+    Writes one frame_record() per frame to a sink from violation_events
+    (a JSONL sink: the SQLite sink only has the violation event columns).
+    The sink replaces the records of an earlier run unless opened with append=True.
+    """
+    def __init__(self, sink, stream=None, every_n_frames=1):
+        """:param every_n_frames: Only write every n-th frame's record, to thin out the output."""
+        self.sink = sink
+        self.stream = stream
+        self.every_n_frames = every_n_frames
+        self.records_written = 0
+
+    def record(self, frame_idx, result):
+        if frame_idx % self.every_n_frames:
+            return
+        self.sink.write([frame_record(frame_idx, result, self.stream)])
+        self.records_written += 1
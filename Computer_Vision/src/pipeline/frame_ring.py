@@ -0,0 +1,143 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+# Frame transport between pipeline processes without copies.
+#
+# Sending a 1080p frame through a multiprocessing.Queue pickles 6 MB, copies
+# it through a pipe and unpickles it on the other side, at every stage
+# boundary. SharedFrameRing instead keeps num_slots fixed-shape uint8 frames in
+# one multiprocessing.shared_memory block that every process maps. Stages only
+# pass slot indices (small ints) through their queues, and each stage reads or
+# writes the frame in place through ring.frame(slot), a numpy view:
+#
+#   decode:  slot = ring.acquire(); ring.read_frame(cap, slot); q1.put((frame_idx, slot))
+#   detect:  detections = detector.detect_arrays(ring.frame(slot)); q2.put((frame_idx, slot, detections))
+#   render:  DEFAULT_RENDERER.draw(ring.frame(slot), ...); writer.write(ring.frame(slot)); ring.release(slot)
+#
+# ProcessPipeline (pipeline/process_pipeline.py) runs this chain.
+#
+# Each slot has a reference count in shared memory. acquire() hands out a
+# free slot with one reference; a stage that passes the slot to several
+# consumers retain()s it once per extra consumer, and every consumer
+# release()s it when done. The slot is free again at zero, and acquire()
+# blocks while all slots are in use, which bounds memory like the bounded
+# queues of ThreadedPipeline.
+#
+# The ring is passed to child processes as a Process argument (it pickles by
+# the shared memory name); the process that created it unlink()s it at the end.
+
+
+class SharedFrameRing:
+    def __init__(self, num_slots, frame_shape, mp_context=None):
+        """
+        :param num_slots: Number of frames that can be in flight at once.
+        :param frame_shape: (height, width, channels) of every frame.
+        :param mp_context: multiprocessing context of the processes sharing the ring
+                           (spawn by default, like the process pools of this package).
+        """
+        if num_slots < 1:
+            raise ValueError(f"num_slots must be at least 1, got {num_slots}")
+        mp_context = mp_context or multiprocessing.get_context('spawn')
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.frame_bytes = int(np.prod(self.frame_shape))
+        refcount_bytes = num_slots * np.dtype(np.int32).itemsize
+        # Refcounts first, so the frames start at an aligned offset
+        self._shm = shared_memory.SharedMemory(create=True, size=refcount_bytes + num_slots * self.frame_bytes)
+        self._lock = mp_context.Lock() # Guards the refcounts
+        self._free_slots = mp_context.Semaphore(num_slots)
+        self._owner = True
+        self._map()
+        self._refcounts[:] = 0
+
+    def _map(self):
+        self._refcounts = np.ndarray((self.num_slots,), dtype=np.int32, buffer=self._shm.buf)
+        self._frames = np.ndarray((self.num_slots,) + self.frame_shape, dtype=np.uint8, buffer=self._shm.buf,
+                                  offset=self._refcounts.nbytes)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_refcounts'], state['_frames'] # Views are re-created on the shared memory of the other side
+        state['_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map()
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def acquire(self, timeout=None):
+        """
+        Takes a free slot and gives it one reference.
+        :return: Slot index, or None if no slot became free within timeout seconds
+        """
+        if not self._free_slots.acquire(timeout=timeout):
+            return None
+        with self._lock:
+            slot = int(np.flatnonzero(self._refcounts == 0)[0])
+            self._refcounts[slot] = 1
+        return slot
+
+    def retain(self, slot, count=1):
+        """Adds references to a slot that is handed to more than one consumer."""
+        with self._lock:
+            if self._refcounts[slot] <= 0:
+                raise ValueError(f"Slot {slot} is not in use")
+            self._refcounts[slot] += count
+
+    def release(self, slot):
+        """Drops one reference; the slot is free again when none are left."""
+        with self._lock:
+            if self._refcounts[slot] <= 0:
+                raise ValueError(f"Slot {slot} is not in use")
+            self._refcounts[slot] -= 1
+            freed = self._refcounts[slot] == 0
+        if freed:
+            self._free_slots.release()
+
+    def refcount(self, slot):
+        return int(self._refcounts[slot])
+
+    def frame(self, slot):
+        """:return: The slot's frame as a writable numpy view into the shared memory (no copy)."""
+        return self._frames[slot]
+
+    def write_frame(self, slot, frame):
+        """Copies a frame that was produced elsewhere into a slot (the one copy instead of pickling)."""
+        np.copyto(self._frames[slot], frame)
+
+    def read_frame(self, cap, slot):
+        """
+        Decodes the next frame of a cv2.VideoCapture straight into a slot.
+        :return: False at the end of the stream
+        """
+        frame = self._frames[slot]
+        ret, decoded = cap.read(frame)
+        if ret and not np.shares_memory(decoded, frame):
+            # OpenCV allocated its own buffer (e.g. the video is not frame_shape)
+            if decoded.shape != frame.shape:
+                raise ValueError(f"Decoded frame shape {decoded.shape} does not match the ring's {frame.shape}")
+            np.copyto(frame, decoded)
+        return ret
+
+    def close(self):
+        """
+        Unmaps the shared memory in this process. Views returned by frame() must not be used
+        afterwards; if some are still referenced, the mapping goes away with the last of them.
+        """
+        self._refcounts = self._frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass # Views still exported (e.g. held by a traceback)
+
+    def unlink(self):
+        """Closes and frees the shared memory; only the process that created the ring may call this."""
+        if not self._owner:
+            raise RuntimeError("Only the process that created the ring can unlink it.")
+        self._shm.unlink() # First, so the name is freed even if this process still holds views
+        self.close()
@@ -0,0 +1,226 @@
+from project_utils.metrics import NULL_METRICS
+from project_utils.overlay_renderer import DEFAULT_RENDERER
+
+def analyze_frame(all_detections, tracker, associator, compliance_checker, metrics=NULL_METRICS):
+    """
+    Runs tracking, association and compliance checking for one frame.
+    :param all_detections: Detections for this frame from PPEDetector (container or list),
+                           or None if the detector skipped this frame.
+    :param metrics: PipelineMetrics receiving the 'track', 'associate' and 'check' timings.
+    :return: Dict with 'tracks' (all tracked objects), 'persons' (tracked persons),
+             'associations' and 'violations', or None if the frame had no detections
+             (the tracker still ages its tracks, so the frame counts towards max_age).
+    """
+    if all_detections is not None and len(all_detections) == 0:
+        with metrics.time('track'):
+            tracker.update(all_detections)
+        metrics.set_gauge('tracks_alive', len(tracker.table))
+        associator.forget_tracks(tracker.expired_track_ids)
+        return None
+    with metrics.time('track'):
+        if all_detections is None:
+            # Detector skipped this frame: the tracker extrapolates the boxes
+            all_tracked_objects = tracker.extrapolate()
+        else:
+            # Tracking: update expects detections in a specific format.
+            # ObjectTracker's update should return: [[x1,y1,x2,y2,track_id,cls_id,name], ...]
+            all_tracked_objects = tracker.update(all_detections)
+    metrics.set_gauge('tracks_alive', len(tracker.table))
+    return analyze_tracks(all_tracked_objects, tracker.expired_track_ids, associator, compliance_checker, metrics)
+
+def analyze_tracks(all_tracked_objects, expired_track_ids, associator, compliance_checker, metrics=NULL_METRICS,
+                   ppe_by_person=None):
+    """
+    Association and compliance checking on the tracker output of one frame
+    (the part of analyze_frame() after tracking).
+    :param expired_track_ids: Track IDs the tracker dropped on this frame.
+    :param ppe_by_person: Optional {person_track_id: Detections} from the two-stage mode; PPE is
+                          then taken from each person's own crop instead of matched geometrically.
+    """
+    # Drop per-track association state (e.g. status history) of expired tracks
+    associator.forget_tracks(expired_track_ids)
+
+    # Filter for tracked persons
+    # Ensure obj[6] (class_name) exists and is correct
+    tracked_persons = [obj for obj in all_tracked_objects if len(obj) > 6 and obj[6] == 'person']
+    
+    # Association
+    # associate_ppe_to_persons expects tracked_persons and all_tracked_objects
+    with metrics.time('associate'):
+        if ppe_by_person is not None:
+            person_ppe_associations = associator.associate_ppe_by_person(tracked_persons, ppe_by_person)
+        else:
+            person_ppe_associations = associator.associate_ppe_to_persons(tracked_persons, all_tracked_objects)
+    
+    # Compliance Checking
+    with metrics.time('check'):
+        ppe_violations = compliance_checker.check_ppe_compliance(person_ppe_associations)
+
+    return {
+        'tracks': all_tracked_objects,
+        'persons': tracked_persons,
+        'associations': person_ppe_associations,
+        'violations': ppe_violations,
+    }
+
+def render_frame(frame, result, metrics=NULL_METRICS):
+    """
+    Draws an analyze_frame() result on a copy of frame.
+    :return: The frame to write to the output video.
+    """
+    if result is None:
+        # If no detections, the original frame is written to the output video
+        return frame
+    # The renderer needs tracked_persons, associations, violations, AND all_tracked_objects
+    with metrics.time('draw'):
+        return DEFAULT_RENDERER.draw(frame.copy(), result['persons'], result['associations'],
+                                     result['violations'], result['tracks'])
+
+def process_frame(frame, all_detections, tracker, associator, compliance_checker, frame_idx=None, event_log=None,
+                  metrics=NULL_METRICS, render=True, frame_log=None):
+    """
+    Runs tracking, association, compliance checking and drawing for one frame.
+    :param all_detections: Detections for this frame from PPEDetector (container or list),
+                           or None if the detector skipped this frame.
+    :param frame_idx: 0-based index of the frame in its video, used for violation events.
+    :param event_log: Optional ViolationEventLog that receives this frame's violations.
+    :param metrics: PipelineMetrics receiving the per-stage timings (see project_utils.metrics).
+    :param render: False when nothing writes the output video: the frame is then neither
+                   copied nor drawn on.
+    :param frame_log: Optional FrameRecordLog that receives this frame's tracks and PPE status.
+    :return: The frame to write to the output video, or None if render is False.
+    """
+    result = analyze_frame(all_detections, tracker, associator, compliance_checker, metrics)
+    if event_log is not None:
+        event_log.record(frame_idx, result['violations'] if result is not None else {})
+    if frame_log is not None:
+        frame_log.record(frame_idx, result)
+    metrics.inc('frames_total')
+    if not render:
+        return None
+    return render_frame(frame, result, metrics)
+
+def schedule_detection(scheduler, num_frames):
+    """
+    Returns one bool per frame telling whether the detector should run on it.
+    Only valid for a fixed-interval DetectionScheduler (adaptive=False), whose
+    decisions do not depend on the tracker, so a whole batch can be planned at once.
+    """
+    run_detector = []
+    for _ in range(num_frames):
+        run = scheduler.should_detect()
+        scheduler.record_frame(None, detected=run)
+        run_detector.append(run)
+    return run_detector
+
+def plan_detection(frames, run_detector, motion_gate):
+    """
+    Decides per frame whether to skip it, reuse the previous detections (gated)
+    or run the detector. Gating is checked in frame order so each frame is
+    compared with the last frame that was detected.
+    :return: List with 'skip', 'reuse' or 'detect' per frame
+    """
+    plan = []
+    for frame, run in zip(frames, run_detector):
+        if not run:
+            plan.append('skip')
+        elif motion_gate is not None and not motion_gate.should_run(frame):
+            plan.append('reuse')
+        else:
+            plan.append('detect')
+    return plan
+
+def assemble_detections(plan, detected, last_detections):
+    """
+    Expands the results of the 'detect' frames back to one entry per frame.
+    :param detected: Detections for the 'detect' frames of plan, in order.
+    :param last_detections: Detections of the last detected frame before this group.
+    :return: (list with one Detections or None per frame, detections of the last detected frame)
+    """
+    batch_detections = []
+    detected_iter = iter(detected)
+    for action in plan:
+        if action == 'detect':
+            last_detections = next(detected_iter)
+            batch_detections.append(last_detections)
+        elif action == 'reuse':
+            batch_detections.append(last_detections)
+        else:
+            batch_detections.append(None)
+    return batch_detections, last_detections
+
+def detect_frames(detector, frames):
+    """Runs the detector on frames with one forward pass, returning one Detections per frame."""
+    if len(frames) == 1:
+        return [detector.detect_arrays(frames[0])]
+    return detector.detect_batch_arrays(frames)
+
+def record_detection_metrics(metrics, plan, detected, tile_stats=None):
+    """
+    Counts detected/gated/skipped frames of a plan and the detections of its detected frames.
+    :param tile_stats: Optional per-frame tiling stats of the detected frames (PPEDetector.tile_stats).
+    """
+    if not metrics.enabled:
+        return
+    metrics.inc('frames_detected_total', plan.count('detect'))
+    metrics.inc('frames_gated_total', plan.count('reuse'))
+    metrics.inc('frames_skipped_total', plan.count('skip'))
+    if detected:
+        num_detections = sum(len(detections) for detections in detected)
+        metrics.inc('detections_total', num_detections)
+        metrics.set_gauge('detections_per_frame', num_detections / len(detected))
+    if detected and tile_stats:
+        num_tiles = sum(stats['tiles'] for stats in tile_stats)
+        tile_pixels = sum(stats['tile_pixels'] for stats in tile_stats)
+        metrics.inc('tiles_total', num_tiles)
+        metrics.inc('tile_pixels_total', tile_pixels)
+        metrics.set_gauge('tiles_per_frame', num_tiles / len(tile_stats))
+        metrics.set_gauge('tile_pixel_fraction', tile_pixels / sum(stats['frame_pixels'] for stats in tile_stats))
+
+def run_detection_stage(frames, run_detector, detector, motion_gate, last_detections, metrics=NULL_METRICS):
+    """
+    Produces the detections for a group of consecutive frames.
+    :param run_detector: One bool per frame; False means the frame is skipped (None is returned for it).
+    :param motion_gate: Optional MotionGate. Frames it gates reuse the most recent detections.
+    :param last_detections: Detections of the last frame before this group that was detected.
+    :param metrics: PipelineMetrics receiving the 'detect' timing and the frame counters.
+    :return: (list with one Detections or None per frame, detections of the last detected frame)
+    """
+    plan = plan_detection(frames, run_detector, motion_gate)
+    # No copy: the detectors only read their input (letterboxing allocates a new array)
+    frames_to_detect = [frame for frame, action in zip(frames, plan) if action == 'detect']
+    with metrics.time('detect'):
+        detected = detect_frames(detector, frames_to_detect)
+    record_detection_metrics(metrics, plan, detected, getattr(detector, 'tile_stats', None))
+    return assemble_detections(plan, detected, last_detections)
+
+def replay_detection_cache(cache, tracker, associator, compliance_checker, cap=None, writer=None, event_log=None,
+                           metrics=NULL_METRICS, frame_log=None):
+    """
+    Runs the analysis on cached detections instead of running the detector.
+    :param cache: DetectionCache with one entry per video frame.
+    :param cap: Optional capture of the same video; only needed when writer is given,
+                otherwise no frame is decoded at all.
+    :return: Number of frames processed
+    """
+    decode = cap is not None and writer is not None
+    for frame_idx in range(len(cache)):
+        if decode:
+            with metrics.time('decode'):
+                ret, frame = cap.read()
+            if not ret:
+                print("End of video or cannot read frame.")
+                return frame_idx
+            output_frame = process_frame(frame, cache[frame_idx], tracker, associator, compliance_checker,
+                                         frame_idx, event_log, metrics, frame_log=frame_log)
+            with metrics.time('encode'):
+                writer.write(output_frame)
+        else:
+            result = analyze_frame(cache[frame_idx], tracker, associator, compliance_checker, metrics)
+            if event_log is not None:
+                event_log.record(frame_idx, result['violations'] if result is not None else {})
+            if frame_log is not None:
+                frame_log.record(frame_idx, result)
+            metrics.inc('frames_total')
+        metrics.maybe_log_summary()
+    return len(cache)
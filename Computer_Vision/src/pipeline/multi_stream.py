@@ -0,0 +1,160 @@
+import cv2
+from association.ppe_associator import PPEAssociator
+from compliance_checker.safety_rules import SafetyComplianceChecker
+from compliance_checker.violation_events import ViolationEventLog
+from detection.motion_gate import MotionGate
+from pipeline.frame_stages import (assemble_detections, detect_frames, plan_detection, process_frame,
+                                   record_detection_metrics)
+from project_utils.metrics import NULL_METRICS
+from project_utils.video_utils import open_video_writer
+from tracking.object_tracker import ObjectTracker
+
+
+class StreamState:
+    """
+    Everything that belongs to one camera: its capture and writer, and its own
+    tracker, associator and compliance checker, so track IDs and PPE state never
+    leak between streams.
+    """
+    def __init__(self, name, source, output_video_path=None, tracker_kwargs=None,
+                 associator_kwargs=None, checker_kwargs=None, motion_gating=False, event_sink=None,
+                 metrics=NULL_METRICS):
+        self.name = name
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            print(f"Error: Could not open video {source} for stream '{name}'")
+        self.writer = open_video_writer(self.cap, output_video_path) if self.cap.isOpened() else None
+        self.output_video_path = output_video_path
+
+        self.tracker = ObjectTracker(**(tracker_kwargs or {}))
+        self.associator = PPEAssociator(**(associator_kwargs or {}))
+        self.compliance_checker = SafetyComplianceChecker(**(checker_kwargs or {}))
+        self.motion_gate = MotionGate() if motion_gating else None
+        # Streams may share one event sink; events carry the stream name
+        self.event_log = ViolationEventLog(event_sink, stream=name) if event_sink is not None else None
+        self.metrics = metrics.for_stream(name)
+
+        self.last_detections = None
+        self.frames_processed = 0
+        self.finished = not self.cap.isOpened()
+
+    def read_frames(self, max_frames):
+        """Reads up to max_frames frames, marking the stream finished at end-of-stream."""
+        frames = []
+        while len(frames) < max_frames and not self.finished:
+            with self.metrics.time('decode'):
+                ret, frame = self.cap.read()
+            if not ret:
+                print(f"[{self.name}] End of video or cannot read frame.")
+                self.finished = True
+                break
+            frames.append(frame)
+        return frames
+
+    def release(self):
+        self.cap.release()
+        if self.event_log is not None:
+            self.event_log.finish()
+        if self.writer:
+            self.writer.release()
+            print(f"[{self.name}] Output video saved to {self.output_video_path}")
+
+
+class MultiStreamRunner:
+    """
+    Serves several video streams with one shared PPEDetector.
+
+    Work is scheduled in rounds. In each round every unfinished stream may
+    contribute up to frames_per_turn frames, and all frames that need inference
+    (after each stream's motion gate) go through one batched detector call of
+    at most max_batch_size frames. The stream that opens each round rotates, so
+    when the batch fills up early it is a different stream that waits each time.
+    A busy stream can never take more than its share of a batch.
+    Tracking and everything after it run per stream, in frame order.
+    """
+    def __init__(self, detector, streams, max_batch_size=8, frames_per_turn=1, metrics=NULL_METRICS):
+        """
+        :param streams: List of StreamState
+        :param metrics: PipelineMetrics for the shared detector calls; per-stream stages
+                        are recorded through each StreamState's own metrics.
+        """
+        self.detector = detector
+        self.streams = list(streams)
+        self.max_batch_size = max_batch_size
+        self.frames_per_turn = frames_per_turn
+        self.metrics = metrics
+        self._next_stream = 0
+
+    def _collect_round(self):
+        """Returns [(stream, frames)] for this round, honoring max_batch_size."""
+        work = []
+        collected = 0
+        active = [stream for stream in self.streams if not stream.finished]
+        if not active:
+            return work
+        start = self._next_stream % len(active)
+        for offset in range(len(active)):
+            if collected >= self.max_batch_size:
+                break
+            stream = active[(start + offset) % len(active)]
+            frames = stream.read_frames(min(self.frames_per_turn, self.max_batch_size - collected))
+            if frames:
+                work.append((stream, frames))
+                collected += len(frames)
+        self._next_stream = start + 1
+        return work
+
+    def run_round(self):
+        """
+        Processes one scheduling round.
+        :return: False once every stream has finished.
+        """
+        work = self._collect_round()
+        if not work:
+            return False
+
+        # One shared forward pass for every frame that needs inference this round
+        plans = [plan_detection(frames, [True] * len(frames), stream.motion_gate) for stream, frames in work]
+        frames_to_detect = [frame for (_, frames), plan in zip(work, plans)
+                            for frame, action in zip(frames, plan) if action == 'detect']
+        with self.metrics.time('detect'):
+            detected = detect_frames(self.detector, frames_to_detect) if frames_to_detect else []
+        tile_stats = getattr(self.detector, 'tile_stats', None) if frames_to_detect else None
+
+        offset = 0
+        for (stream, frames), plan in zip(work, plans):
+            num_detected = plan.count('detect')
+            stream_detected = detected[offset:offset + num_detected]
+            record_detection_metrics(stream.metrics, plan, stream_detected,
+                                     tile_stats[offset:offset + num_detected] if tile_stats else None)
+            stream_detections, stream.last_detections = assemble_detections(
+                plan, stream_detected, stream.last_detections)
+            offset += num_detected
+
+            for frame, all_detections in zip(frames, stream_detections):
+                output_frame = process_frame(frame, all_detections, stream.tracker, stream.associator,
+                                             stream.compliance_checker, stream.frames_processed, stream.event_log,
+                                             stream.metrics, render=stream.writer is not None)
+                stream.frames_processed += 1
+                if stream.writer:
+                    with stream.metrics.time('encode'):
+                        stream.writer.write(output_frame)
+        self.metrics.maybe_log_summary()
+        return True
+
+    def run(self):
+        """
+        Processes all streams to the end.
+        :return: Dict of stream name -> frames processed
+        """
+        try:
+            while self.run_round():
+                pass
+        finally:
+            for stream in self.streams:
+                stream.release()
+        for stream in self.streams:
+            if stream.motion_gate is not None:
+                print(f"[{stream.name}] {stream.motion_gate.summary()}")
+        return {stream.name: stream.frames_processed for stream in self.streams}
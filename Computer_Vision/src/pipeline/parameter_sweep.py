@@ -0,0 +1,179 @@
+import itertools
+import json
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from association.ppe_associator import PPEAssociator
+from compliance_checker.safety_rules import SafetyComplianceChecker
+from compliance_checker.violation_events import ViolationEventTracker
+from detection.detection_cache import DetectionCache
+from pipeline.frame_stages import analyze_tracks
+from tracking.object_tracker import ObjectTracker
+
+# Parameter sweeps over cached detections.
+#
+# A sweep grid maps each stage ('tracker', 'associator', 'checker') to
+# {parameter: [values]}; every combination is one configuration. Detections
+# come from a DetectionCache entry, so the model never runs. Work is shared
+# where the configurations allow it:
+#   - the cache is memory-mapped, so all worker processes read the same pages,
+#   - configurations with the same tracker parameters share one tracking pass;
+#     only association and compliance checking run once per configuration.
+# Each configuration reports violation counts and person-ID churn.
+
+SWEEP_STAGES = ('tracker', 'associator', 'checker')
+
+_worker_frames = None # Detections of every cached frame, loaded once per worker process
+
+
+def expand_grid(grid, base_config=None):
+    """
+    :param grid: {'tracker': {param: [values]}, 'associator': {...}, 'checker': {...}};
+                 stages may be missing, single values need not be wrapped in a list.
+    :param base_config: Optional {stage: {param: value}} for parameters the grid does not vary.
+    :return: List of configurations {'tracker': {...}, 'associator': {...}, 'checker': {...}}
+    """
+    axes = []
+    for stage in SWEEP_STAGES:
+        for param, values in sorted(grid.get(stage, {}).items()):
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            axes.append((stage, param, values))
+    configs = []
+    for combination in itertools.product(*[values for _, _, values in axes]):
+        config = {stage: dict((base_config or {}).get(stage, {})) for stage in SWEEP_STAGES}
+        for (stage, param, _), value in zip(axes, combination):
+            config[stage][param] = value
+        configs.append(config)
+    return configs
+
+
+def _init_worker(cache_dir):
+    global _worker_frames
+    _worker_frames = list(DetectionCache(cache_dir))
+
+
+class _ConfigStats:
+    """Violation and ID-churn counters of one configuration."""
+    def __init__(self, short_track_frames):
+        self.short_track_frames = short_track_frames
+        self.events = ViolationEventTracker()
+        self.violation_events = {}
+        self.violation_person_frames = {}
+        self.person_track_frames = {} # person_id -> frames the person was tracked
+
+    def record(self, frame_idx, result):
+        violations = result['violations'] if result is not None else {}
+        for event in self.events.update(frame_idx, violations):
+            if event['event'] == 'start':
+                self.violation_events[event['violation']] = self.violation_events.get(event['violation'], 0) + 1
+        for details in violations.values():
+            for violation in details['violations']:
+                self.violation_person_frames[violation] = self.violation_person_frames.get(violation, 0) + 1
+        if result is not None:
+            for person in result['persons']:
+                self.person_track_frames[person[4]] = self.person_track_frames.get(person[4], 0) + 1
+
+    def summary(self):
+        track_frames = list(self.person_track_frames.values())
+        return {
+            'violation_events': sum(self.violation_events.values()),
+            'violation_events_by_type': dict(sorted(self.violation_events.items())),
+            'violation_person_frames': dict(sorted(self.violation_person_frames.items())),
+            # ID churn: a tracker that fragments tracks produces many short person tracks
+            'person_tracks': len(track_frames),
+            'short_person_tracks': sum(1 for frames in track_frames if frames < self.short_track_frames),
+            'mean_person_track_frames': sum(track_frames) / len(track_frames) if track_frames else 0.,
+        }
+
+
+def _run_task(tracker_kwargs, configs, short_track_frames):
+    """
+    Replays the cached detections once through one tracker and evaluates the
+    associator/checker part of every configuration on the shared tracks.
+    :return: List of (config, metrics)
+    """
+    tracker = ObjectTracker(**tracker_kwargs)
+    stages = [(PPEAssociator(**config['associator']), SafetyComplianceChecker(**config['checker']),
+               _ConfigStats(short_track_frames)) for config in configs]
+    for frame_idx, all_detections in enumerate(_worker_frames):
+        all_tracked_objects = tracker.update(all_detections)
+        if len(all_detections) == 0:
+            # Same as analyze_frame: the tracks age, but there is nothing to associate
+            for associator, _, stats in stages:
+                associator.forget_tracks(tracker.expired_track_ids)
+                stats.record(frame_idx, None)
+            continue
+        for associator, compliance_checker, stats in stages:
+            result = analyze_tracks(all_tracked_objects, tracker.expired_track_ids, associator, compliance_checker)
+            stats.record(frame_idx, result)
+    results = []
+    for config, (_, _, stats) in zip(configs, stages):
+        metrics = stats.summary()
+        metrics['frames'] = len(_worker_frames)
+        results.append((config, metrics))
+    return results
+
+
+def _plan_tasks(configs, num_workers):
+    """
+    Groups configurations by tracker parameters, then splits the groups so
+    that there are at least num_workers tasks when there are enough configurations.
+    """
+    groups = {}
+    for config in configs:
+        key = json.dumps(config['tracker'], sort_keys=True)
+        groups.setdefault(key, []).append(config)
+    splits_per_group = max(1, math.ceil(num_workers / len(groups))) if groups else 1
+    tasks = []
+    for group in groups.values():
+        chunk_size = max(1, math.ceil(len(group) / splits_per_group))
+        for start in range(0, len(group), chunk_size):
+            tasks.append((group[0]['tracker'], group[start:start + chunk_size]))
+    return tasks
+
+
+def run_parameter_sweep(cache_dir, grid, base_config=None, num_workers=None, short_track_frames=10):
+    """
+    :param cache_dir: Entry directory of a DetectionCache (see DetectionCache.entry_dir).
+    :param grid: Sweep grid, see expand_grid().
+    :param base_config: Parameters the grid does not vary, see expand_grid().
+    :param short_track_frames: Person tracks shorter than this count as short (ID churn).
+    :return: List of {'config': ..., 'metrics': ...}, in grid order
+    """
+    configs = expand_grid(grid, base_config)
+    num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(configs)))
+    tasks = _plan_tasks(configs, num_workers)
+    print(f"Sweeping {len(configs)} configurations in {len(tasks)} tasks with {num_workers} workers.")
+
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context,
+                             initializer=_init_worker, initargs=(cache_dir,)) as pool:
+        futures = [pool.submit(_run_task, tracker_kwargs, task_configs, short_track_frames)
+                   for tracker_kwargs, task_configs in tasks]
+        by_config = {}
+        for future in futures:
+            for config, metrics in future.result():
+                by_config[json.dumps(config, sort_keys=True)] = metrics
+    return [{'config': config, 'metrics': by_config[json.dumps(config, sort_keys=True)]} for config in configs]
+
+
+def format_sweep_report(results):
+    """Returns the sweep results as a text table, one configuration per line."""
+    lines = [f"{'events':>7} {'person tracks':>14} {'short':>6} {'mean len':>9}  configuration"]
+    for result in results:
+        metrics = result['metrics']
+        params = ', '.join(f"{param}={value}" for stage in SWEEP_STAGES
+                           for param, value in sorted(result['config'][stage].items()))
+        lines.append(f"{metrics['violation_events']:>7} {metrics['person_tracks']:>14} "
+                     f"{metrics['short_person_tracks']:>6} {metrics['mean_person_track_frames']:>9.1f}  {params}")
+    return '\n'.join(lines)
+
+
+def write_sweep_report(results, report_path):
+    output_dir = os.path.dirname(report_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(report_path, 'w') as f:
+        json.dump(results, f, indent=2)
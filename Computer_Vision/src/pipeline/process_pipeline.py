@@ -0,0 +1,211 @@
+import multiprocessing
+import queue
+import cv2
+from pipeline.frame_ring import SharedFrameRing
+from pipeline.frame_stages import analyze_frame
+from project_utils.metrics import NULL_METRICS
+from project_utils.overlay_renderer import DEFAULT_RENDERER
+
+# Multi-process counterpart of ThreadedPipeline for when the GIL-bound parts
+# (preprocessing, NMS, tracking) compete with inference on one interpreter:
+#
+#   decode process -> detect process -> this process (track + associate + check + draw + encode)
+#
+# Frames live in a SharedFrameRing. The decode process decodes straight into
+# a free slot, the detect process runs PPEDetector on the slot in place, and
+# this process draws the overlay into the same slot and writes it out before
+# releasing it. Only slot indices and the (small) Detections cross the
+# process boundaries, never the frames. The number of slots bounds how many
+# frames are in flight, like the bounded queues of ThreadedPipeline.
+#
+# Detection runs on every frame; frame skipping and motion gating are only
+# available in the in-process pipelines.
+
+_END_OF_STREAM = -1 # Frame index sent down the queues after the last frame
+_POLL_SECONDS = 0.1 # How often blocked operations check for a shutdown
+
+
+# Queue items are (frame_idx, slot, payload). The end-of-stream item carries
+# the error message of the stage that failed (or None) as its payload, so an
+# error arrives in order with the frames and cannot be overtaken by the end.
+
+
+def _get(q, stop):
+    """Blocking get that returns an end-of-stream item once the pipeline is shutting down."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return (_END_OF_STREAM, None, None)
+
+
+def _decode_stage(ring, video_path, out_q, stop):
+    error = None
+    try:
+        cap = cv2.VideoCapture(video_path)
+        frame_idx = 0
+        while not stop.is_set():
+            slot = ring.acquire(timeout=_POLL_SECONDS)
+            if slot is None:
+                continue # All slots in flight; check for a shutdown and wait again
+            if not ring.read_frame(cap, slot):
+                ring.release(slot)
+                break
+            out_q.put((frame_idx, slot, None))
+            frame_idx += 1
+        cap.release()
+    except Exception as e:
+        error = f"decode: {e!r}"
+    finally:
+        out_q.put((_END_OF_STREAM, None, error))
+
+
+def _load_detector(model_path, confidence_threshold, num_threads):
+    from detection.ppe_detector import PPEDetector
+    detector = PPEDetector(model_path=model_path, confidence_threshold=confidence_threshold,
+                           num_threads=num_threads)
+    if not detector.model:
+        raise RuntimeError(f"Could not load the model {model_path}")
+    return detector
+
+
+def _detect_stage(ring, model_path, confidence_threshold, num_threads, batch_size, detector_factory,
+                  in_q, out_q, stop):
+    error = None
+    try:
+        if detector_factory is not None:
+            detector = detector_factory()
+        else:
+            detector = _load_detector(model_path, confidence_threshold, num_threads)
+        end_of_stream = False
+        while not end_of_stream:
+            # Collect up to batch_size frames; a short batch is flushed at end-of-stream
+            items = []
+            while len(items) < batch_size:
+                frame_idx, slot, upstream_error = _get(in_q, stop)
+                if frame_idx == _END_OF_STREAM:
+                    end_of_stream = True
+                    error = upstream_error
+                    break
+                items.append((frame_idx, slot))
+            if not items:
+                break
+            # The detector reads the frames where the decoder left them
+            batch_detections = detector.detect_batch_arrays([ring.frame(slot) for _, slot in items])
+            for (frame_idx, slot), detections in zip(items, batch_detections):
+                out_q.put((frame_idx, slot, detections))
+    except Exception as e:
+        error = f"detect: {e!r}"
+    finally:
+        out_q.put((_END_OF_STREAM, None, error))
+
+
+class ProcessPipeline:
+    """
+    Runs decoding and detection in two processes that hand frames over through
+    a SharedFrameRing; tracking, analysis, drawing and encoding stay in the
+    calling process, in frame order. If a stage process fails, the others are
+    shut down and the error is raised from run().
+    """
+    def __init__(self, model_path, tracker, associator, compliance_checker, confidence_threshold=0.4,
+                 batch_size=1, num_slots=16, num_threads=None, event_log=None, metrics=NULL_METRICS,
+                 detector_factory=None):
+        """
+        :param model_path: Weights for the PPEDetector loaded in the detect process.
+        :param num_slots: Frames in flight between the processes; at least batch_size + 2
+                          keeps the decoder busy while a batch is detected and one frame is drawn.
+        :param num_threads: Intra-op threads of the detector (None = the backend's default).
+        :param detector_factory: Optional picklable callable that builds the detector in the detect
+                                 process instead of a PPEDetector (e.g. a stub without model weights).
+        """
+        if num_slots < batch_size + 1:
+            raise ValueError(f"num_slots must be larger than batch_size, got {num_slots} <= {batch_size}")
+        self.model_path = model_path
+        self.tracker = tracker
+        self.associator = associator
+        self.compliance_checker = compliance_checker
+        self.confidence_threshold = confidence_threshold
+        self.batch_size = batch_size
+        self.num_slots = num_slots
+        self.num_threads = num_threads
+        self.event_log = event_log
+        self.metrics = metrics
+        self.detector_factory = detector_factory
+        self.frames_processed = 0
+
+    def run(self, video_path, writer=None):
+        """
+        Processes video_path to the end, writing to writer if it is not None.
+        :return: Number of frames processed.
+        """
+        cap = cv2.VideoCapture(video_path)
+        frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+        cap.release()
+        if frame_shape[0] <= 0 or frame_shape[1] <= 0:
+            raise ValueError(f"Could not determine the frame size of {video_path}")
+
+        # 'spawn' like the process pools: forking a process that already holds torch threads is unsafe
+        mp_context = multiprocessing.get_context('spawn')
+        ring = SharedFrameRing(self.num_slots, frame_shape, mp_context=mp_context)
+        decoded, detected = mp_context.Queue(), mp_context.Queue()
+        stop = mp_context.Event()
+        processes = [
+            mp_context.Process(target=_decode_stage, args=(ring, video_path, decoded, stop),
+                               name='decode', daemon=True),
+            mp_context.Process(target=_detect_stage,
+                               args=(ring, self.model_path, self.confidence_threshold, self.num_threads,
+                                     self.batch_size, self.detector_factory, decoded, detected, stop),
+                               name='detect', daemon=True),
+        ]
+        self.frames_processed = 0
+        try:
+            for process in processes:
+                process.start()
+            while True:
+                frame_idx, slot, payload = self._get_detected(detected, processes)
+                if frame_idx == _END_OF_STREAM:
+                    if payload is not None:
+                        print(f"Error in pipeline stage {payload}")
+                        raise RuntimeError(f"Pipeline stage failed: {payload}")
+                    break
+                self._process_slot(ring, slot, frame_idx, payload, writer)
+                ring.release(slot)
+                self.frames_processed += 1
+                self.metrics.maybe_log_summary()
+        finally:
+            stop.set()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            ring.unlink()
+        return self.frames_processed
+
+    @staticmethod
+    def _get_detected(detected, processes):
+        """Blocking get that fails instead of waiting forever when a stage process was killed."""
+        while True:
+            try:
+                return detected.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                dead = [process.name for process in processes if process.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Pipeline process '{dead[0]}' exited unexpectedly")
+
+    def _process_slot(self, ring, slot, frame_idx, detections, writer):
+        self.metrics.inc('frames_detected_total')
+        result = analyze_frame(detections, self.tracker, self.associator, self.compliance_checker, self.metrics)
+        if self.event_log is not None:
+            self.event_log.record(frame_idx, result['violations'] if result is not None else {})
+        self.metrics.inc('frames_total')
+        if writer is None:
+            return
+        frame = ring.frame(slot)
+        if result is not None:
+            # Drawn straight into the slot: the frame is not needed afterwards, so no copy
+            with self.metrics.time('draw'):
+                DEFAULT_RENDERER.draw(frame, result['persons'], result['associations'], result['violations'],
+                                      result['tracks'])
+        with self.metrics.time('encode'):
+            writer.write(frame)
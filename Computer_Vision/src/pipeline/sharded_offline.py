@@ -0,0 +1,283 @@
+import multiprocessing
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from association.ppe_associator import PPEAssociator
+from compliance_checker.safety_rules import SafetyComplianceChecker
+from compliance_checker.violation_events import ViolationEventLog, open_event_sink
+from pipeline.frame_stages import analyze_frame, render_frame, run_detection_stage
+from tracking.object_tracker import ObjectTracker, iou_batch, linear_assignment
+
+# Offline processing of long recordings across a process pool.
+#
+# The video is cut into frame-range shards. Each shard is read with `overlap`
+# extra frames in front, so its tracker is warmed up by the time it reaches
+# the frames it owns, and so the overlap can be used to reconcile track IDs
+# with the previous shard. Workers return per-frame records (tracks,
+# associations, violations). The parent then:
+#   1. stitches shards in order, mapping each shard's local track IDs to global
+#      IDs by IoU-matching its tracks with the previous shard's on the overlap frames,
+#   2. replays the stitched violations into one violation event log,
+#   3. renders the annotated segments in parallel from the stitched records
+#      (decode + draw only, no inference) and joins them with ffmpeg's concat
+#      demuxer, which copies the encoded streams instead of re-encoding them.
+#      Without ffmpeg the output is rendered from the stitched records in a
+#      single pass, so every frame is still encoded only once.
+
+_worker_detector = None # One PPEDetector per worker process
+
+
+def plan_shards(frame_count, num_shards, overlap):
+    """
+    :return: List of (read_start, start, end): the shard owns frames [start, end)
+             and starts reading at read_start = start - overlap (clamped to 0).
+    """
+    num_shards = max(1, min(num_shards, frame_count))
+    bounds = np.linspace(0, frame_count, num_shards + 1).astype(int)
+    return [(max(0, int(start) - overlap), int(start), int(end))
+            for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _init_worker(model_path, confidence_threshold, num_threads):
+    global _worker_detector
+    from detection.ppe_detector import PPEDetector
+    # Workers share the cores instead of oversubscribing them (torch or ONNX Runtime threads)
+    _worker_detector = PPEDetector(model_path=model_path, confidence_threshold=confidence_threshold,
+                                   num_threads=num_threads)
+
+
+def _open_at(video_path, frame_idx):
+    cap = cv2.VideoCapture(video_path)
+    if frame_idx > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_idx:
+            # Seeking is not frame accurate for every container; decode up to the frame instead
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            for _ in range(frame_idx):
+                cap.grab()
+    return cap
+
+
+def _process_shard(video_path, read_start, end, batch_size, tracker_kwargs, associator_kwargs, checker_kwargs):
+    """
+    Runs detection + analysis on frames [read_start, end) in a worker.
+    :return: List of (frame_idx, analyze_frame() result)
+    """
+    if _worker_detector is None or _worker_detector.model is None:
+        raise RuntimeError("Detector failed to load in worker process.")
+    tracker = ObjectTracker(**tracker_kwargs)
+    associator = PPEAssociator(**associator_kwargs)
+    compliance_checker = SafetyComplianceChecker(**checker_kwargs)
+
+    cap = _open_at(video_path, read_start)
+    records = []
+    frame_idx = read_start
+    try:
+        while frame_idx < end:
+            frames = []
+            while len(frames) < batch_size and frame_idx + len(frames) < end:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+            batch_detections, _ = run_detection_stage(frames, [True] * len(frames), _worker_detector, None, None)
+            for all_detections in batch_detections:
+                records.append((frame_idx, analyze_frame(all_detections, tracker, associator, compliance_checker)))
+                frame_idx += 1
+    finally:
+        cap.release()
+    return records
+
+
+def _match_ids(previous_records, current_records, iou_threshold):
+    """
+    Votes a local -> global track ID mapping over the overlap frames by
+    IoU-matching same-class tracks of both shards frame by frame.
+    """
+    votes = {}
+    for frame_idx, current in current_records.items():
+        previous = previous_records.get(frame_idx)
+        if not previous or not current or not previous['tracks'] or not current['tracks']:
+            continue
+        prev_tracks = previous['tracks']
+        cur_tracks = current['tracks']
+        iou = iou_batch([t[:4] for t in cur_tracks], [t[:4] for t in prev_tracks])
+        same_class = np.array([t[5] for t in cur_tracks])[:, None] == np.array([t[5] for t in prev_tracks])[None, :]
+        iou = np.where(same_class, iou, 0.)
+        for c_idx, p_idx in linear_assignment(iou).tolist():
+            if iou[c_idx, p_idx] >= iou_threshold:
+                key = (cur_tracks[c_idx][4], prev_tracks[p_idx][4])
+                votes[key] = votes.get(key, 0) + 1
+
+    id_map = {}
+    used_global_ids = set()
+    for (local_id, global_id), _ in sorted(votes.items(), key=lambda item: -item[1]):
+        if local_id not in id_map and global_id not in used_global_ids:
+            id_map[local_id] = global_id
+            used_global_ids.add(global_id)
+    return id_map
+
+
+def _remap_record(record, id_map):
+    if record is None:
+        return None
+    tracks = [t[:4] + [id_map[t[4]]] + t[5:] for t in record['tracks']]
+    return {
+        'tracks': tracks,
+        'persons': [t for t in tracks if t[6] == 'person'],
+        'associations': {id_map[pid]: status for pid, status in record['associations'].items()},
+        'violations': {id_map[pid]: violation for pid, violation in record['violations'].items()},
+    }
+
+
+def stitch_shards(shards, shard_records, iou_threshold=0.3):
+    """
+    :param shards: Output of plan_shards()
+    :param shard_records: One _process_shard() result per shard
+    :return: Dict frame_idx -> record with global track IDs, for every frame exactly once
+    """
+    stitched = {}
+    next_global_id = 1
+    for (read_start, start, end), records in zip(shards, shard_records):
+        by_frame = dict(records)
+        overlap_records = {idx: rec for idx, rec in by_frame.items() if idx < start}
+        id_map = _match_ids(stitched, overlap_records, iou_threshold) if overlap_records else {}
+
+        for frame_idx in range(start, end):
+            record = by_frame.get(frame_idx)
+            if record is None:
+                stitched[frame_idx] = None
+                continue
+            for track in record['tracks']:
+                if track[4] not in id_map:
+                    id_map[track[4]] = next_global_id
+                    next_global_id += 1
+            stitched[frame_idx] = _remap_record(record, id_map)
+        # Track ids handed out by earlier shards must stay unique
+        if id_map:
+            next_global_id = max(next_global_id, max(id_map.values()) + 1)
+    return stitched
+
+
+def _render_segment(video_path, start, end, records, segment_path, fps, frame_size):
+    cap = _open_at(video_path, start)
+    writer = cv2.VideoWriter(segment_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+    try:
+        for frame_idx in range(start, end):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(render_frame(frame, records.get(frame_idx)))
+    finally:
+        cap.release()
+        writer.release()
+    return segment_path
+
+
+def _concatenate_segments(ffmpeg, segment_paths, output_video_path):
+    """
+    Joins the segments with ffmpeg's concat demuxer without re-encoding them, then deletes them.
+    :return: True on success
+    """
+    list_path = f"{output_video_path}.segments.txt"
+    with open(list_path, 'w') as f:
+        for segment_path in segment_paths:
+            escaped_path = os.path.abspath(segment_path).replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
+    try:
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+                        '-c', 'copy', output_video_path], check=True)
+        return True
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Error joining the video segments with ffmpeg: {e}")
+        return False
+    finally:
+        os.remove(list_path)
+        for segment_path in segment_paths:
+            os.remove(segment_path)
+
+
+def render_output(video_path, stitched, shards, output_video_path, fps, frame_size, num_workers, mp_context):
+    """
+    Writes the annotated video from the stitched records: segments rendered in
+    parallel and joined by ffmpeg when it is installed, one serial pass otherwise.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg and len(shards) > 1:
+        base, _ = os.path.splitext(output_video_path)
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context) as pool:
+            futures = [pool.submit(_render_segment, video_path, start, end,
+                                   {idx: stitched[idx] for idx in range(start, end) if idx in stitched},
+                                   f"{base}.part{shard_idx:03d}.mp4", fps, frame_size)
+                       for shard_idx, (_, start, end) in enumerate(shards)]
+            segment_paths = [future.result() for future in futures]
+        if _concatenate_segments(ffmpeg, segment_paths, output_video_path):
+            return
+        print("Rendering the output video in a single pass instead.")
+    elif not ffmpeg and len(shards) > 1:
+        print("ffmpeg not found; rendering the output video in a single pass.")
+    _render_segment(video_path, shards[0][1], shards[-1][2], stitched, output_video_path, fps, frame_size)
+
+
+def write_violation_events(stitched, violation_log_path):
+    """Replays the stitched per-frame violations, in frame order, through a violation event log."""
+    sink = open_event_sink(violation_log_path)
+    event_log = ViolationEventLog(sink)
+    try:
+        for frame_idx in sorted(stitched):
+            record = stitched[frame_idx]
+            event_log.record(frame_idx, record['violations'] if record is not None else {})
+        event_log.finish()
+    finally:
+        sink.close()
+
+
+def run_sharded(video_path, model_path, output_video_path=None, violation_log_path=None,
+                num_workers=None, overlap=30, batch_size=4, confidence_threshold=0.4,
+                tracker_kwargs=None, associator_kwargs=None, checker_kwargs=None):
+    """
+    Processes a recorded video across a process pool.
+    :return: Dict frame_idx -> stitched record (see stitch_shards)
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video {video_path}")
+        return None
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    cap.release()
+    if frame_count <= 0:
+        print(f"Error: Could not determine the frame count of {video_path}")
+        return None
+
+    num_workers = num_workers or os.cpu_count() or 1
+    shards = plan_shards(frame_count, num_workers, overlap)
+    print(f"Processing {frame_count} frames in {len(shards)} shards with {num_workers} workers.")
+
+    shard_args = (batch_size, tracker_kwargs or {}, associator_kwargs or {}, checker_kwargs or {})
+    # 'spawn' gives each worker a clean interpreter; forking a process that already holds torch threads is unsafe
+    mp_context = multiprocessing.get_context('spawn')
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(model_path, confidence_threshold, num_threads)) as pool:
+        futures = [pool.submit(_process_shard, video_path, read_start, end, *shard_args)
+                   for read_start, _, end in shards]
+        shard_records = [future.result() for future in futures]
+
+    tracker_iou = (tracker_kwargs or {}).get('iou_threshold', 0.3)
+    stitched = stitch_shards(shards, shard_records, iou_threshold=tracker_iou)
+
+    if violation_log_path:
+        write_violation_events(stitched, violation_log_path)
+        print(f"Violation log saved to {violation_log_path}")
+
+    if output_video_path:
+        render_output(video_path, stitched, shards, output_video_path, fps, frame_size, num_workers, mp_context)
+        print(f"Output video saved to {output_video_path}")
+    return stitched
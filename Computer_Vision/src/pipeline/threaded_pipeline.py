@@ -0,0 +1,182 @@
+import logging
+import queue
+import threading
+from pipeline.frame_stages import process_frame, run_detection_stage, schedule_detection
+from project_utils.metrics import NULL_METRICS
+
+_END_OF_STREAM = object() # Sentinel passed down the queues after the last frame
+_POLL_SECONDS = 0.1 # How often blocked queue operations check for a shutdown
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadedPipeline:
+    """
+    Runs the per-frame pipeline as four threads connected by bounded queues:
+
+        decode -> infer -> analyze (track + associate + check + draw) -> encode
+
+    OpenCV decode/encode and model inference release the GIL, so the stages
+    overlap on multi-core machines. Each stage is a single thread reading a FIFO
+    queue, so frames stay in decode order and results match the sequential loop.
+    Bounded queues give backpressure: a slow stage blocks the stages before it
+    instead of buffering the whole video in memory. If a stage fails, the others
+    are shut down and the error is re-raised from run().
+
+    Frame skipping needs the scheduler decision before tracking has seen the
+    previous frame, so only the fixed interval (adaptive=False) is supported here.
+    """
+    def __init__(self, detector, tracker, associator, compliance_checker,
+                 batch_size=1, motion_gate=None, scheduler=None, queue_size=8, event_log=None,
+                 metrics=NULL_METRICS, frame_log=None):
+        if scheduler is not None and scheduler.adaptive:
+            raise ValueError("ThreadedPipeline only supports a fixed detection interval (adaptive=False).")
+        self.detector = detector
+        self.tracker = tracker
+        self.associator = associator
+        self.compliance_checker = compliance_checker
+        self.batch_size = batch_size
+        self.motion_gate = motion_gate
+        self.scheduler = scheduler
+        self.queue_size = queue_size
+        self.event_log = event_log
+        self.metrics = metrics
+        self.frame_log = frame_log
+
+        self.frames_processed = 0
+        self._render = True
+        self._stop = threading.Event()
+        self._errors = []
+
+    def run(self, cap, writer):
+        """
+        Processes cap until the end of the stream, writing to writer if it is not None.
+        :return: Number of frames processed.
+        """
+        self._stop.clear()
+        self._errors = []
+        self.frames_processed = 0
+        self._render = writer is not None # Without a writer the analyze stage skips drawing
+
+        decoded = queue.Queue(maxsize=self.queue_size * self.batch_size)
+        detected = queue.Queue(maxsize=self.queue_size * self.batch_size)
+        rendered = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._decode, cap, decoded), name='decode'),
+            threading.Thread(target=self._run_stage, args=(self._infer, decoded, detected), name='infer'),
+            threading.Thread(target=self._run_stage, args=(self._analyze, detected, rendered), name='analyze'),
+            threading.Thread(target=self._run_stage, args=(self._encode, rendered, writer), name='encode'),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return self.frames_processed
+
+    def _run_stage(self, stage, *args):
+        try:
+            stage(*args)
+        except Exception as e:
+            print(f"Error in pipeline stage '{threading.current_thread().name}': {e}")
+            self._errors.append(e)
+            self._stop.set()
+
+    def _put(self, q, item):
+        """Blocking put that gives up once the pipeline is shutting down."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        if item is not _END_OF_STREAM:
+            self.metrics.inc('frames_dropped_total')
+        return False
+
+    def _record_queue_depth(self, name, q):
+        if self.metrics.enabled:
+            self.metrics.set_gauge('queue_depth', q.qsize(), queue=name)
+
+    def _get(self, q):
+        """Blocking get that returns the end-of-stream sentinel once the pipeline is shutting down."""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _END_OF_STREAM
+
+    def _decode(self, cap, out_q):
+        try:
+            while not self._stop.is_set():
+                with self.metrics.time('decode'):
+                    ret, frame = cap.read()
+                if not ret:
+                    print("End of video or cannot read frame.")
+                    break
+                if not self._put(out_q, frame):
+                    break
+                self._record_queue_depth('decoded', out_q)
+        finally:
+            self._put(out_q, _END_OF_STREAM)
+
+    def _infer(self, in_q, out_q):
+        last_detections = None
+        end_of_stream = False
+        try:
+            while not end_of_stream:
+                # Collect up to batch_size frames; a short batch is flushed at end-of-stream
+                frames = []
+                while len(frames) < self.batch_size:
+                    frame = self._get(in_q)
+                    if frame is _END_OF_STREAM:
+                        end_of_stream = True
+                        break
+                    frames.append(frame)
+                if not frames:
+                    break
+
+                run_detector = [True] * len(frames)
+                if self.scheduler is not None:
+                    # A fixed interval does not depend on the tracker, so it can be decided here
+                    run_detector = schedule_detection(self.scheduler, len(frames))
+                batch_detections, last_detections = run_detection_stage(
+                    frames, run_detector, self.detector, self.motion_gate, last_detections, self.metrics)
+
+                for frame, all_detections in zip(frames, batch_detections):
+                    if not self._put(out_q, (frame, all_detections)):
+                        return
+                self._record_queue_depth('detected', out_q)
+        finally:
+            self._put(out_q, _END_OF_STREAM)
+
+    def _analyze(self, in_q, out_q):
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END_OF_STREAM:
+                    break
+                frame, all_detections = item
+                logger.debug("Processing frame %d...", self.frames_processed + 1)
+                output_frame = process_frame(frame, all_detections, self.tracker, self.associator,
+                                             self.compliance_checker, self.frames_processed, self.event_log,
+                                             self.metrics, render=self._render, frame_log=self.frame_log)
+                self.frames_processed += 1
+                if not self._put(out_q, output_frame):
+                    break
+                self._record_queue_depth('rendered', out_q)
+                self.metrics.maybe_log_summary()
+        finally:
+            self._put(out_q, _END_OF_STREAM)
+
+    def _encode(self, in_q, writer):
+        while True:
+            output_frame = self._get(in_q)
+            if output_frame is _END_OF_STREAM:
+                break
+            if writer:
+                with self.metrics.time('encode'):
+                    writer.write(output_frame)
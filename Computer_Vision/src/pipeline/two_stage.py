@@ -0,0 +1,108 @@
+import numpy as np
+from detection.person_crops import PersonCropDetector, merge_detections
+from pipeline.frame_stages import analyze_frame, analyze_tracks, render_frame
+from project_utils.metrics import NULL_METRICS
+
+# Two-stage PPE mode. Stage 1 locates persons: a full-frame detector pass
+# every refresh_interval frames, and the tracker's person tracks in between.
+# Stage 2 runs the detector only on packed crops around those persons
+# (PersonCropDetector); the crop detections update the tracker like normal
+# detections, and the PPE found in each crop is credited to the person the
+# crop was cut for, so PPEAssociator does not match persons against PPE.
+# Frames without any person track run no inference until the next refresh.
+
+
+class TwoStageAnalyzer:
+    def __init__(self, detector, tracker, associator, compliance_checker, refresh_interval=15,
+                 crop_detector=None, iou_threshold=0.45):
+        """
+        :param detector: Full-frame detector for stage 1 (PPEDetector).
+        :param refresh_interval: Frames between full-frame passes, which pick up persons
+                                 entering the scene (1 = every frame, i.e. no crop stage).
+        :param crop_detector: PersonCropDetector for stage 2; by default it wraps detector.
+                              Its model must use the same class names as detector.
+        :param iou_threshold: IoU for merging the detections of overlapping crops.
+        """
+        if refresh_interval < 1:
+            raise ValueError(f"refresh_interval must be at least 1, got {refresh_interval}")
+        self.detector = detector
+        self.tracker = tracker
+        self.associator = associator
+        self.compliance_checker = compliance_checker
+        self.refresh_interval = refresh_interval
+        self.crop_detector = crop_detector or PersonCropDetector(detector)
+        self.iou_threshold = iou_threshold
+        self.frames_since_refresh = refresh_interval # The first frame gets a full pass
+        self.frames_full = 0
+        self.frames_cropped = 0
+        self.frames_idle = 0
+        self.crops_total = 0
+        self.canvases_total = 0
+
+    def _person_tracks(self):
+        """
+        :return: (track ids, boxes [P, 4]) of all person tracks, including tentative ones,
+                 so that a new person gets re-detected in its crop until it is confirmed
+        """
+        table = self.tracker.table
+        person_cls_ids = [cls_id for cls_id, name in self.tracker.class_names.items() if name == 'person']
+        mask = np.isin(table.cls_ids, person_cls_ids)
+        return table.ids[mask], table.boxes[mask]
+
+    def analyze(self, frame, metrics=NULL_METRICS):
+        """:return: Same as analyze_frame()"""
+        if self.frames_since_refresh >= self.refresh_interval:
+            self.frames_since_refresh = 1
+            self.frames_full += 1
+            with metrics.time('detect'):
+                detections = self.detector.detect_arrays(frame)
+            metrics.inc('frames_detected_total')
+            return analyze_frame(detections, self.tracker, self.associator, self.compliance_checker, metrics)
+        self.frames_since_refresh += 1
+
+        track_ids, person_boxes = self._person_tracks()
+        if len(track_ids) == 0:
+            # Nobody to look at until the next full pass; the tracker extrapolates
+            self.frames_idle += 1
+            metrics.inc('frames_skipped_total')
+            return analyze_frame(None, self.tracker, self.associator, self.compliance_checker, metrics)
+
+        self.frames_cropped += 1
+        with metrics.time('detect'):
+            per_person = self.crop_detector.detect(frame, person_boxes)
+        stats = self.crop_detector.last_stats
+        self.crops_total += stats['crops']
+        self.canvases_total += stats['canvases']
+        metrics.inc('frames_detected_total')
+        metrics.inc('person_crops_total', stats['crops'])
+        metrics.inc('crop_canvases_total', stats['canvases'])
+
+        detections = merge_detections(per_person, self.crop_detector.class_names, self.iou_threshold)
+        if len(detections) == 0:
+            return analyze_frame(detections, self.tracker, self.associator, self.compliance_checker, metrics)
+        with metrics.time('track'):
+            all_tracked_objects = self.tracker.update(detections)
+        metrics.set_gauge('tracks_alive', len(self.tracker.table))
+        ppe_by_person = dict(zip(track_ids.tolist(), per_person))
+        return analyze_tracks(all_tracked_objects, self.tracker.expired_track_ids, self.associator,
+                              self.compliance_checker, metrics, ppe_by_person)
+
+    def process_frame(self, frame, frame_idx=None, event_log=None, metrics=NULL_METRICS, render=True,
+                      frame_log=None):
+        """Two-stage counterpart of frame_stages.process_frame(). :return: The frame to write, or None."""
+        result = self.analyze(frame, metrics)
+        if event_log is not None:
+            event_log.record(frame_idx, result['violations'] if result is not None else {})
+        if frame_log is not None:
+            frame_log.record(frame_idx, result)
+        metrics.inc('frames_total')
+        if not render:
+            return None
+        return render_frame(frame, result, metrics)
+
+    def summary(self):
+        frames = self.frames_full + self.frames_cropped + self.frames_idle
+        canvases_per_frame = self.canvases_total / self.frames_cropped if self.frames_cropped else 0.0
+        return (f"Two-stage mode: {self.frames_full} of {frames} frames ran the full-frame detector, "
+                f"{self.frames_cropped} only person crops ({self.crops_total} crops on "
+                f"{canvases_per_frame:.2f} canvases per frame), {self.frames_idle} had no persons to check")
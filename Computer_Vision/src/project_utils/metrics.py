@@ -0,0 +1,285 @@
+import collections
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Opt-in per-stage pipeline metrics.
+#
+# Stage timings use the pipeline stage names as the 'stage' label:
+#   decode, detect, track, associate, check, draw, encode
+# Counters: frames_total, frames_detected_total, frames_gated_total,
+#           frames_skipped_total, frames_dropped_total, detections_total,
+#           tiles_total, tile_pixels_total (tiled inference only),
+#           person_crops_total, crop_canvases_total (two-stage mode only)
+# Gauges:   tracks_alive, detections_per_frame, queue_depth{queue=...},
+#           tiles_per_frame, tile_pixel_fraction (tiled inference only)
+#
+# Code is instrumented against the metrics interface unconditionally; when
+# metrics are off it receives NULL_METRICS, whose methods do nothing and whose
+# time() returns one shared no-op context manager, so the disabled cost is a
+# method call per stage and frame.
+
+METRIC_PREFIX = 'ppe_'
+STAGE_NAMES = ('decode', 'detect', 'track', 'associate', 'check', 'draw', 'encode')
+QUANTILES = (0.5, 0.95, 0.99)
+
+logger = logging.getLogger(__name__)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """Metrics sink used when instrumentation is disabled."""
+    enabled = False
+
+    def time(self, stage):
+        return _NULL_TIMER
+
+    def observe(self, stage, seconds):
+        pass
+
+    def inc(self, name, value=1):
+        pass
+
+    def set_gauge(self, name, value, **labels):
+        pass
+
+    def for_stream(self, stream):
+        return self
+
+    def maybe_log_summary(self):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _Registry:
+    """Storage shared by a PipelineMetrics and its per-stream views."""
+    def __init__(self, window):
+        self.lock = threading.Lock()
+        self.samples = {} # (stage, stream) -> deque of the last `window` durations in seconds
+        self.counts = collections.Counter() # (stage, stream) -> observations
+        self.sums = collections.Counter() # (stage, stream) -> total seconds
+        self.counters = collections.Counter() # (name, stream) -> value
+        self.gauges = {} # (name, labels) -> value
+        self.window = window
+        self.started = time.monotonic()
+
+
+class PipelineMetrics:
+    """
+    Collects stage timings, counters and gauges. Thread-safe, so the stages of
+    ThreadedPipeline can report into one instance. Quantiles are computed over
+    the last `window` observations of each stage.
+    """
+    enabled = True
+
+    def __init__(self, summary_interval=10.0, window=1024, stream=None, _registry=None):
+        """
+        :param summary_interval: Seconds between summary lines from maybe_log_summary() (None = never).
+        """
+        self.summary_interval = summary_interval
+        self.stream = stream
+        self._registry = _registry or _Registry(window)
+        self._last_summary = time.monotonic()
+        self._last_summary_frames = 0
+
+    def for_stream(self, stream):
+        """Returns a view that adds a stream label to everything it records."""
+        return PipelineMetrics(self.summary_interval, stream=stream, _registry=self._registry)
+
+    def time(self, stage):
+        """Context manager timing one run of a stage: `with metrics.time('track'): ...`"""
+        return _Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        registry = self._registry
+        key = (stage, self.stream)
+        with registry.lock:
+            samples = registry.samples.get(key)
+            if samples is None:
+                samples = collections.deque(maxlen=registry.window)
+                registry.samples[key] = samples
+            samples.append(seconds)
+            registry.counts[key] += 1
+            registry.sums[key] += seconds
+
+    def inc(self, name, value=1):
+        with self._registry.lock:
+            self._registry.counters[(name, self.stream)] += value
+
+    def set_gauge(self, name, value, **labels):
+        if self.stream is not None:
+            labels['stream'] = self.stream
+        self._registry.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self):
+        """:return: JSON-serializable dict of every metric"""
+        registry = self._registry
+        with registry.lock:
+            samples = {key: np.array(values) for key, values in registry.samples.items()}
+            counts = dict(registry.counts)
+            sums = dict(registry.sums)
+            counters = dict(registry.counters)
+            gauges = dict(registry.gauges)
+        stages = []
+        for (stage, stream), values in sorted(samples.items(), key=lambda item: (str(item[0][1]), item[0][0])):
+            entry = {'stage': stage, 'stream': stream, 'count': counts[(stage, stream)],
+                     'sum_seconds': sums[(stage, stream)]}
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}_seconds"] = float(np.quantile(values, q)) if len(values) else 0.
+            stages.append(entry)
+        return {
+            'uptime_seconds': time.monotonic() - registry.started,
+            'stages': stages,
+            'counters': [{'name': name, 'stream': stream, 'value': value}
+                         for (name, stream), value in sorted(counters.items(), key=lambda item: str(item[0]))],
+            'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                       for (name, labels), value in sorted(gauges.items(), key=lambda item: str(item[0]))],
+        }
+
+    def render_prometheus(self):
+        """:return: The snapshot in the Prometheus text exposition format"""
+        def label_text(labels):
+            labels = {key: value for key, value in labels.items() if value is not None}
+            return '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}' if labels else ''
+
+        snapshot = self.snapshot()
+        name = METRIC_PREFIX + 'stage_seconds'
+        lines = [f"# HELP {name} Wall time per pipeline stage run.", f"# TYPE {name} summary"]
+        for entry in snapshot['stages']:
+            labels = {'stage': entry['stage'], 'stream': entry['stream']}
+            for q in QUANTILES:
+                lines.append(f"{name}{label_text(dict(labels, quantile=q))} {entry[f'p{int(q * 100)}_seconds']}")
+            lines.append(f"{name}_sum{label_text(labels)} {entry['sum_seconds']}")
+            lines.append(f"{name}_count{label_text(labels)} {entry['count']}")
+        for kind, entries in (('counter', snapshot['counters']), ('gauge', snapshot['gauges'])):
+            declared = set()
+            for entry in entries:
+                metric = METRIC_PREFIX + entry['name']
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} {kind}")
+                    declared.add(metric)
+                labels = entry['labels'] if kind == 'gauge' else {'stream': entry['stream']}
+                lines.append(f"{metric}{label_text(labels)} {entry['value']}")
+        return '\n'.join(lines) + '\n'
+
+    def format_summary(self):
+        """One line per stream: frames processed, per-stage p50/p95, frame counters and gauges."""
+        snapshot = self.snapshot()
+        streams = sorted({entry['stream'] for entry in snapshot['stages']} |
+                         {entry['stream'] for entry in snapshot['counters']}, key=str)
+        counters = {(entry['name'], entry['stream']): entry['value'] for entry in snapshot['counters']}
+        lines = []
+        for stream in streams:
+            parts = [f"[metrics{'' if stream is None else ' ' + str(stream)}]",
+                     f"frames={counters.get(('frames_total', stream), 0)}"]
+            for entry in snapshot['stages']:
+                if entry['stream'] == stream:
+                    parts.append(f"{entry['stage']} p50={entry['p50_seconds'] * 1000:.1f}ms "
+                                 f"p95={entry['p95_seconds'] * 1000:.1f}ms")
+            for name in ('frames_gated_total', 'frames_skipped_total', 'frames_dropped_total'):
+                if (name, stream) in counters:
+                    parts.append(f"{name[:-len('_total')]}={counters[(name, stream)]}")
+            for entry in snapshot['gauges']:
+                if entry['labels'].get('stream') == stream:
+                    extra = ','.join(f"{k}={v}" for k, v in entry['labels'].items() if k != 'stream')
+                    parts.append(f"{entry['name']}{'[' + extra + ']' if extra else ''}={entry['value']}")
+            lines.append(parts[0] + ' ' + ' | '.join(parts[1:]))
+        return '\n'.join(lines)
+
+    def maybe_log_summary(self):
+        """Logs format_summary() at INFO level if summary_interval seconds have passed since the last one."""
+        if self.summary_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._last_summary < self.summary_interval:
+            return
+        frames = sum(value for (name, _), value in list(self._registry.counters.items()) if name == 'frames_total')
+        fps = (frames - self._last_summary_frames) / (now - self._last_summary)
+        self._last_summary = now
+        self._last_summary_frames = frames
+        logger.info("[metrics] %.1f frames/s\n%s", fps, self.format_summary())
+
+
+class MetricsServer:
+    """
+    Serves a PipelineMetrics from a daemon HTTP thread:
+      /metrics       Prometheus text format
+      /metrics.json  JSON snapshot
+    """
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = metrics.render_prometheus().encode()
+                    content_type = 'text/plain; version=0.0.4'
+                elif path == '/metrics.json':
+                    body = json.dumps(metrics.snapshot()).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics server: " + format, *args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1] # Resolves port 0 to the port actually bound
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        print(f"Metrics served at http://{self.host}:{self.port}/metrics (and /metrics.json)")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
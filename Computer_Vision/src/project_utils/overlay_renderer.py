@@ -0,0 +1,211 @@
+import functools
+import cv2
+import numpy as np
+from project_utils.video_utils import (BOX_THICKNESS, COLOR_BLUE, COLOR_CYAN, COLOR_GREEN, COLOR_ORANGE, COLOR_RED,
+                                       COLOR_WHITE, COLOR_YELLOW, LABEL_BG_OPACITY, LABEL_FONT_SCALE,
+                                       LABEL_FONT_THICKNESS)
+
+# Same overlay as video_utils.draw_tracked_ppe_status (which stays as the
+# reference implementation), drawn in two passes per frame, one for the
+# persons with their PPE and one for the other tracked objects (drawn over
+# the person labels, as the reference does). Each pass draws
+#   1. all boxes,
+#   2. all label backgrounds, filled into one label layer over the region
+#      they span, then blended once: the region is blended with the
+#      background grey by a single cv2.convertScaleAbs (the backgrounds are
+#      grey, so no color overlay is needed) and copied back under the layer
+#      as mask. The cost depends on the region, not on the number of labels.
+#      Optionally (sparse_label_fraction > 0), few labels spread over a large
+#      region are instead blended in place rectangle by rectangle. Either way
+#      every pixel is blended once, with the grey of the last background
+#      covering it, so both paths give the same pixels,
+#   3. all label text.
+# The output equals the reference unless labels and boxes of the same pass
+# overlap each other (the reference blends overlapping labels twice).
+# Text sizes come from an LRU cache keyed by label string, so cv2.getTextSize
+# runs once per distinct label instead of once per line per frame. The
+# renderer keeps no per-frame state and can be shared between threads.
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+PERSON_LABEL_BG = (200, 200, 200) # Backgrounds must stay grey, see _blend_backgrounds
+OBJECT_LABEL_BG = (180, 180, 180)
+OBJECT_COLORS = {'helmet': COLOR_BLUE, 'vest': COLOR_YELLOW, 'no-helmet': COLOR_ORANGE, 'no-vest': COLOR_ORANGE}
+
+
+@functools.lru_cache(maxsize=4096)
+def text_size(text, font_scale=LABEL_FONT_SCALE, thickness=LABEL_FONT_THICKNESS):
+    """Cached cv2.getTextSize: :return: ((width, height), baseline)"""
+    return cv2.getTextSize(text, FONT, font_scale, thickness)
+
+
+class OverlayRenderer:
+    def __init__(self, font_scale=LABEL_FONT_SCALE, font_thickness=LABEL_FONT_THICKNESS,
+                 box_thickness=BOX_THICKNESS, label_bg_opacity=LABEL_BG_OPACITY, sparse_label_fraction=0):
+        """
+        :param sparse_label_fraction: Label backgrounds covering less than this fraction of the
+                                      region they span are blended rectangle by rectangle
+                                      instead of through one overlay (0 = always one overlay).
+                                      The per-rectangle cost grows with the number of labels.
+        """
+        self.font_scale = font_scale
+        self.font_thickness = font_thickness
+        self.box_thickness = box_thickness
+        self.ppe_box_thickness = box_thickness - 1 if box_thickness > 1 else 1 # Slightly thinner for PPE
+        self.label_bg_opacity = label_bg_opacity
+        self.sparse_label_fraction = sparse_label_fraction
+        self.line_height = int(font_scale * 25) + 5 # Approximate height of a line of text + padding
+
+    def _text_width(self, text):
+        return text_size(text, self.font_scale, self.font_thickness)[0][0]
+
+    def draw(self, frame, tracked_persons, person_ppe_associations, ppe_violations, all_tracked_objects):
+        """
+        Draws persons with their PPE and violation status, and all other tracked
+        objects, onto frame in place (same arguments as draw_tracked_ppe_status).
+        :return: frame
+        """
+        boxes = [] # (x1, y1, x2, y2, color, thickness)
+        backgrounds = [] # (x1, y1, x2, y2, color)
+        texts = [] # (text, x, y, color)
+        drawn_ppe_track_ids = set()
+
+        for person_data in tracked_persons:
+            if len(person_data) < 5:
+                continue
+            px1, py1, px2, py2 = map(int, person_data[0:4])
+            person_id = int(person_data[4])
+            self._add_person(person_id, px1, py1, px2, py2, person_ppe_associations.get(person_id),
+                             ppe_violations.get(person_id), boxes, backgrounds, texts, drawn_ppe_track_ids)
+        # Persons (with their PPE) go first, so other objects are drawn over person labels as before
+        self._render(frame, boxes, backgrounds, texts)
+
+        boxes, backgrounds, texts = [], [], []
+        for obj_data in all_tracked_objects:
+            if len(obj_data) < 7 or obj_data[6] == 'person' or int(obj_data[4]) in drawn_ppe_track_ids:
+                continue
+            self._add_object(obj_data, boxes, backgrounds, texts)
+        self._render(frame, boxes, backgrounds, texts)
+        return frame
+
+    def _render(self, frame, boxes, backgrounds, texts):
+        for x1, y1, x2, y2, color, thickness in boxes:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+        self._blend_backgrounds(frame, backgrounds)
+        for text, x, y, color in texts:
+            cv2.putText(frame, text, (x, y), FONT, self.font_scale, color, self.font_thickness)
+
+    def _add_person(self, person_id, px1, py1, px2, py2, associated_ppe, violation_details, boxes, backgrounds, texts,
+                    drawn_ppe_track_ids):
+        status_lines = [f"Person {person_id}"]
+        box_color = COLOR_GREEN
+        if violation_details is not None:
+            box_color = COLOR_RED
+            if violation_details.get('missing_helmet'):
+                status_lines.append("MISSING HELMET")
+            if violation_details.get('missing_vest'):
+                status_lines.append("MISSING VEST")
+            if len(status_lines) == 1:
+                status_lines.append("NON-COMPLIANT")
+        boxes.append((px1, py1, px2, py2, box_color, self.box_thickness))
+
+        if associated_ppe:
+            for key, color in (('helmet_bbox', COLOR_BLUE), ('vest_bbox', COLOR_YELLOW)):
+                ppe_info = associated_ppe.get(key)
+                if ppe_info and len(ppe_info) >= 4:
+                    boxes.append((*map(int, ppe_info[0:4]), color, self.ppe_box_thickness))
+                    if len(ppe_info) >= 5:
+                        drawn_ppe_track_ids.add(int(ppe_info[4]))
+
+        # Label block above the box, or just inside its top if it would leave the frame
+        line_height = self.line_height
+        bg_height = len(status_lines) * line_height
+        max_text_width = max(self._text_width(line) for line in status_lines)
+        bg_y1 = py1 - 7 - bg_height + (line_height // 3)
+        shifted = bg_y1 < 0
+        if shifted:
+            bg_y1 = py1 + 5
+        backgrounds.append((px1, bg_y1, px1 + max_text_width + 10, bg_y1 + bg_height, PERSON_LABEL_BG))
+        for i, line in enumerate(status_lines):
+            if shifted:
+                text_y = bg_y1 + i * line_height + (line_height // 3) * 2
+            else:
+                text_y = py1 - 7 - (len(status_lines) - 1 - i) * line_height
+            # "Person ID" in white, status lines in the compliance color
+            texts.append((line, px1 + 5, text_y, box_color if i > 0 else COLOR_WHITE))
+
+    def _add_object(self, obj_data, boxes, backgrounds, texts):
+        x1, y1, x2, y2 = map(int, obj_data[0:4])
+        class_name = obj_data[6]
+        color = OBJECT_COLORS.get(class_name, COLOR_CYAN)
+        boxes.append((x1, y1, x2, y2, color, self.ppe_box_thickness))
+
+        label = f"{class_name} {int(obj_data[4])}"
+        (label_w, label_h), _ = text_size(label, self.font_scale, self.font_thickness)
+        label_y = y1 - 7
+        if label_y < 10:
+            label_y = y1 + int(self.font_scale * 25) # Draw below if too close to top
+        bg = (x1, label_y - label_h - 3, x1 + label_w + 4, label_y + 3)
+        if bg[1] < 0:
+            bg = (x1, y1 + 2, x1 + label_w + 4, y1 + label_h + 7)
+            label_y = y1 + label_h + 2
+        backgrounds.append((*bg, OBJECT_LABEL_BG))
+        texts.append((label, x1 + 2, label_y, color))
+
+    def _blend_backgrounds(self, frame, backgrounds):
+        """
+        Blends all label backgrounds of one pass: once over the region they span, under a
+        label layer used as mask, or rectangle by rectangle if they are sparse (see __init__).
+        """
+        if not backgrounds:
+            return
+        height, width = frame.shape[:2]
+        rects = np.array([bg[:4] for bg in backgrounds], dtype=np.int64)
+        rects[:, [0, 2]] = rects[:, [0, 2]].clip(0, width)
+        rects[:, [1, 3]] = rects[:, [1, 3]].clip(0, height)
+        valid = (rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])
+        if not valid.any():
+            return
+        rects, colors = rects[valid], [bg[4][0] for bg, ok in zip(backgrounds, valid.tolist()) if ok]
+        alpha = self.label_bg_opacity
+        x0, y0 = rects[:, 0].min(), rects[:, 1].min()
+        x1, y1 = rects[:, 2].max(), rects[:, 3].max()
+        label_area = int(((rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])).sum())
+        if label_area < self.sparse_label_fraction * (x1 - x0) * (y1 - y0):
+            # Sparse labels: the union region would be mostly untouched pixels, so
+            # blend each grey background straight into its own rectangle instead
+            self._blend_rectangles(frame, rects, colors, alpha)
+            return
+        region = frame[y0:y1, x0:x1]
+        # Label layer: 1 + index into grays of the background covering each pixel, 0 outside the labels
+        grays = sorted(set(colors))
+        layer = np.zeros(region.shape[:2], dtype=np.uint8)
+        for (rx1, ry1, rx2, ry2), gray in zip((rects - [x0, y0, x0, y0]).tolist(), colors):
+            layer[ry1:ry2, rx1:rx2] = grays.index(gray) + 1 # Later labels are filled over earlier ones
+        for idx, gray in enumerate(grays, 1):
+            # One pass shares one grey, so the layer itself is the mask; cv2.copyTo writes into the view
+            mask = layer if len(grays) == 1 else cv2.compare(layer, idx, cv2.CMP_EQ)
+            cv2.copyTo(cv2.convertScaleAbs(region, None, 1 - alpha, alpha * gray), mask, region)
+
+    @staticmethod
+    def _blend_rectangles(frame, rects, colors, alpha):
+        """
+        Blends each rectangle in place. Where rectangles overlap, only the last
+        one is blended, as in the overlay, where it is filled over the others.
+        """
+        # covered_later[i, j]: rectangle j comes after i and overlaps it
+        overlaps = ((np.maximum(rects[:, None, 0], rects[None, :, 0]) < np.minimum(rects[:, None, 2], rects[None, :, 2]))
+                    & (np.maximum(rects[:, None, 1], rects[None, :, 1]) < np.minimum(rects[:, None, 3], rects[None, :, 3])))
+        covered_later = np.triu(overlaps, k=1)
+        for i, ((rx1, ry1, rx2, ry2), gray) in enumerate(zip(rects.tolist(), colors)):
+            roi = frame[ry1:ry2, rx1:rx2]
+            later = np.flatnonzero(covered_later[i])
+            if later.size == 0:
+                cv2.convertScaleAbs(roi, roi, 1 - alpha, alpha * gray)
+                continue
+            own = np.ones(roi.shape[:2], dtype=bool)
+            for cx1, cy1, cx2, cy2 in rects[later].tolist():
+                own[max(cy1, ry1) - ry1:min(cy2, ry2) - ry1, max(cx1, rx1) - rx1:min(cx2, rx2) - rx1] = False
+            np.copyto(roi, cv2.convertScaleAbs(roi, None, 1 - alpha, alpha * gray), where=own[..., None])
+
+
+DEFAULT_RENDERER = OverlayRenderer()
@@ -1,4 +1,5 @@
 import cv2
+import os
 import numpy as np
 
 # Define some colors (BGR format) - Consider making these brighter if needed
@@ -188,6 +189,42 @@ def draw_tracked_ppe_status(frame, tracked_persons, person_ppe_associations, ppe
 
     return frame
 
+
+def open_video_writer(cap, output_video_path):
+    """
+    Opens an mp4 writer matching the size and FPS of cap, creating the output
+    directory if needed. Returns None if output_video_path is empty or the
+    writer cannot be opened.
+    """
+    if not output_video_path:
+        return None
+    writer = None
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps == 0 or fps is None: 
+        print("Warning: Video FPS is 0 or None. Defaulting to 25 FPS for writer.")
+        fps = 25 
+
+    output_dir = os.path.dirname(output_video_path)
+    if output_dir and not os.path.exists(output_dir):
+        try:
+            os.makedirs(output_dir)
+            print(f"Created output directory: {output_dir}")
+        except OSError as e:
+            print(f"Error creating output directory {output_dir}: {e}")
+            # Decide if to return or continue without writing
+            output_video_path = None 
+
+    if output_video_path: # Re-check in case it was disabled
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v') 
+        writer = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
+        if not writer.isOpened():
+            print(f"Error: Could not open video writer for path {output_video_path}")
+            writer = None # Ensure writer is none if opening failed
+    return writer
+
+
 if __name__ == '__main__':
     dummy_frame = np.zeros((600, 800, 3), dtype=np.uint8)
     dummy_frame[:] = (100, 100, 100) 
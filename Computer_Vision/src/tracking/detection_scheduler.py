@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class DetectionScheduler:
+    """
+    Decides on which frames the detector runs; ObjectTracker extrapolates the
+    tracks on the frames in between.
+
+    With adaptive=False the detector runs every max_interval frames.
+    With adaptive=True the interval grows by one after each detection pass on a
+    stable scene, up to max_interval, and drops back to min_interval as soon as
+    a new person track appears or too many tracks are unstable (not yet
+    confirmed, or missed by the latest detection pass).
+    """
+    def __init__(self, max_interval=5, min_interval=1, adaptive=True,
+                 unstable_fraction_threshold=0.2, person_class_name='person'):
+        if min_interval < 1 or max_interval < min_interval:
+            raise ValueError(f"Invalid detection interval range [{min_interval}, {max_interval}]")
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.adaptive = adaptive
+        self.unstable_fraction_threshold = unstable_fraction_threshold
+        self.person_class_name = person_class_name
+
+        self.interval = min_interval if adaptive else max_interval
+        self.frames_since_detection = None # None until the first frame, which is always detected
+        self._last_track_id_count = 0
+
+        # Stats
+        self.frames_total = 0
+        self.frames_detected = 0
+
+    def should_detect(self):
+        return self.frames_since_detection is None or self.frames_since_detection + 1 >= self.interval
+
+    def record_frame(self, tracker, detected):
+        """
+        Call once per frame after the tracker has been updated or extrapolated.
+        :param tracker: The ObjectTracker; only read when adaptive=True, may be None otherwise.
+        :param detected: True if the detector ran on this frame.
+        """
+        self.frames_total += 1
+        if not detected:
+            self.frames_since_detection += 1
+            return
+
+        self.frames_detected += 1
+        self.frames_since_detection = 0
+        if self.adaptive:
+            self.interval = self._next_interval(tracker)
+            self._last_track_id_count = tracker.track_id_count
+
+    def _next_interval(self, tracker):
+        table = tracker.table
+        if len(table) == 0:
+            return min(self.interval + 1, self.max_interval)
+
+        # New person tracks since the last detection pass need detections to confirm them
+        person_cls_ids = [cls_id for cls_id, name in tracker.class_names.items() if name == self.person_class_name]
+        new_tracks = table.ids > self._last_track_id_count
+        if np.any(new_tracks & np.isin(table.cls_ids, person_cls_ids)):
+            return self.min_interval
+
+        unstable = (table.hits < tracker.min_hits) | (table.ages > 0)
+        if np.count_nonzero(unstable) > self.unstable_fraction_threshold * len(table):
+            return self.min_interval
+        return min(self.interval + 1, self.max_interval)
+
+    def summary(self):
+        skipped = self.frames_total - self.frames_detected
+        return (f"Detector ran on {self.frames_detected} of {self.frames_total} frames "
+                f"({skipped} extrapolated by the tracker)")
@@ -0,0 +1,97 @@
+import numpy as np
+
+# Constant-velocity Kalman filter for bounding boxes, as used by SORT.
+# State:       [cx, cy, s, r, vx, vy, vs]  (centre, area, aspect ratio, velocities)
+# Measurement: [cx, cy, s, r]
+# Every method works on all tracks at once: states are [N, 7] and
+# covariances [N, 7, 7], so predict/update are batched matrix products.
+
+STATE_DIM = 7
+MEASUREMENT_DIM = 4
+
+
+def bbox_to_measurement(boxes):
+    """
+    Converts boxes [N, 4] in the form [x1,y1,x2,y2] to measurements [N, 4] [cx,cy,s,r].
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    cx = boxes[:, 0] + w / 2.
+    cy = boxes[:, 1] + h / 2.
+    s = w * h
+    r = w / np.maximum(h, 1e-6)
+    return np.stack((cx, cy, s, r), axis=1)
+
+
+def state_to_bbox(states):
+    """
+    Converts states [N, 7] back to boxes [N, 4] in the form [x1,y1,x2,y2].
+    """
+    states = np.asarray(states, dtype=np.float64).reshape(-1, STATE_DIM)
+    s = np.maximum(states[:, 2], 1e-6) # The area can go negative while coasting
+    r = np.maximum(states[:, 3], 1e-6)
+    w = np.sqrt(s * r)
+    h = s / w
+    return np.stack((states[:, 0] - w / 2., states[:, 1] - h / 2.,
+                     states[:, 0] + w / 2., states[:, 1] + h / 2.), axis=1)
+
+
+class BatchedKalmanBoxFilter:
+    def __init__(self):
+        # State transition: constant velocity for centre and area
+        self.F = np.eye(STATE_DIM)
+        self.F[0, 4] = self.F[1, 5] = self.F[2, 6] = 1.
+        # Measurement function: observe [cx, cy, s, r]
+        self.H = np.eye(MEASUREMENT_DIM, STATE_DIM)
+
+        # Noise settings follow the reference SORT implementation
+        self.R = np.eye(MEASUREMENT_DIM)
+        self.R[2:, 2:] *= 10.
+        self.Q = np.eye(STATE_DIM)
+        self.Q[-1, -1] *= 0.01
+        self.Q[4:, 4:] *= 0.01
+        self.P0 = np.eye(STATE_DIM) * 10.
+        self.P0[4:, 4:] *= 1000. # High uncertainty for the unobserved initial velocities
+
+    def initiate(self, boxes):
+        """
+        Creates filter states for new tracks.
+        :param boxes: Array [N, 4] of [x1,y1,x2,y2]
+        :return: (states [N, 7], covariances [N, 7, 7])
+        """
+        z = bbox_to_measurement(boxes)
+        states = np.zeros((z.shape[0], STATE_DIM))
+        states[:, :MEASUREMENT_DIM] = z
+        covariances = np.repeat(self.P0[None, :, :], z.shape[0], axis=0)
+        return states, covariances
+
+    def predict(self, states, covariances):
+        """
+        Advances every track by one frame.
+        :return: (states [N, 7], covariances [N, 7, 7])
+        """
+        states = states.copy()
+        # Stop shrinking once the predicted area would reach zero
+        shrinking_to_zero = (states[:, 6] + states[:, 2]) <= 0
+        states[shrinking_to_zero, 6] = 0.
+        states = states @ self.F.T
+        covariances = self.F @ covariances @ self.F.T + self.Q
+        return states, covariances
+
+    def update(self, states, covariances, boxes):
+        """
+        Corrects tracks with their matched detections (rows are paired).
+        :param boxes: Array [N, 4] of [x1,y1,x2,y2], one per state row
+        :return: (states [N, 7], covariances [N, 7, 7])
+        """
+        z = bbox_to_measurement(boxes)
+        innovation = z - states @ self.H.T
+        PHt = covariances @ self.H.T # [N, 7, 4]
+        S = self.H @ PHt + self.R # [N, 4, 4]
+        # K = P H^T S^-1, computed as a solve on the transposed system
+        K = np.linalg.solve(S, np.swapaxes(PHt, 1, 2)) # [N, 4, 7] = (P H^T S^-1)^T since S is symmetric
+        K = np.swapaxes(K, 1, 2) # [N, 7, 4]
+        states = states + (K @ innovation[:, :, None])[:, :, 0]
+        covariances = (np.eye(STATE_DIM) - K @ self.H) @ covariances
+        return states, covariances
@@ -1,87 +1,230 @@
 import numpy as np
-# Placeholder for a SORT-based tracker or similar.
-# A full SORT implementation is complex. This is a simplified interface.
-# The update method should take detections (e.g., [x1, y1, x2, y2, conf, cls_id])
-# and return tracked objects (e.g., [x1, y1, x2, y2, track_id, cls_id, cls_name]).
+from detection.detections import Detections
+from tracking.kalman_filter import BatchedKalmanBoxFilter, state_to_bbox
+from tracking.track_table import KalmanTrackTable, TrackTable
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError: # scipy is optional, fall back to greedy matching
+    linear_sum_assignment = None
+# IoU tracker in the style of SORT. Each update matches the detections to the
+# active tracks with the Hungarian algorithm on their IoU matrix (greedy
+# without scipy), optionally after predicting every track with a batched
+# constant-velocity Kalman filter (motion_model='kalman'). Tracks live in a
+# struct-of-arrays TrackTable, so matching, aging and pruning are array
+# operations. update() takes a Detections container or a list of
+# [x1, y1, x2, y2, conf, cls_id, cls_name] and returns the confirmed tracks
+# as [x1, y1, x2, y2, track_id, cls_id, cls_name]; update_arrays() returns them as a TrackTable.
+
+def iou_batch(bb_test, bb_gt):
+    """
+    Computes the pairwise IoU matrix between two sets of bboxes in the form [x1,y1,x2,y2].
+    :param bb_test: Array [N, 4]
+    :param bb_gt: Array [M, 4]
+    :return: Array [N, M] with IoU of every (test, gt) pair
+    """
+    bb_test = np.asarray(bb_test, dtype=np.float32).reshape(-1, 4)
+    bb_gt = np.asarray(bb_gt, dtype=np.float32).reshape(-1, 4)
+    bb_test = bb_test[:, None, :]
+    bb_gt = bb_gt[None, :, :]
+    xx1 = np.maximum(bb_test[..., 0], bb_gt[..., 0])
+    yy1 = np.maximum(bb_test[..., 1], bb_gt[..., 1])
+    xx2 = np.minimum(bb_test[..., 2], bb_gt[..., 2])
+    yy2 = np.minimum(bb_test[..., 3], bb_gt[..., 3])
+    w = np.maximum(0., xx2 - xx1)
+    h = np.maximum(0., yy2 - yy1)
+    wh = w * h
+    o = wh / ((bb_test[..., 2] - bb_test[..., 0]) * (bb_test[..., 3] - bb_test[..., 1])
+              + (bb_gt[..., 2] - bb_gt[..., 0]) * (bb_gt[..., 3] - bb_gt[..., 1]) - wh + 1e-6) # Add 1e-6 to avoid division by zero
+    return o
+
+def linear_assignment(iou_matrix):
+    """
+    Finds the row/column pairs that maximise the total IoU.
+    Uses the Hungarian algorithm when scipy is available, otherwise a greedy
+    pass over all pairs in descending IoU order.
+    :return: Array [K, 2] of (row, col) index pairs
+    """
+    if iou_matrix.size == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-iou_matrix)
+        return np.stack((rows, cols), axis=1).astype(np.int64)
+
+    order = np.argsort(-iou_matrix, axis=None, kind='stable')
+    rows, cols = np.unravel_index(order, iou_matrix.shape)
+    row_used = np.zeros(iou_matrix.shape[0], dtype=bool)
+    col_used = np.zeros(iou_matrix.shape[1], dtype=bool)
+    pairs = []
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        if row_used[r] or col_used[c]:
+            continue
+        row_used[r] = True
+        col_used[c] = True
+        pairs.append((r, c))
+        if len(pairs) == min(iou_matrix.shape):
+            break
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+MOTION_MODELS = ('none', 'kalman')
 
 class ObjectTracker:
-    def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3):
+    def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3, motion_model='none'):
+        """
+        :param motion_model: 'none' matches detections against each track's last box.
+                             'kalman' predicts every track with a constant-velocity
+                             Kalman filter before matching (SORT), so fast-moving
+                             objects keep their ID.
+        """
+        if motion_model not in MOTION_MODELS:
+            raise ValueError(f"Unknown motion_model '{motion_model}', expected one of {MOTION_MODELS}")
         self.max_age = max_age
         self.min_hits = min_hits
         self.iou_threshold = iou_threshold
+        self.motion_model = motion_model
         self.track_id_count = 0
-        self.tracks = [] # Store active tracks: [x1,y1,x2,y2,id,cls_id,name,age,hits]
+        self.class_names = {} # cls_id -> class name, learned from incoming detections
+        self.expired_track_ids = [] # Ids of the tracks removed by the last update
 
-        # Note: A real SORT tracker would use Kalman Filters for state estimation
-        # and the Hungarian algorithm for assignment. This is a conceptual placeholder.
+        # Assignment uses the Hungarian algorithm (see linear_assignment).
+        if motion_model == 'kalman':
+            self.kalman_filter = BatchedKalmanBoxFilter()
+            self.table = KalmanTrackTable() # Active tracks, one row per track
+        else:
+            self.kalman_filter = None
+            self.table = TrackTable() # Active tracks, one row per track
 
-    def _iou(self, bb_test, bb_gt):
+    @property
+    def tracks(self):
         """
-        Computes IoU between two bboxes in the form [x1,y1,x2,y2]
+        Active tracks in the list layout [x1,y1,x2,y2,id,cls_id,name,age,hits].
+        Built on demand; the tracker itself only keeps the array table.
         """
-        xx1 = np.maximum(bb_test[0], bb_gt[0])
-        yy1 = np.maximum(bb_test[1], bb_gt[1])
-        xx2 = np.minimum(bb_test[2], bb_gt[2])
-        yy2 = np.minimum(bb_test[3], bb_gt[3])
-        w = np.maximum(0., xx2 - xx1)
-        h = np.maximum(0., yy2 - yy1)
-        wh = w * h
-        o = wh / ((bb_test[2] - bb_test[0]) * (bb_test[3] - bb_test[1])
-                  + (bb_gt[2] - bb_gt[0]) * (bb_gt[3] - bb_gt[1]) - wh + 1e-6) # Add 1e-6 to avoid division by zero
-        return o
+        table = self.table
+        return [row + [track_id, cls_id, self.class_names.get(cls_id, ''), age, hits]
+                for row, track_id, cls_id, age, hits in zip(table.boxes.tolist(), table.ids.tolist(),
+                                                            table.cls_ids.tolist(), table.ages.tolist(),
+                                                            table.hits.tolist())]
 
-    def update(self, detections):
+    def _detection_arrays(self, detections):
         """
-        detections: list of [x1, y1, x2, y2, conf, cls_id, cls_name]
-        Returns: list of [x1, y1, x2, y2, track_id, cls_id, cls_name]
+        Accepts a Detections container or a list of [x1, y1, x2, y2, conf, cls_id, cls_name]
+        and returns (boxes [N, 4], cls_ids [N]).
         """
-        # This is a very simplified tracking logic for demonstration.
-        # A proper SORT implementation is much more involved.
-        
-        # Predict new locations of tracks (skipped in this simplified version)
+        if isinstance(detections, Detections):
+            for cls_id in np.unique(detections.cls_id).tolist():
+                if cls_id not in self.class_names:
+                    self.class_names[cls_id] = detections.names[cls_id]
+            return detections.xyxy, detections.cls_id
+        if len(detections) == 0:
+            return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int32)
+        for det in detections:
+            self.class_names[int(det[5])] = det[6]
+        boxes = np.array([det[:4] for det in detections], dtype=np.float32)
+        cls_ids = np.array([det[5] for det in detections], dtype=np.int32)
+        return boxes, cls_ids
+
+    def to_list(self, table):
+        """
+        Converts a track table to the list format [[x1, y1, x2, y2, track_id, cls_id, cls_name], ...]
+        """
+        names = self.class_names
+        return [row + [track_id, cls_id, names.get(cls_id, '')]
+                for row, track_id, cls_id in zip(table.boxes.tolist(), table.ids.tolist(), table.cls_ids.tolist())]
+
+    def update_arrays(self, detections):
+        """
+        detections: Detections container or list of [x1, y1, x2, y2, conf, cls_id, cls_name]
+        Returns: TrackTable with the tracks that meet the min_hits criteria
+        """
+        det_boxes, det_cls_ids = self._detection_arrays(detections)
+        table = self.table
+
+        # Predict new locations of tracks (only with the 'kalman' motion model)
+        if self.kalman_filter is not None and len(table) > 0:
+            table.states, table.covariances = self.kalman_filter.predict(table.states, table.covariances)
+            table.boxes = state_to_bbox(table.states).astype(np.float32)
 
         # Associate detections with existing tracks
-        matched_indices = []
-        if len(self.tracks) > 0 and len(detections) > 0:
-            track_bbs = np.array([track[:4] for track in self.tracks])
-            det_bbs = np.array([det[:4] for det in detections])
-            
-            iou_matrix = np.zeros((len(detections), len(self.tracks)), dtype=np.float32)
-            for d, det in enumerate(det_bbs):
-                for t, trk in enumerate(track_bbs):
-                    iou_matrix[d, t] = self._iou(det, trk)
-
-            # Simple greedy matching (a real SORT uses Hungarian algorithm)
-            for d_idx in range(len(detections)):
-                best_match_t_idx = np.argmax(iou_matrix[d_idx, :])
-                if iou_matrix[d_idx, best_match_t_idx] >= self.iou_threshold:
-                    if best_match_t_idx not in [m[1] for m in matched_indices]:
-                         # Update track with new detection
-                        self.tracks[best_match_t_idx][:4] = detections[d_idx][:4] # Update bbox
-                        self.tracks[best_match_t_idx][7] = 0 # Reset age
-                        self.tracks[best_match_t_idx][8] = min(self.min_hits, self.tracks[best_match_t_idx][8] + 1) # Increment hits
-                        # Keep original class_id and class_name for simplicity, or update if needed
-                        matched_indices.append((d_idx, best_match_t_idx))
-
-
-        # Create new tracks for unmatched detections
-        unmatched_detections_indices = [d_idx for d_idx in range(len(detections)) if d_idx not in [m[0] for m in matched_indices]]
-        for d_idx in unmatched_detections_indices:
-            self.track_id_count += 1
-            # [x1,y1,x2,y2,id,cls_id,name,age,hits]
-            new_track = list(detections[d_idx][:4]) + [self.track_id_count] + list(detections[d_idx][5:7]) + [0, 1]
-            self.tracks.append(new_track)
-
-        # Update age for unmatched tracks and remove old tracks
-        updated_tracks = []
-        for track in self.tracks:
-            if not any(t_idx == self.tracks.index(track) for _, t_idx in matched_indices): # If track was not matched
-                track[7] += 1 # Increment age
-            if track[7] <= self.max_age:
-                updated_tracks.append(track)
-        self.tracks = updated_tracks
-        
+        matched_indices = np.empty((0, 2), dtype=np.int64)
+        if len(table) > 0 and len(det_boxes) > 0:
+            iou_matrix = iou_batch(det_boxes, table.boxes)
+
+            # Optimal assignment, then drop pairs below the IoU threshold
+            matched_indices = linear_assignment(iou_matrix)
+            keep = iou_matrix[matched_indices[:, 0], matched_indices[:, 1]] >= self.iou_threshold
+            matched_indices = matched_indices[keep]
+
+            # Update matched tracks with their detections.
+            # Keep original class_id for simplicity, or update if needed
+            d_idx, t_idx = matched_indices[:, 0], matched_indices[:, 1]
+            if self.kalman_filter is not None:
+                table.states[t_idx], table.covariances[t_idx] = self.kalman_filter.update(
+                    table.states[t_idx], table.covariances[t_idx], det_boxes[d_idx])
+                table.boxes[t_idx] = state_to_bbox(table.states[t_idx])
+            else:
+                table.boxes[t_idx] = det_boxes[d_idx]
+            table.ages[t_idx] = 0 # Reset age
+            table.skipped[t_idx] = 0
+            table.hits[t_idx] = np.minimum(self.min_hits, table.hits[t_idx] + 1) # Increment hits
+
+        # Age unmatched tracks and remove old tracks
+        track_matched = np.zeros(len(table), dtype=bool)
+        track_matched[matched_indices[:, 1]] = True
+        table.ages[~track_matched] += 1
+        self._expire_old_tracks()
+
+        # Create new tracks for unmatched detections. They count as unmatched in
+        # this update's aging, like every track that was not matched, so start at age 1
+        detection_matched = np.zeros(len(det_boxes), dtype=bool)
+        detection_matched[matched_indices[:, 0]] = True
+        new_idx = np.flatnonzero(~detection_matched)
+        if new_idx.size > 0:
+            new_ids = np.arange(self.track_id_count + 1, self.track_id_count + 1 + new_idx.size)
+            self.track_id_count += new_idx.size
+            new_columns = dict(boxes=det_boxes[new_idx], ids=new_ids, cls_ids=det_cls_ids[new_idx],
+                               ages=np.ones(new_idx.size), skipped=np.zeros(new_idx.size),
+                               hits=np.ones(new_idx.size))
+            if self.kalman_filter is not None:
+                new_columns['states'], new_columns['covariances'] = self.kalman_filter.initiate(det_boxes[new_idx])
+            table.append(**new_columns)
+
         # Return tracks that meet min_hits criteria
-        # Format: [x1, y1, x2, y2, track_id, cls_id, cls_name]
-        return [track[:7] for track in self.tracks if track[8] >= self.min_hits]
+        return table.select(table.hits >= self.min_hits)
+
+    def extrapolate_arrays(self):
+        """
+        Advances the tracks by one frame without a detection pass (the detector
+        skipped this frame). With the 'kalman' motion model the boxes move along
+        their estimated velocity; with 'none' they stay where they were last seen.
+        Tracks are not aged, since no detection was missed, but the frame counts
+        towards max_age through the skipped column, so a track expires after the
+        same number of frames whether or not the detector skips frames.
+        Returns: TrackTable with the tracks that meet the min_hits criteria
+        """
+        table = self.table
+        table.skipped += 1
+        self._expire_old_tracks()
+        if self.kalman_filter is not None and len(table) > 0:
+            table.states, table.covariances = self.kalman_filter.predict(table.states, table.covariances)
+            table.boxes = state_to_bbox(table.states).astype(np.float32)
+        return table.select(table.hits >= self.min_hits)
+
+    def _expire_old_tracks(self):
+        """Removes the tracks that went more than max_age frames without a matched detection."""
+        table = self.table
+        alive = table.ages + table.skipped <= self.max_age
+        self.expired_track_ids = table.ids[~alive].tolist()
+        table.keep(alive)
 
+    def extrapolate(self):
+        """
+        Returns: list of [x1, y1, x2, y2, track_id, cls_id, cls_name], see extrapolate_arrays()
+        """
+        return self.to_list(self.extrapolate_arrays())
+
+    def update(self, detections):
+        """
+        detections: list of [x1, y1, x2, y2, conf, cls_id, cls_name] (or a Detections container)
+        Returns: list of [x1, y1, x2, y2, track_id, cls_id, cls_name]
+        """
+        return self.to_list(self.update_arrays(detections))
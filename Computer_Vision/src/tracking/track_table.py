@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class TrackTable:
+    """
+    Struct-of-arrays store for tracks. Every column is a contiguous NumPy array
+    whose first axis is the track index, so aging, matching and pruning are
+    plain mask/index operations instead of per-track Python objects.
+
+    Columns (see COLUMNS):
+        boxes:   float32 [N, 4] x1, y1, x2, y2
+        ids:     int64   [N]    track id
+        cls_ids: int32   [N]    class id (names live in ObjectTracker.class_names)
+        ages:    int32   [N]    detection passes since the last matched detection
+        skipped: int32   [N]    frames without a detection pass since the last matched detection
+        hits:    int32   [N]    matched detections, capped at min_hits
+    """
+    # (name, trailing shape, dtype); subclasses extend this to add columns
+    COLUMNS = (
+        ('boxes', (4,), np.float32),
+        ('ids', (), np.int64),
+        ('cls_ids', (), np.int32),
+        ('ages', (), np.int32),
+        ('skipped', (), np.int32),
+        ('hits', (), np.int32),
+    )
+    __slots__ = ('boxes', 'ids', 'cls_ids', 'ages', 'skipped', 'hits')
+
+    def __init__(self, **columns):
+        for name, shape, dtype in self.COLUMNS:
+            if name in columns:
+                value = np.ascontiguousarray(columns[name], dtype=dtype).reshape((-1,) + shape)
+            else:
+                value = np.zeros((0,) + shape, dtype=dtype)
+            setattr(self, name, value)
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def keep(self, mask):
+        """Drops, in place, every track not selected by mask."""
+        for name, _, _ in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[mask])
+
+    def select(self, mask):
+        """Returns a new table with the rows selected by mask."""
+        return type(self)(**{name: getattr(self, name)[mask] for name, _, _ in self.COLUMNS})
+
+    def append(self, **columns):
+        """
+        Appends rows. Every column must be given with the same number of rows.
+        """
+        for name, shape, dtype in self.COLUMNS:
+            new_rows = np.asarray(columns[name], dtype=dtype).reshape((-1,) + shape)
+            setattr(self, name, np.concatenate((getattr(self, name), new_rows)))
+
+
+class KalmanTrackTable(TrackTable):
+    """
+    TrackTable with the per-track Kalman filter state used by the 'kalman' motion model.
+        states:      float64 [N, 7]    [cx, cy, s, r, vx, vy, vs]
+        covariances: float64 [N, 7, 7]
+    """
+    COLUMNS = TrackTable.COLUMNS + (
+        ('states', (7,), np.float64),
+        ('covariances', (7, 7), np.float64),
+    )
+    __slots__ = ('states', 'covariances')
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Make the pipeline packages in src/ importable, as the scripts and benchmarks do
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
@@ -0,0 +1,165 @@
+import json
+import numpy as np
+import pytest
+from detection import postprocess
+from detection.postprocess import (LETTERBOX_COLOR, batched_nms, letterbox, nms, non_max_suppression,
+                                   preprocess_batch, scale_boxes)
+
+# Pins the numpy pre- and post-processing shared by the exported backends
+# (TorchScript and ONNX Runtime) against known outputs, and compares the numpy
+# NMS with torchvision's when torch is installed.
+#
+# Parity with the torch.hub model can only be approximate: AutoShape
+# letterboxes to a stride-rounded rectangle (640 x 384 for a 16:9 frame),
+# while the exports take their fixed input size (640 x 640), so the network
+# sees differently padded inputs. check_backend_parity.py therefore matches
+# detections by IoU within box/confidence tolerances instead of expecting
+# equal outputs.
+
+NAMES = ['person', 'helmet', 'vest']
+
+# Raw YOLOv5 output rows: x, y, w, h, objectness, class probabilities
+RAW_PREDICTION = np.array([[
+    [320, 320, 100, 200, 0.9, 0.1, 0.95, 0.0], # helmet, conf 0.855
+    [325, 322, 100, 200, 0.8, 0.1, 0.9, 0.0],  # helmet overlapping the first: suppressed
+    [325, 322, 100, 200, 0.8, 0.9, 0.1, 0.0],  # person at the same place: kept (class-aware NMS)
+    [100, 100, 20, 20, 0.1, 1.0, 0.0, 0.0],    # objectness below the threshold
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0],
+]], dtype=np.float32)
+EXPECTED_DETECTIONS = np.array([
+    [270, 220, 370, 420, 0.855, 1],
+    [275, 222, 375, 422, 0.72, 0],
+], dtype=np.float32)
+
+
+def test_letterbox_wide_frame_into_square_input():
+    frame = np.full((1080, 1920, 3), 50, dtype=np.uint8)
+    padded, gain, pad = letterbox(frame, (640, 640))
+    assert padded.shape == (640, 640, 3)
+    assert gain == pytest.approx(1 / 3)
+    assert pad == (0.0, 140.0)
+    assert (padded[:140] == LETTERBOX_COLOR).all() and (padded[500:] == LETTERBOX_COLOR).all()
+    assert (padded[140:500] == 50).all()
+
+
+def test_letterbox_odd_padding_goes_to_the_bottom():
+    frame = np.full((100, 101, 3), 50, dtype=np.uint8)
+    padded, gain, pad = letterbox(frame, (64, 64))
+    assert padded.shape == (64, 64, 3)
+    assert pad == pytest.approx((0.0, 0.5))
+    assert (padded[:63] == 50).all() and (padded[63] == LETTERBOX_COLOR).all()
+
+
+def test_preprocess_batch_layout_and_scale():
+    frames = [np.full((360, 640, 3), 255, dtype=np.uint8), np.zeros((640, 640, 3), dtype=np.uint8)]
+    batch, transforms = preprocess_batch(frames, (640, 640))
+    assert batch.shape == (2, 3, 640, 640) and batch.dtype == np.float32
+    assert batch[0, :, 140:500].min() == 1.0 and batch[1].max() == 0.0
+    assert batch[0, 0, 0, 0] == pytest.approx(114 / 255)
+    assert transforms == [(1.0, (0.0, 140.0)), (1.0, (0.0, 0.0))]
+
+
+def test_scale_boxes_inverts_letterbox():
+    _, gain, pad = letterbox(np.zeros((1080, 1920, 3), dtype=np.uint8), (640, 640))
+    frame_box = np.array([[300.0, 150.0, 900.0, 1050.0]])
+    input_box = frame_box * gain + np.array([pad[0], pad[1], pad[0], pad[1]])
+    np.testing.assert_allclose(scale_boxes(input_box, gain, pad, (1080, 1920)), frame_box, atol=1e-6)
+    # Boxes reaching into the padding are clipped to the frame
+    clipped = scale_boxes(np.array([[-10.0, 100.0, 700.0, 600.0]]), gain, pad, (1080, 1920))
+    np.testing.assert_allclose(clipped, [[0.0, 0.0, 1920.0, 1080.0]])
+
+
+def test_nms_known_output():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [0, 0, 10, 5]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7, 0.95], dtype=np.float32)
+    # IoU: box 0 / box 3 = 0.5, box 0 / box 1 = 0.68, box 1 / box 3 = 0.32.
+    # At 0.45 box 3 suppresses box 0, which then cannot suppress box 1
+    assert nms(boxes, scores, 0.45).tolist() == [3, 1, 2]
+    assert nms(boxes, scores, 0.6).tolist() == [3, 0, 2]
+
+
+def test_non_max_suppression_known_output():
+    output = non_max_suppression(RAW_PREDICTION, conf_threshold=0.25, iou_threshold=0.45)
+    assert len(output) == 1
+    np.testing.assert_allclose(output[0], EXPECTED_DETECTIONS, atol=1e-5)
+
+
+def random_boxes(num_boxes, seed=0):
+    """:return: (boxes [N, 4] xyxy, scores [N], cls_ids [N])"""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 640, (num_boxes, 2))
+    wh = rng.uniform(8, 160, (num_boxes, 2))
+    boxes = np.concatenate((xy, xy + wh), axis=1).astype(np.float32)
+    scores = rng.uniform(0, 1, num_boxes).astype(np.float32)
+    return boxes, scores, rng.integers(0, len(NAMES), num_boxes)
+
+
+def test_nms_blocks_do_not_change_the_result(monkeypatch):
+    boxes, scores, _ = random_boxes(3000)
+    expected = nms(boxes, scores, 0.45)
+    monkeypatch.setattr(postprocess, '_NMS_BLOCK_ELEMENTS', 3000 * 7) # 7 rows per block
+    np.testing.assert_array_equal(nms(boxes, scores, 0.45), expected)
+
+
+def test_batched_nms_matches_class_offset_nms():
+    boxes, scores, cls_ids = random_boxes(3000)
+    offsets = cls_ids[:, None].astype(np.float32) * 7680
+    np.testing.assert_array_equal(batched_nms(boxes, scores, cls_ids, 0.45), nms(boxes + offsets, scores, 0.45))
+
+
+def test_numpy_nms_matches_torchvision():
+    torch = pytest.importorskip('torch')
+    torchvision = pytest.importorskip('torchvision')
+    boxes, scores, cls_ids = random_boxes(3000)
+    expected = torchvision.ops.batched_nms(torch.from_numpy(boxes), torch.from_numpy(scores),
+                                           torch.from_numpy(cls_ids), 0.45)
+    np.testing.assert_array_equal(batched_nms(boxes, scores, cls_ids, 0.45), expected.numpy())
+
+
+def _write_constant_onnx_model(path):
+    """An ONNX 'network' that ignores its input and outputs RAW_PREDICTION for every image."""
+    onnx = pytest.importorskip('onnx')
+    from onnx import TensorProto, helper, numpy_helper
+    from detection.onnx_model import ONNX_CONFIG_KEY
+    num_outputs = RAW_PREDICTION.shape[2]
+    nodes = [
+        # Zero of shape [B, 1, 1] derived from the input, so the output follows the batch size
+        helper.make_node('ReduceMean', ['images'], ['mean'], axes=[1, 2, 3], keepdims=1),
+        helper.make_node('Mul', ['mean', 'zero'], ['zeros']),
+        helper.make_node('Squeeze', ['zeros', 'squeeze_axes'], ['zeros_b']),
+        helper.make_node('Unsqueeze', ['zeros_b', 'unsqueeze_axes'], ['zeros_b11']),
+        helper.make_node('Add', ['zeros_b11', 'prediction'], ['output0']),
+    ]
+    graph = helper.make_graph(
+        nodes, 'constant_yolo',
+        [helper.make_tensor_value_info('images', TensorProto.FLOAT, ['batch', 3, 640, 640])],
+        [helper.make_tensor_value_info('output0', TensorProto.FLOAT, ['batch', RAW_PREDICTION.shape[1], num_outputs])],
+        [numpy_helper.from_array(RAW_PREDICTION, 'prediction'),
+         numpy_helper.from_array(np.zeros((1, 1, 1, 1), dtype=np.float32), 'zero'),
+         numpy_helper.from_array(np.array([2, 3], dtype=np.int64), 'squeeze_axes'),
+         numpy_helper.from_array(np.array([2], dtype=np.int64), 'unsqueeze_axes')])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    entry = model.metadata_props.add()
+    entry.key = ONNX_CONFIG_KEY
+    entry.value = json.dumps({'names': NAMES, 'stride': 32, 'img_size': [640, 640], 'batch_size': None})
+    onnx.save(model, str(path))
+
+
+def test_onnx_backend_known_output(tmp_path):
+    pytest.importorskip('onnxruntime')
+    from detection.ppe_detector import PPEDetector
+    model_path = tmp_path / 'constant.onnx'
+    _write_constant_onnx_model(model_path)
+    detector = PPEDetector(str(model_path), confidence_threshold=0.4)
+    assert detector.backend == 'onnxruntime'
+
+    # A 640 x 360 frame is padded by 140 rows at the top, which the boxes lose again
+    frames = [np.zeros((360, 640, 3), dtype=np.uint8)] * 3
+    expected = EXPECTED_DETECTIONS.copy()
+    expected[:, [1, 3]] -= 140
+    for detections in detector.detect_batch_arrays(frames):
+        np.testing.assert_allclose(detections.xyxy, expected[:, :4], atol=1e-4)
+        np.testing.assert_allclose(detections.conf, expected[:, 4], atol=1e-5)
+        assert detections.cls_id.tolist() == [1, 0]
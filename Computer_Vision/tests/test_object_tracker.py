@@ -0,0 +1,65 @@
+import pytest
+from association.ppe_associator import PPEAssociator
+from compliance_checker.safety_rules import SafetyComplianceChecker
+from detection.detections import Detections
+from pipeline.frame_stages import analyze_frame
+from tracking.object_tracker import ObjectTracker
+
+# Track expiry must not depend on how often the detector runs: frames the
+# detector skips count towards max_age like frames where it missed the object.
+# The frames are driven through analyze_frame(), as the pipeline does, so an
+# empty detection pass goes through the same early return as in a real run.
+
+PERSON = [100, 100, 180, 300, 0.9, 0, 'person']
+
+
+def frames_until_expired(detect_interval, motion_model, max_age=5, min_hits=3, num_detections=3):
+    """
+    Detects a person num_detections times with the detector on every detect_interval-th
+    frame, then keeps the same schedule on an empty scene.
+    :return: Number of frames after the last detection until the track was dropped
+    """
+    tracker = ObjectTracker(max_age=max_age, min_hits=min_hits, motion_model=motion_model)
+    associator = PPEAssociator()
+    compliance_checker = SafetyComplianceChecker()
+    no_detections = Detections.from_list([])
+    for i in range(num_detections):
+        if i > 0:
+            for _ in range(detect_interval - 1):
+                analyze_frame(None, tracker, associator, compliance_checker)
+        analyze_frame([PERSON], tracker, associator, compliance_checker)
+    frame_idx = (num_detections - 1) * detect_interval + 1
+    (track_id,) = tracker.table.ids.tolist()
+
+    for frames_missing in range(1, 10 * max_age):
+        if frame_idx % detect_interval == 0:
+            assert analyze_frame(no_detections, tracker, associator, compliance_checker) is None
+        else:
+            analyze_frame(None, tracker, associator, compliance_checker)
+        frame_idx += 1
+        if track_id in tracker.expired_track_ids:
+            assert len(tracker.table) == 0
+            return frames_missing
+    raise AssertionError("The track never expired")
+
+
+@pytest.mark.parametrize('motion_model', ['none', 'kalman'])
+def test_track_expires_after_max_age_frames_with_and_without_frame_skipping(motion_model):
+    every_frame = frames_until_expired(1, motion_model)
+    assert every_frame == 6 # Dropped on the first frame beyond max_age
+    assert frames_until_expired(3, motion_model) == every_frame
+    assert frames_until_expired(4, motion_model) == every_frame
+
+
+def test_skipped_frames_do_not_age_tracks():
+    # The detection scheduler reads ages > 0 as "missed by the last detection pass"
+    tracker = ObjectTracker(max_age=5, min_hits=1)
+    tracker.update([PERSON])
+    tracker.update([PERSON])
+    tracker.extrapolate()
+    tracker.extrapolate()
+    assert tracker.table.ages.tolist() == [0]
+    assert tracker.table.skipped.tolist() == [2]
+    tracker.update([PERSON])
+    assert tracker.table.ages.tolist() == [0]
+    assert tracker.table.skipped.tolist() == [0]
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from project_utils.overlay_renderer import DEFAULT_RENDERER, OverlayRenderer
+from project_utils.video_utils import draw_tracked_ppe_status
+
+# Pixel parity of OverlayRenderer with the reference draw_tracked_ppe_status
+# where labels do not overlap, and between its two label blending paths
+# (one overlay layer vs rectangle by rectangle) everywhere, including
+# overlapping labels, which the reference blends twice.
+
+FRAME_SIZE = (960, 540)
+OVERLAY_ONLY = OverlayRenderer(sparse_label_fraction=0)
+RECTANGLES_ONLY = OverlayRenderer(sparse_label_fraction=float('inf'))
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, size=(FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+
+
+def add_person(scene, person_id, x, y, violation=None):
+    tracked_persons, _, violations, all_tracked_objects = scene
+    person = [x, y, x + 80, y + 200, person_id, 0, 'person']
+    tracked_persons.append(person)
+    all_tracked_objects.append(person)
+    if violation is not None:
+        violations[person_id] = violation
+
+
+def person_with_ppe(scene, person_id, x, y, violation=None):
+    """Adds a person with a tracked helmet and vest to scene (same layout as the benchmarks)."""
+    add_person(scene, person_id, x, y, violation)
+    all_tracked_objects = scene[3]
+    all_tracked_objects.append([x + 20, y - 20, x + 60, y + 10, 1000 + person_id, 1, 'helmet'])
+    all_tracked_objects.append([x + 10, y + 60, x + 70, y + 140, 2000 + person_id, 2, 'vest'])
+
+
+def empty_scene():
+    return [], {}, {}, []
+
+
+def grid_scene():
+    """Persons spaced so that no label or box overlaps another person's."""
+    scene = empty_scene()
+    person_id = 0
+    for y in range(60, FRAME_SIZE[1] - 200, 300):
+        for x in range(0, FRAME_SIZE[0] - 160, 320):
+            person_id += 1
+            person_with_ppe(scene, person_id, x, y, {'missing_helmet': True} if person_id % 3 == 0 else None)
+    return scene
+
+
+def random_scene(num_persons, seed=0):
+    """Persons at random positions; from about ten on, their labels overlap."""
+    rng = np.random.default_rng(seed)
+    scene = empty_scene()
+    for person_id in range(1, num_persons + 1):
+        x, y = rng.uniform(0, FRAME_SIZE[0] - 80), rng.uniform(0, FRAME_SIZE[1] - 200)
+        person_with_ppe(scene, person_id, x, y,
+                        {'missing_helmet': True, 'missing_vest': True} if person_id % 3 == 0 else None)
+    return scene
+
+
+def differing_pixels(a, b):
+    return np.count_nonzero((a != b).any(axis=2))
+
+
+def assert_matches_reference(frame, scene):
+    expected = draw_tracked_ppe_status(frame.copy(), *scene)
+    assert differing_pixels(DEFAULT_RENDERER.draw(frame.copy(), *scene), expected) == 0
+    assert differing_pixels(RECTANGLES_ONLY.draw(frame.copy(), *scene), expected) == 0
+
+
+def test_no_labels_leaves_the_frame_unchanged(frame):
+    assert differing_pixels(DEFAULT_RENDERER.draw(frame.copy(), *empty_scene()), frame) == 0
+    assert differing_pixels(RECTANGLES_ONLY.draw(frame.copy(), *empty_scene()), frame) == 0
+
+
+def test_separate_persons_match_reference(frame):
+    assert_matches_reference(frame, grid_scene())
+
+
+def test_labels_clipped_at_the_frame_edge_match_reference(frame):
+    scene = empty_scene()
+    # Label wider than the space left at the right edge, and a label reaching past the bottom
+    person_with_ppe(scene, 12345, FRAME_SIZE[0] - 60, 100, {'missing_helmet': True, 'missing_vest': True})
+    scene[3].append([400, FRAME_SIZE[1] - 4, 460, FRAME_SIZE[1], 77, 3, 'no-vest'])
+    assert_matches_reference(frame, scene)
+
+
+def test_label_shifted_inside_the_box_matches_reference(frame):
+    scene = empty_scene()
+    # Too close to the top for the label blocks to go above the boxes
+    add_person(scene, 1, 100, 30, {'missing_helmet': True, 'missing_vest': True})
+    add_person(scene, 2, 400, 5)
+    scene[3].append([700, 2, 760, 60, 78, 3, 'no-helmet'])
+    assert_matches_reference(frame, scene)
+
+
+def test_objects_are_drawn_over_person_labels(frame):
+    scene = empty_scene()
+    add_person(scene, 1, 300, 300)
+    # Unassociated helmet whose box crosses the person's label but whose own label does not
+    scene[3].append([320, 250, 360, 290, 79, 1, 'helmet'])
+    assert_matches_reference(frame, scene)
+
+
+@pytest.mark.parametrize('num_persons', [1, 15, 60, 200])
+def test_blend_paths_give_the_same_pixels(frame, num_persons):
+    scene = random_scene(num_persons)
+    expected = OVERLAY_ONLY.draw(frame.copy(), *scene)
+    assert differing_pixels(RECTANGLES_ONLY.draw(frame.copy(), *scene), expected) == 0
+
+
+def test_overlapping_person_and_object_labels_are_blended_once(frame):
+    scene = empty_scene()
+    person_with_ppe(scene, 1, 200, 200, {'missing_helmet': True})
+    person_with_ppe(scene, 2, 230, 210, {'missing_vest': True}) # Labels overlap the first person's
+    scene[3].append([210, 185, 300, 230, 80, 3, 'no-helmet']) # Label overlaps both person labels
+    expected = OVERLAY_ONLY.draw(frame.copy(), *scene)
+    assert differing_pixels(RECTANGLES_ONLY.draw(frame.copy(), *scene), expected) == 0
+
+
+@pytest.mark.parametrize('renderer', [OVERLAY_ONLY, RECTANGLES_ONLY], ids=['overlay', 'rectangles'])
+def test_overlapping_backgrounds_take_the_last_color_once(renderer):
+    frame = np.full((100, 100, 3), 100, dtype=np.uint8)
+    renderer._blend_backgrounds(frame, [(10, 10, 60, 60, (200, 200, 200)), (40, 40, 90, 90, (180, 180, 180)),
+                                        (-20, 95, 130, 130, (200, 200, 200))])
+    alpha = renderer.label_bg_opacity
+    assert frame[20, 20, 0] == round(100 * (1 - alpha) + 200 * alpha)
+    assert frame[50, 50, 0] == round(100 * (1 - alpha) + 180 * alpha) # Overlap: the later background
+    assert frame[80, 80, 0] == round(100 * (1 - alpha) + 180 * alpha)
+    assert frame[97, 0, 0] == round(100 * (1 - alpha) + 200 * alpha) # Clipped to the frame
+    assert frame[20, 80, 0] == 100 and frame[80, 20, 0] == 100
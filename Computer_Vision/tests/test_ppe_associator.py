@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from association.ppe_associator import PPE_CLASS_NAMES, PPEAssociator
+
+# The vectorized associator, with every pair (dense) and with the
+# sorted-interval index (indexed), must give exactly the statuses of the
+# per-person reference loop. Besides random scenes, the scenes here snap
+# boxes to a coarse grid so that PPE boxes share edges with person boxes and
+# with each other, tie on IoU, or have zero size: the cases where pruning
+# with strict/non-strict bounds goes wrong.
+
+LOOP = PPEAssociator(vectorized=False)
+DENSE = PPEAssociator(vectorized=True, spatial_index_min_pairs=float('inf'))
+INDEXED = PPEAssociator(vectorized=True, spatial_index_min_pairs=0)
+
+
+def random_scene(rng, num_persons, ppe_per_person=4, grid=None, frame_size=(1280, 720)):
+    """
+    Persons with PPE boxes of random classes around the head and torso.
+    :param grid: If given, every coordinate is rounded to a multiple of it.
+    """
+    w, h = frame_size
+    snap = (lambda v: float(round(v / grid) * grid)) if grid else float
+    persons, objects = [], []
+    for person_idx in range(num_persons):
+        pw, ph = rng.uniform(40, 120), rng.uniform(120, 300)
+        x, y = rng.uniform(0, w - pw), rng.uniform(0, h - ph)
+        person = [snap(x), snap(y), snap(x + pw), snap(y + ph), person_idx + 1, 0, 'person']
+        persons.append(person)
+        objects.append(person)
+        for _ in range(ppe_per_person):
+            name = PPE_CLASS_NAMES[rng.integers(0, len(PPE_CLASS_NAMES))]
+            cy = y + (rng.uniform(-0.1, 0.3) if 'helmet' in name else rng.uniform(0.2, 0.8)) * ph
+            cx = x + rng.uniform(-0.2, 1.2) * pw
+            bw, bh = pw * rng.uniform(0.3, 1.0), ph * rng.uniform(0.1, 0.5)
+            objects.append([snap(cx - bw / 2), snap(cy - bh / 2), snap(cx + bw / 2), snap(cy + bh / 2),
+                            1000 + len(objects), 1, name])
+    return persons, objects
+
+
+def assert_same_statuses(persons, objects):
+    expected = LOOP.associate_ppe_to_persons(persons, objects)
+    assert DENSE.associate_ppe_to_persons(persons, objects) == expected
+    assert INDEXED.associate_ppe_to_persons(persons, objects) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('num_persons', [1, 8, 60])
+def test_random_scenes(seed, num_persons):
+    rng = np.random.default_rng(seed)
+    assert_same_statuses(*random_scene(rng, num_persons))
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('grid', [5, 20])
+def test_grid_snapped_scenes(seed, grid):
+    # Snapping makes shared edges, identical boxes and zero-size boxes common
+    rng = np.random.default_rng(100 + seed)
+    persons, objects = random_scene(rng, 40, ppe_per_person=6, grid=grid, frame_size=(400, 400))
+    assert_same_statuses(persons, objects)
+
+
+def person(person_id, box):
+    return [*map(float, box), person_id, 0, 'person']
+
+
+def ppe(track_id, box, name):
+    return [*map(float, box), track_id, 1, name]
+
+
+def test_ppe_boxes_exactly_on_person_box_edges():
+    p = person(1, (100, 100, 200, 400))
+    touching = [
+        ppe(10, (200, 100, 260, 160), 'helmet'),   # Left edge on the person's right edge
+        ppe(11, (40, 100, 100, 160), 'helmet'),    # Right edge on the person's left edge
+        ppe(12, (120, 40, 180, 100), 'no-helmet'), # Bottom edge on the person's top edge
+        ppe(13, (120, 400, 180, 460), 'no-vest'),  # Top edge on the person's bottom edge
+        ppe(14, (200, 200, 200, 300), 'vest'),     # Zero width, on the right edge
+    ]
+    inside = [
+        ppe(20, (100, 80, 200, 140), 'helmet'),    # Same x extent as the person
+        ppe(21, (100, 160, 200, 400), 'vest'),     # Shares the left, right and bottom edges
+    ]
+    for objects in (touching, inside, touching + inside):
+        assert_same_statuses([p], [p] + objects)
+    assert LOOP.associate_ppe_to_persons([p], [p] + touching)[1]['helmet_status'] == 'unknown'
+    assert INDEXED.associate_ppe_to_persons([p], [p] + inside)[1]['vest_status'] == 'vest'
+
+
+def test_tied_overlap_scores():
+    # Two persons side by side sharing an edge, PPE boxes straddling the shared
+    # edge with equal IoU to both, and duplicated PPE boxes
+    left, right = person(1, (100, 100, 200, 400)), person(2, (200, 100, 300, 400))
+    objects = [left, right,
+               ppe(10, (150, 80, 250, 140), 'helmet'),
+               ppe(11, (150, 80, 250, 140), 'helmet'),
+               ppe(12, (150, 160, 250, 340), 'vest'),
+               ppe(13, (150, 160, 250, 340), 'no-vest')]
+    assert_same_statuses([left, right], objects)
+    # Identical persons compete for the same boxes
+    twins = [person(1, (100, 100, 200, 400)), person(2, (100, 100, 200, 400))]
+    assert_same_statuses(twins, twins + objects[2:])
+
+
+def test_no_persons_or_no_ppe():
+    assert_same_statuses([], [ppe(10, (0, 0, 10, 10), 'helmet')])
+    p = person(1, (100, 100, 200, 400))
+    assert_same_statuses([p], [p])
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+from association.ppe_associator import PPEAssociator
+from compliance_checker.safety_rules import SafetyComplianceChecker
+from detection.detections import Detections
+from pipeline import process_pipeline
+from pipeline.process_pipeline import ProcessPipeline
+from tracking.object_tracker import ObjectTracker
+
+# End-to-end run of the multi-process pipeline on a synthetic video with a
+# stub detector. Every frame is filled with a gray level that encodes its
+# index, and the stub puts a person box at an x position derived from that
+# gray level, so both the written frames and the violation events show which
+# decoded frame they came from.
+
+NUM_FRAMES = 24
+FRAME_SIZE = (160, 120)
+
+
+def gray_level(frame_idx):
+    return 20 + 8 * frame_idx
+
+
+def write_synthetic_video(path):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, FRAME_SIZE)
+    for frame_idx in range(NUM_FRAMES):
+        writer.write(np.full((FRAME_SIZE[1], FRAME_SIZE[0], 3), gray_level(frame_idx), dtype=np.uint8))
+    writer.release()
+
+
+class StubDetector:
+    """Returns one person (without PPE) per frame at x1 = the frame's gray level / 4."""
+    def detect_batch_arrays(self, frames):
+        batch = []
+        for frame in frames:
+            x1 = round(float(frame[-10:, -10:].mean())) / 4
+            batch.append(Detections.from_list([[x1, 40, x1 + 40, 100, 0.9, 0, 'person']]))
+        return batch
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.gray_levels = []
+
+    def write(self, frame):
+        # The bottom-right corner is never drawn on
+        self.gray_levels.append(float(frame[-10:, -10:].mean()))
+
+
+class RecordingEventLog:
+    def __init__(self):
+        self.frames = []
+
+    def record(self, frame_idx, violations):
+        self.frames.append((frame_idx, [details['bbox'][0] for details in violations.values()]))
+
+
+def test_frames_come_out_in_order_and_slots_are_released(tmp_path, monkeypatch):
+    video_path = str(tmp_path / 'synthetic.avi')
+    write_synthetic_video(video_path)
+
+    refcounts_at_unlink = []
+    unlink = process_pipeline.SharedFrameRing.unlink
+    def recording_unlink(ring):
+        refcounts_at_unlink.extend(ring.refcount(slot) for slot in range(ring.num_slots))
+        unlink(ring)
+    monkeypatch.setattr(process_pipeline.SharedFrameRing, 'unlink', recording_unlink)
+
+    writer, event_log = RecordingWriter(), RecordingEventLog()
+    pipeline = ProcessPipeline('unused.pt', ObjectTracker(min_hits=1), PPEAssociator(), SafetyComplianceChecker(),
+                               batch_size=2, num_slots=4, event_log=event_log, detector_factory=StubDetector)
+    assert pipeline.run(video_path, writer) == NUM_FRAMES
+
+    # Fewer slots than frames, so every slot was reused; none may be left in use at the end
+    assert refcounts_at_unlink == [0] * 4
+    expected = [gray_level(frame_idx) for frame_idx in range(NUM_FRAMES)]
+    assert np.allclose(writer.gray_levels, expected, atol=3)
+    assert [frame_idx for frame_idx, _ in event_log.frames] == list(range(NUM_FRAMES))
+    for frame_idx, x1s in event_log.frames:
+        assert len(x1s) == 1
+        assert abs(x1s[0] - gray_level(frame_idx) / 4) <= 1